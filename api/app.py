@@ -3,18 +3,46 @@
 """
 
 import sys
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
 from apscheduler.schedulers.background import BackgroundScheduler
-from flask import Flask, request, jsonify
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from flask import Flask, Response, request, jsonify, stream_with_context
 sys.path.append('./')
-from src.weather_API_data.read_data import get_weather_data
-from src.weather_API_data.fetch_data import load_config
+from src.weather_API_data.db_pool import get_pool, all_pool_stats
+from src.weather_API_data.metrics import REGISTRY, Gauge
+from src.weather_API_data.profiling import init_app as init_profiling, span
+from src.weather_API_data.cache import ResponseCache
+from src.weather_API_data.scheduling import CityRefreshScheduler
+from src.weather_API_data.pipeline import IngestPipeline
+from src.weather_API_data.leader import LeaderElector
+from src.weather_API_data.serializers import WEATHER_ROW_SERIALIZER, LAYOUTS
+from src.weather_API_data.latest_store import LatestReadingStore
+from src.weather_API_data.routing import get_router
+from src.weather_API_data.migrations import run_migrations
+from src.weather_API_data.read_data import (
+    get_weather_data,
+    get_weather_aggregates,
+    iter_weather_data,
+    decode_cursor,
+    next_cursor,
+    AGGREGATE_FIELDS
+)
+from src.weather_API_data.fetch_data import (
+    load_config,
+    env_config_loading,
+    get_client,
+    API_CALLS_PER_MINUTE,
+    ONE_MINUTE
+)
 from src.weather_API_data.store_data import (
     create_weather_database,
     create_weather_table,
-    insert_data
+    insert_many,
+    latest_rows,
+    ensure_partitions,
+    drop_expired_partitions
 )
 
 
@@ -22,6 +50,51 @@ from src.weather_API_data.store_data import (
 
 ENV_PATH = Path('.') / '.env'
 CITIES = ["Seoul", "pusan", "Malmö", "Stockholm", "Paris", "Taipei", "London"]
+FETCH_WORKERS = 8
+# Cities per bulk API request, 1 sends one request per city
+FETCH_BATCH_SIZE = 10
+# Every city is refreshed once per REFRESH_INTERVAL_SECONDS, or its entry in
+# CITY_REFRESH_INTERVALS, spread evenly over the interval. The fetch job runs
+# every FETCH_TICK_SECONDS and fetches at most the cities the API quota allows
+# in one tick, MAX_CITIES_PER_TICK while bulk requests work and one city per
+# call once the API refused them; a failed city is tried again after
+# RETRY_DELAY_SECONDS
+REFRESH_INTERVAL_SECONDS = 3600
+CITY_REFRESH_INTERVALS = {}
+FETCH_TICK_SECONDS = 5
+MAX_CITIES_PER_TICK = (
+    max(1, API_CALLS_PER_MINUTE * FETCH_TICK_SECONDS // ONE_MINUTE) * FETCH_BATCH_SIZE)
+RETRY_DELAY_SECONDS = 300
+# Fetched rows are written in micro-batches of INGEST_WRITE_BATCH_SIZE rows,
+# or after INGEST_FLUSH_SECONDS, with at most INGEST_QUEUE_SIZE rows waiting
+INGEST_WRITE_BATCH_SIZE = 500
+INGEST_FLUSH_SECONDS = 1.0
+INGEST_QUEUE_SIZE = 2000
+# Every process runs the scheduler, only the one holding the leader lock
+# runs its jobs; a follower takes over within LEADER_HEARTBEAT_SECONDS
+LEADER_HEARTBEAT_SECONDS = 10
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+POOL_CHECKOUT_TIMEOUT = 10.0
+CACHE_MAX_ENTRIES = 1024
+# Current readings are served from memory for up to LATEST_STORE_MAX_CITIES
+# cities. Every process reloads the readings stored since its newest one,
+# minus LATEST_STORE_REFRESH_OVERLAP_SECONDS of clock skew between writers,
+# every LATEST_STORE_REFRESH_SECONDS
+LATEST_STORE_MAX_CITIES = 100000
+LATEST_STORE_REFRESH_SECONDS = 5
+LATEST_STORE_REFRESH_OVERLAP_SECONDS = 60
+CACHE_TTL_SECONDS = 300
+# weather_data is range partitioned on date_time, one partition per
+# PARTITION_INTERVAL ('day' or 'month'), created PARTITIONS_AHEAD intervals
+# in advance and dropped once older than PARTITION_RETENTION intervals
+PARTITION_INTERVAL = 'month'
+PARTITIONS_AHEAD = 2
+PARTITION_RETENTION = 12
+EXPORT_ITERSIZE = 2000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+MAX_BATCH_CITIES = 200
 CREATE_TABLE_COMMAND = """
     CREATE TABLE IF NOT EXISTS weather_data (
         id SERIAL PRIMARY KEY,
@@ -33,66 +106,523 @@ CREATE_TABLE_COMMAND = """
     )
 """
 CREATE_DATABASE_COMMAND = """CREATE DATABASE weather_info_db"""
-DELETE_OLD_DATA_COMMAND = "TRUNCATE table weather_data RESTART IDENTITY"
 INSERT_DATA_COMMAND = """INSERT INTO weather_data
                         (city_name, temperature, pressure, humidity, date_time)
                         VALUES (%s, %s, %s, %s, %s) RETURNING id;"""
+INSERT_MANY_DATA_COMMAND = """INSERT INTO weather_data
+                        (city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s RETURNING id"""
+UPSERT_LATEST_COMMAND = """INSERT INTO weather_latest
+                        (id, city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s
+                        ON CONFLICT (city_name) DO UPDATE SET
+                            id = EXCLUDED.id,
+                            temperature = EXCLUDED.temperature,
+                            pressure = EXCLUDED.pressure,
+                            humidity = EXCLUDED.humidity,
+                            date_time = EXCLUDED.date_time
+                        WHERE weather_latest.date_time <= EXCLUDED.date_time"""
+SELECT_LATEST_TIMES_COMMAND = "SELECT city_name, date_time FROM weather_latest"
 
 
 
 
 app = Flask(__name__)
 
+# Request phase timings, slow-query log and cProfile sampling, all off
+# unless turned on through the WEATHER_PROFILE_* environment variables
+init_profiling(app)
+
+# Responses of /api/weather_data, invalidated by every scheduled write
+WEATHER_CACHE = ResponseCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+
+# Latest reading per city, filled by the ingest writes and the refresh job
+LATEST_STORE = LatestReadingStore(max_cities=LATEST_STORE_MAX_CITIES)
+
+# Which city to fetch next, and a guard against overlapping fetch runs
+REFRESH_SCHEDULER = CityRefreshScheduler(CITIES, REFRESH_INTERVAL_SECONDS, CITY_REFRESH_INTERVALS)
+FETCH_JOB_LOCK = threading.Lock()
+
+# Stage counters of the last ingest run, served by /api/ingest_stats
+LAST_INGEST_STATS = {}
+
+# Leader election between app processes, None when running alone
+LEADER = None
+
+def is_job_leader():
+    """ Whether this process should run the scheduled jobs """
+    return LEADER is None or LEADER.is_leader
+
+def get_read_router():
+    """ Router of the API read queries over the weather_info_database
+        replicas of database.ini, the primary when there are none """
+    return get_router('database.ini', 'weather_info_database')
+
+def read_target_counts():
+    """ Return the reads sent to replicas and to the primary for /metrics """
+    stats = get_read_router().stats()
+    return {'replica': stats['replica_reads'], 'primary': stats['primary_reads'],
+            'fallback': stats['fallbacks']}
+
+def cache_request_counts():
+    """ Return the response cache hits and misses for /metrics """
+    stats = WEATHER_CACHE.stats()
+    return {'hit': stats['hits'], 'miss': stats['misses']}
+
+def scheduler_lag_seconds():
+    """ Return how overdue the most overdue city is for /metrics, None on
+        a follower, whose refresh schedule never advances """
+    if not is_job_leader():
+        return None
+    return max(0.0, time.time() - (REFRESH_SCHEDULER.next_due() or time.time()))
+
+def scheduler_queued_cities():
+    """ Return the cities in the refresh schedule for /metrics, None on a follower """
+    if not is_job_leader():
+        return None
+    return len(REFRESH_SCHEDULER)
+
+# Metrics read from the components above at every /metrics scrape
+Gauge(
+    'weather_cache_requests_total',
+    'Response cache lookups by result',
+    ('result',),
+    function=cache_request_counts,
+    metric_type='counter')
+Gauge(
+    'weather_db_pool_connections',
+    'Database pool connections by state',
+    ('pool', 'state'),
+    function=lambda: {
+        (pool, state): stats[state]
+        for pool, stats in all_pool_stats().items()
+        for state in ('open', 'idle', 'in_use', 'waiting')
+    })
+Gauge(
+    'weather_scheduler_lag_seconds',
+    'How long the most overdue city has been waiting for its refresh, leader only',
+    function=scheduler_lag_seconds)
+Gauge(
+    'weather_db_reads_total',
+    'API read queries by target database, fallback counts failed replica reads',
+    ('target',),
+    function=read_target_counts,
+    metric_type='counter')
+Gauge(
+    'weather_latest_store_cities',
+    'Cities whose current reading is served from memory',
+    function=lambda: len(LATEST_STORE))
+Gauge(
+    'weather_scheduler_leader',
+    'Whether this process runs the scheduled jobs',
+    function=lambda: int(is_job_leader()))
+Gauge(
+    'weather_scheduler_queued_cities',
+    'Cities waiting in the refresh schedule, leader only',
+    function=scheduler_queued_cities)
+
+def cities_per_tick():
+    """ Return how many due cities one run of the fetch job may take.
+        A client that found the API without bulk support sends one request
+        per city, so the tick budget shrinks to the API calls of a tick
+        instead of leaving the run blocked on the rate limiter. """
+    try:
+        client = get_client(*env_config_loading(ENV_PATH))
+    except (FileNotFoundError, ValueError):
+        return MAX_CITIES_PER_TICK
+
+    if client.bulk_supported:
+        return MAX_CITIES_PER_TICK
+    return max(1, MAX_CITIES_PER_TICK // FETCH_BATCH_SIZE)
+
+
+
+
 def scheduled_job_fetch_store_wether_data():
-    """ A background job that runs every hour to fetch
-        weather data and store it in the database.
+    """ A background job that runs every FETCH_TICK_SECONDS to fetch
+        the weather data of the cities that are due and store it in the database.
+        Only the leader process does any work.
     """
 
-    # Connect to weather_info_db
+    if not is_job_leader():
+        return {}, {}
+    limit = cities_per_tick()
+    if not FETCH_JOB_LOCK.acquire(blocking=False):
+        print("Previous weather fetch still running, skipping this run")
+        return {}, {}
+
+    due = REFRESH_SCHEDULER.pop_due(limit=limit)
+    try:
+        if not due:
+            return {}, {}
+        return fetch_store_due_cities(due)
+
+    finally:
+        # Cities left unscheduled by a failed run are retried later
+        for city_nm in due:
+            if city_nm not in REFRESH_SCHEDULER:
+                REFRESH_SCHEDULER.schedule(city_nm, delay=RETRY_DELAY_SECONDS)
+        FETCH_JOB_LOCK.release()
+
+
+
+
+def fetch_store_due_cities(due):
+    """ Fetch and store the due cities whose stored reading is stale """
+
     config_new_db = load_config('database.ini', 'weather_info_database')
-    conn_new = psycopg2.connect(**config_new_db)
-    with conn_new.cursor() as cursor:
-        conn_new.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cursor.execute(DELETE_OLD_DATA_COMMAND)
 
-    #api_key, api_base_url = env_config_loading(ENV_PATH)
-    for city_nm in CITIES:
-        # Undo this comment because I only need it now
-        #response_data = fetch_weather_data(city_nm, api_key, api_base_url)
-        response_data = {
-        "current": {
-            "temperature": 24,
-            "pressure": 1001,
-            "humidity": 74,
-        }}
-        insert_data(conn_new, city_nm, response_data, INSERT_DATA_COMMAND)
+    # Readings stored by another process, or before a restart, are reused
+    latest = get_weather_data(config_new_db, SELECT_LATEST_TIMES_COMMAND, {'city_name': due})
+    cities = REFRESH_SCHEDULER.defer_fresh(
+        due,
+        {city_nm: date_time.timestamp() for city_nm, date_time in latest if date_time is not None}
+        )
+    if not cities:
+        return {}, {}
+
+    api_key, api_base_url = env_config_loading(ENV_PATH)
+    client = get_client(api_key, api_base_url)
+
+    # Fetch workers and the database writer run side by side, joined by a
+    # bounded queue. Cities are queued before the start so the workers pick
+    # up full bulk chunks, close() returns once every row is written
+    pipeline = IngestPipeline(
+        lambda chunk: client.fetch_many(chunk, FETCH_BATCH_SIZE),
+        lambda rows: write_weather_rows(config_new_db, rows),
+        workers=FETCH_WORKERS,
+        fetch_batch_size=FETCH_BATCH_SIZE,
+        queue_size=INGEST_QUEUE_SIZE,
+        write_batch_size=INGEST_WRITE_BATCH_SIZE,
+        flush_interval=INGEST_FLUSH_SECONDS
+        )
+    for city_nm in cities:
+        pipeline.submit(city_nm)
+    pipeline.start()
+    pipeline.close()
+
+    LAST_INGEST_STATS.update(pipeline.stats())
+    results, errors = pipeline.results, pipeline.errors
+    for city_nm, error in errors.items():
+        print(f"Failed to ingest weather data for {city_nm} : {error}")
+
+    # Only a stored reading waits the full interval, a city that failed or
+    # that the fetch left out is retried soon
+    for city_nm in cities:
+        if city_nm in pipeline.written:
+            REFRESH_SCHEDULER.schedule(city_nm)
+        else:
+            REFRESH_SCHEDULER.schedule(city_nm, delay=RETRY_DELAY_SECONDS)
+
+    return results, errors
+
+
+
+
+def write_weather_rows(db_conf, rows):
+    """ Write a micro-batch of weather rows and invalidate cached responses """
+
+    # History is append-only, the latest reading per city is upserted
+    # in the same transaction so readers never see a half-loaded table
+    with get_pool(db_conf).connection() as conn_new:
+        ids = insert_many(
+            conn_new,
+            rows,
+            INSERT_MANY_DATA_COMMAND,
+            return_ids=True,
+            latest_command=UPSERT_LATEST_COMMAND,
+            update_rollups=True
+            )
+
+    LATEST_STORE.update_many(latest_rows(rows, ids))
+    WEATHER_CACHE.invalidate()
+
+
+
+
+def scheduled_job_refresh_latest_store():
+    """ A background job, run by every process, that loads into the latest
+        reading store the readings written since the newest one it holds,
+        or all of weather_latest on the first run. Responses cached by this
+        process are dropped when new readings come in, since a follower
+        process does not run the fetch job that invalidates them.
+    """
+
+    config_new_db = load_config('database.ini', 'weather_info_database')
+    newest = LATEST_STORE.newest_date_time()
+    start = None
+    if newest is not None:
+        start = newest - timedelta(seconds=LATEST_STORE_REFRESH_OVERLAP_SECONDS)
+
+    rows = get_weather_data(config_new_db, "SELECT * FROM weather_latest", start=start)
+    stored = LATEST_STORE.update_many(rows)
+    if stored:
+        WEATHER_CACHE.invalidate()
+    return stored
+
+
+
+
+def scheduled_job_maintain_partitions():
+    """ A background job that pre-creates the upcoming weather_data
+        partitions and drops the expired ones.
+    """
+
+    if not is_job_leader():
+        return [], []
+
+    config_new_db = load_config('database.ini', 'weather_info_database')
+    with get_pool(config_new_db).connection() as conn_new:
+        created = ensure_partitions(conn_new, PARTITION_INTERVAL, PARTITIONS_AHEAD)
+        dropped = drop_expired_partitions(conn_new, PARTITION_INTERVAL, PARTITION_RETENTION)
+
+    return created, dropped
+
+
+
+
+def parse_timestamp(value):
+    """ Parse an ISO 8601 query parameter into a naive local timestamp """
+    if value is None:
+        return None
+
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+
+
+def parse_page_size(value):
+    """ Parse the limit query parameter, bounded by MAX_PAGE_SIZE """
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+
+    limit = int(value)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+
+
+def weather_rows_response(rows, layout):
+    """ Return weather rows as a JSON response in the requested layout.
+        rows keeps the positional arrays of jsonify, records and columns
+        go through the precompiled weather row serializer. """
+    if layout == 'rows':
+        with span('jsonify'):
+            return jsonify(rows)
+
+    with span('serialize'):
+        body = WEATHER_ROW_SERIALIZER.dumps(rows, layout)
+    return Response(body, mimetype='application/json')
 
 
 
 
 @app.route('/api/weather_data', methods=['GET'])
 def get_city_weather():
-    """ get city weather API endpoint. """
-    command = "SELECT * FROM weather_data"
+    """ get city weather API endpoint.
+
+        Returns the current reading of city_name. With any of from, to, limit
+        or cursor it returns a page of the city history instead, ordered by
+        time, and the X-Next-Cursor header carries the token of the next page.
+        layout selects positional rows (default), named records or columns.
+    """
     city_name = request.args.get('city_name')
     if not city_name:
         return jsonify({"error": "city_name parameter is required"}), 400
 
-    db_conf = load_config('database.ini', 'weather_info_database')
+    layout = request.args.get('layout', 'rows')
+    if layout not in LAYOUTS:
+        return jsonify({"error": f"layout must be one of {', '.join(LAYOUTS)}"}), 400
+
+    history = any(arg in request.args for arg in ('from', 'to', 'limit', 'cursor'))
+    try:
+        start = parse_timestamp(request.args.get('from'))
+        end = parse_timestamp(request.args.get('to'))
+        limit = parse_page_size(request.args.get('limit')) if history else None
+        cursor = request.args.get('cursor')
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if not history:
+        with span('latest_store'):
+            latest = LATEST_STORE.get(city_name)
+        if latest is not None:
+            return weather_rows_response([latest], layout), 200
+
+    command = "SELECT * FROM weather_data" if history else "SELECT * FROM weather_latest"
 
     # Added this filter in case we want to expand
     # it to fetching weather for multiple cities
     city_filter = {'city_name' : [city_name]}
-    weather_data = get_weather_data(db_conf, command, city_filter)
-    print(weather_data)
+
+    def load_weather_data():
+        with span('load_config'):
+            db_conf = load_config('database.ini', 'weather_info_database')
+            router = get_read_router()
+        return router.read(
+            db_conf, get_weather_data, command, city_filter, start, end, limit, cursor)
+
+    cache_key = (command, tuple(city_filter['city_name']), start, end, limit, cursor)
+    with span('cache'):
+        weather_data = WEATHER_CACHE.get_or_load(cache_key, load_weather_data)
+
+    if history:
+        response = weather_rows_response(weather_data, layout)
+        token = next_cursor(weather_data, limit)
+        if token is not None:
+            response.headers['X-Next-Cursor'] = token
+        return response, 200
 
     if weather_data:
-        return jsonify(weather_data), 200
+        return weather_rows_response(weather_data, layout), 200
 
     return jsonify({"error": "weather data not found"}), 404
 
 
 
+
+def parse_city_names(values):
+    """ Split repeated and comma-separated city_name parameters into
+        a list of distinct names, in request order. """
+    city_names = []
+    for value in values:
+        for city_name in value.split(','):
+            city_name = city_name.strip()
+            if city_name and city_name not in city_names:
+                city_names.append(city_name)
+    return city_names
+
+
+
+
+@app.route('/api/weather_data/batch', methods=['GET'])
+def get_cities_weather():
+    """ get weather of several cities API endpoint.
+
+        city_name may be repeated or comma-separated. All cities are resolved
+        with a single query; the response maps each found city to its current
+        reading and lists the cities without data under not_found.
+    """
+    command = "SELECT * FROM weather_latest"
+    city_names = parse_city_names(request.args.getlist('city_name'))
+    if not city_names:
+        return jsonify({"error": "city_name parameter is required"}), 400
+    if len(city_names) > MAX_BATCH_CITIES:
+        return jsonify({"error": f"at most {MAX_BATCH_CITIES} cities per request"}), 400
+
+    city_filter = {'city_name' : city_names}
+
+    def load_weather_data():
+        db_conf = load_config('database.ini', 'weather_info_database')
+        return get_read_router().read(db_conf, get_weather_data, command, city_filter)
+
+    cache_key = (command, tuple(sorted(city_names)))
+    weather_data = WEATHER_CACHE.get_or_load(cache_key, load_weather_data)
+
+    found = {row[1]: row for row in weather_data}
+    return jsonify({
+        "data": {city_name: found[city_name] for city_name in city_names if city_name in found},
+        "not_found": [city_name for city_name in city_names if city_name not in found],
+    }), 200
+
+
+
+
+@app.route('/api/weather_data/aggregates', methods=['GET'])
+def get_weather_aggregates_endpoint():
+    """ get hourly or daily weather aggregates API endpoint.
+
+        Serves per-city min/max/avg/count buckets from the rollup tables for
+        the cities in city_name (repeated or comma-separated), with optional
+        granularity (hour or day, default hour) and from/to bounds.
+    """
+    city_names = parse_city_names(request.args.getlist('city_name'))
+    if not city_names:
+        return jsonify({"error": "city_name parameter is required"}), 400
+    if len(city_names) > MAX_BATCH_CITIES:
+        return jsonify({"error": f"at most {MAX_BATCH_CITIES} cities per request"}), 400
+
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in ('hour', 'day'):
+        return jsonify({"error": "granularity must be hour or day"}), 400
+    try:
+        start = parse_timestamp(request.args.get('from'))
+        end = parse_timestamp(request.args.get('to'))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    def load_aggregates():
+        db_conf = load_config('database.ini', 'weather_info_database')
+        return get_read_router().read(
+            db_conf, get_weather_aggregates, city_names, granularity, start, end)
+
+    cache_key = ('aggregates', tuple(sorted(city_names)), granularity, start, end)
+    aggregates = WEATHER_CACHE.get_or_load(cache_key, load_aggregates)
+
+    return jsonify([dict(zip(AGGREGATE_FIELDS, row)) for row in aggregates]), 200
+
+
+
+
+@app.route('/api/weather_data/export', methods=['GET'])
+def export_weather_data():
+    """ Stream the weather history as NDJSON, one reading per line.
+        Optional city_name parameters restrict the export to those cities
+        and optional from/to parameters to a time range. """
+    command = "SELECT * FROM weather_data"
+    city_names = request.args.getlist('city_name')
+    city_filter = {'city_name' : city_names} if city_names else None
+    try:
+        start = parse_timestamp(request.args.get('from'))
+        end = parse_timestamp(request.args.get('to'))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    # Rows are streamed after the response starts, a failing replica can not
+    # be swapped for the primary halfway, so only the choice is routed
+    db_conf = get_read_router().read_conf(load_config('database.ini', 'weather_info_database'))
+    rows = iter_weather_data(
+        db_conf, command, city_filter, itersize=EXPORT_ITERSIZE, start=start, end=end)
+
+    def generate_lines():
+        for row in rows:
+            yield app.json.dumps(row) + "\n"
+
+    return Response(stream_with_context(generate_lines()), mimetype='application/x-ndjson')
+
+
+
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """ Response cache hit/miss counters API endpoint. """
+    return jsonify(WEATHER_CACHE.stats()), 200
+
+
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """ Metrics in the Prometheus text exposition format. """
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+
+
+@app.route('/api/ingest_stats', methods=['GET'])
+def get_ingest_stats():
+    """ Throughput and queue depth of the last ingest run API endpoint. """
+    return jsonify(LAST_INGEST_STATS), 200
+
+
+
 if __name__ == '__main__':
     try:
         config_main_db = load_config('database.ini', 'main_database')
@@ -105,13 +635,48 @@ if __name__ == '__main__':
             CREATE_DATABASE_COMMAND
             )
         if db_connection is not None:
+            # Size the shared pool before anything else draws from it
+            db_pool = get_pool(
+                conf_new_db,
+                minconn=POOL_MIN_CONNECTIONS,
+                maxconn=POOL_MAX_CONNECTIONS,
+                timeout=POOL_CHECKOUT_TIMEOUT
+                )
             conn_tbl = create_weather_table(conf_new_db, CREATE_TABLE_COMMAND)
+            if conn_tbl is not None:
+                db_pool.putconn(conn_tbl)
+
+            # Upgrade the schema in place (indexes, weather_latest, later
+            # table changes)
+            run_migrations(conf_new_db)
+
+            # Only one of the app processes runs the scheduled jobs
+            LEADER = LeaderElector(conf_new_db, heartbeat_interval=LEADER_HEARTBEAT_SECONDS)
+            LEADER.start()
+            scheduled_job_maintain_partitions()
+
+            # Serve current readings from memory from the first request on
+            scheduled_job_refresh_latest_store()
 
         db_connection.close()
 
-        # Trigger the scheduler that runs once every hour
+        # Trigger the scheduler, a run still in progress is never doubled up
         scheduler = BackgroundScheduler()
-        scheduler.add_job(func=scheduled_job_fetch_store_wether_data, trigger="interval", seconds=5)
+        scheduler.add_job(
+            func=scheduled_job_fetch_store_wether_data,
+            trigger="interval",
+            seconds=FETCH_TICK_SECONDS,
+            max_instances=1,
+            coalesce=True
+            )
+        scheduler.add_job(func=scheduled_job_maintain_partitions, trigger="interval", hours=1)
+        scheduler.add_job(
+            func=scheduled_job_refresh_latest_store,
+            trigger="interval",
+            seconds=LATEST_STORE_REFRESH_SECONDS,
+            max_instances=1,
+            coalesce=True
+            )
         scheduler.start()
 
         app.run(debug=True)
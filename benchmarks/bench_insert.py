@@ -0,0 +1,118 @@
+""" Benchmark comparing the per-row insert_data path with the bulk
+    insert_many and copy_many paths, reported in rows per second.
+
+    Uses the test_weather_database section of test_database.ini:
+    python benchmarks/bench_insert.py
+"""
+
+import argparse
+import contextlib
+from datetime import datetime
+import io
+import os
+import sys
+import time
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.weather_API_data.fetch_data import load_config
+from src.weather_API_data.store_data import insert_data, insert_many, copy_many
+
+
+
+
+BATCH_SIZES = [10, 1000, 100000]
+BENCH_TABLE = "bench_weather_data"
+CREATE_BENCH_TABLE_COMMAND = f"""
+    CREATE TABLE IF NOT EXISTS {BENCH_TABLE} (
+        id SERIAL PRIMARY KEY,
+        city_name VARCHAR(255),
+        temperature FLOAT,
+        pressure INT,
+        humidity INT,
+        date_time TIMESTAMP
+    )
+"""
+INSERT_DATA_COMMAND = f"""INSERT INTO {BENCH_TABLE}
+                        (city_name, temperature, pressure, humidity, date_time)
+                        VALUES (%s, %s, %s, %s, %s) RETURNING id;"""
+INSERT_MANY_DATA_COMMAND = f"""INSERT INTO {BENCH_TABLE}
+                        (city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s RETURNING id"""
+RESPONSE_DATA = {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}}
+
+
+
+
+def bench_per_row(conn, size):
+    """ Insert size readings one statement and one commit at a time """
+    for index in range(size):
+        insert_data(conn, f"city_{index}", RESPONSE_DATA, INSERT_DATA_COMMAND)
+
+
+def bench_insert_many(conn, size):
+    """ Insert size readings with multi-row VALUES in one transaction """
+    now = datetime.now()
+    rows = [(f"city_{index}", 24, 1001, 74, now) for index in range(size)]
+    insert_many(conn, rows, INSERT_MANY_DATA_COMMAND, return_ids=True)
+
+
+def bench_copy_many(conn, size):
+    """ Insert size readings through COPY FROM STDIN in one transaction """
+    now = datetime.now()
+    rows = [(f"city_{index}", 24, 1001, 74, now) for index in range(size)]
+    copy_many(conn, rows, BENCH_TABLE)
+
+
+
+
+def run(conn, sizes, max_per_row):
+    """ Run every insert path for every batch size and return the results """
+    paths = [
+        ("insert_data", bench_per_row),
+        ("insert_many", bench_insert_many),
+        ("copy_many", bench_copy_many),
+    ]
+    results = []
+    for size in sizes:
+        for name, bench in paths:
+            if name == "insert_data" and size > max_per_row:
+                continue
+
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {BENCH_TABLE} RESTART IDENTITY")
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                bench(conn, size)
+            elapsed = time.perf_counter() - start
+
+            results.append((name, size, elapsed, size / elapsed))
+    return results
+
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--config', default='test_database.ini')
+    parser.add_argument('--section', default='test_weather_database')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--max-per-row', type=int, default=max(BATCH_SIZES),
+                        help="skip the per-row path above this batch size")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(**load_config(args.config, args.section))
+    connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_BENCH_TABLE_COMMAND)
+
+        print(f"{'path':<12} {'rows':>8} {'seconds':>10} {'rows/sec':>12}")
+        for path, rows, seconds, rate in run(connection, args.sizes, args.max_per_row):
+            print(f"{path:<12} {rows:>8} {seconds:>10.3f} {rate:>12.0f}")
+
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        connection.close()
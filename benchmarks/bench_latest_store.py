@@ -0,0 +1,89 @@
+""" Benchmark of the memory used by the latest reading store for 100k cities,
+    compared with a dictionary of the row tuples psycopg2 returns, and of
+    its lookup rate. Needs no database:
+    python benchmarks/bench_latest_store.py
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import gc
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.weather_API_data.latest_store import LatestReadingStore
+
+
+
+
+CITY_COUNT = 100000
+
+
+
+
+def make_rows(count):
+    """ Return one weather_latest row per city, as psycopg2 would """
+    start = datetime(2024, 7, 4)
+    return [
+        (index, f"city_{index}", 20.0 + index % 150 / 10, 1000 + index % 30,
+         60 + index % 40, start + timedelta(seconds=index))
+        for index in range(count)
+    ]
+
+
+
+
+def measure(build):
+    """ Return the result of build() and the bytes it allocated """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+
+
+def run(count, lookups):
+    """ Measure both layouts, return (name, bytes, bytes per city, lookups/sec) """
+    # Names and row tuples are built outside the measurement, both layouts
+    # keep a reference to the same name strings
+    rows = make_rows(count)
+    names = [row[1] for row in rows]
+
+    def build_tuples():
+        return {row[1]: (row[0], row[1], float(row[2]), int(row[3]), int(row[4]),
+                         row[5] + timedelta(0)) for row in rows}
+
+    def build_store():
+        store = LatestReadingStore(max_cities=count)
+        store.update_many(rows)
+        return store
+
+    results = []
+    for name, build in (("dict of tuples", build_tuples), ("latest store", build_store)):
+        container, size = measure(build)
+        get = container.get
+        start = time.perf_counter()
+        for index in range(lookups):
+            get(names[index % count])
+        rate = lookups / (time.perf_counter() - start)
+        results.append((name, size, size / count, rate))
+        del container, get
+    return results
+
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=CITY_COUNT)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'layout':<16} {'bytes':>12} {'bytes/city':>11} {'lookups/sec':>12}")
+    for layout, total, per_city, lookup_rate in run(args.cities, args.lookups):
+        print(f"{layout:<16} {total:>12} {per_city:>11.1f} {lookup_rate:>12.0f}")
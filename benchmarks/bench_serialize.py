@@ -0,0 +1,70 @@
+""" Benchmark comparing jsonify of positional weather rows with the records
+    and columns layouts of the weather row serializer, reported in rows per
+    second and response bytes. Needs no database:
+    python benchmarks/bench_serialize.py
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+from flask import Flask, jsonify
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.weather_API_data.serializers import WEATHER_ROW_SERIALIZER
+
+
+
+
+ROW_COUNTS = [1000, 100000, 1000000]
+CITIES = ["Seoul", "pusan", "Malmö", "Stockholm", "Paris", "Taipei", "London"]
+
+
+
+
+def make_rows(count):
+    """ Return count weather_data rows as psycopg2 would, one reading a minute """
+    start = datetime(2024, 7, 4)
+    return [
+        (index, CITIES[index % len(CITIES)], 20.0 + index % 150 / 10, 1000 + index % 30,
+         60 + index % 40, start + timedelta(minutes=index))
+        for index in range(count)
+    ]
+
+
+
+
+def run(counts, repeat):
+    """ Serialize every row count in every layout, keep the best of repeat runs """
+    app = Flask(__name__)
+    layouts = [
+        ("jsonify", lambda rows: jsonify(rows).get_data()),
+        ("records", lambda rows: WEATHER_ROW_SERIALIZER.dumps(rows, 'records')),
+        ("columns", lambda rows: WEATHER_ROW_SERIALIZER.dumps(rows, 'columns')),
+    ]
+    results = []
+    with app.app_context():
+        for count in counts:
+            rows = make_rows(count)
+            for name, serialize in layouts:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    body = serialize(rows)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results.append((name, count, best, count / best, len(body)))
+    return results
+
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=ROW_COUNTS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'layout':<10} {'rows':>8} {'seconds':>10} {'rows/sec':>12} {'bytes':>12}")
+    for layout, rows, seconds, rate, size in run(args.rows, args.repeat):
+        print(f"{layout:<10} {rows:>8} {seconds:>10.3f} {rate:>12.0f} {size:>12}")
@@ -0,0 +1,342 @@
+""" Benchmark suite for the fetch, store and read hot paths.
+
+    Starts a throwaway PostgreSQL instance (testing.postgresql) and a local
+    stub of the weather API, runs every benchmark and writes the results as
+    JSON so that runs on different commits can be compared:
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import testing.postgresql
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api import app as weather_app
+from src.weather_API_data.db_pool import close_all_pools
+from src.weather_API_data.fetch_data import WeatherAPIClient
+from src.weather_API_data.migrations import run_migrations
+from src.weather_API_data.pipeline import IngestPipeline
+from src.weather_API_data.rate_limit import TokenBucket
+from src.weather_API_data.read_data import get_weather_data
+from src.weather_API_data.resilience import CircuitBreaker
+from src.weather_API_data.store_data import copy_many, ensure_partitions
+import bench_insert
+from stub_weather_api import StubWeatherAPI
+
+
+
+
+INSERT_SIZES = [10, 1000, 100000]
+READ_SIZES = [1000, 100000, 1000000]
+INGEST_CITY_COUNTS = [10, 100, 1000]
+READ_CITIES = 1000
+READ_REPEAT = 50
+READ_PAGE_SIZE = 500
+LOAD_CHUNK_ROWS = 100000
+API_REQUESTS = 500
+API_CONCURRENCY = 4
+HISTORY_DAYS = 365
+FILL_LATEST_COMMAND = """
+    INSERT INTO weather_latest (id, city_name, temperature, pressure, humidity, date_time)
+    SELECT DISTINCT ON (city_name) id, city_name, temperature, pressure, humidity, date_time
+    FROM weather_data
+    ORDER BY city_name, date_time DESC
+    ON CONFLICT (city_name) DO UPDATE SET
+        id = EXCLUDED.id,
+        temperature = EXCLUDED.temperature,
+        pressure = EXCLUDED.pressure,
+        humidity = EXCLUDED.humidity,
+        date_time = EXCLUDED.date_time
+"""
+
+
+
+
+def record(benchmark, case, metric, value, **extra):
+    """ Return one result entry, compared across runs by (benchmark, case, metric) """
+    return {'benchmark': benchmark, 'case': case, 'metric': metric, 'value': value, **extra}
+
+
+
+
+def percentile(samples, fraction):
+    """ Return the nearest-rank percentile of samples """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+
+
+def timed(function, *args, **kwargs):
+    """ Run function with its output silenced and return the seconds it took """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+
+
+def create_schema(db_conf):
+    """ Create the application tables, migrate them and add a year of partitions """
+    conn = psycopg2.connect(**db_conf)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(weather_app.CREATE_TABLE_COMMAND)
+            cur.execute(weather_app.CREATE_LATEST_TABLE_COMMAND)
+            cur.execute(bench_insert.CREATE_BENCH_TABLE_COMMAND)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_migrations(db_conf)
+            ensure_partitions(conn, 'month', ahead=13,
+                              now=datetime.now() - timedelta(days=HISTORY_DAYS))
+    finally:
+        conn.close()
+
+
+
+
+def bench_inserts(db_conf, sizes, max_per_row):
+    """ Rows/sec of the per-row and bulk insert paths """
+    conn = psycopg2.connect(**db_conf)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        return [
+            record('insert', f"{path}/{rows}", 'rows_per_sec', rate, rows=rows, seconds=seconds)
+            for path, rows, seconds, rate in bench_insert.run(conn, sizes, max_per_row)
+        ]
+    finally:
+        conn.close()
+
+
+
+
+def grow_weather_data(conn, current, size):
+    """ Add readings until weather_data holds size rows, spread over
+        READ_CITIES cities and the last HISTORY_DAYS days """
+    end = datetime.now()
+    step = timedelta(days=HISTORY_DAYS) / max(size, 1)
+    for start in range(current, size, LOAD_CHUNK_ROWS):
+        rows = [
+            (f"city_{index % READ_CITIES}", 20.0, 1000, 70, end - step * index)
+            for index in range(start, min(size, start + LOAD_CHUNK_ROWS))
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            copy_many(conn, rows)
+
+    with conn.cursor() as cur:
+        cur.execute(FILL_LATEST_COMMAND)
+        cur.execute("ANALYZE weather_data")
+        cur.execute("ANALYZE weather_latest")
+
+
+
+
+def bench_reads(db_conf, sizes, repeat):
+    """ get_weather_data latency for the latest reading and a history page,
+        as weather_data grows through sizes """
+    conn = psycopg2.connect(**db_conf)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    results = []
+    current = 0
+    try:
+        for size in sorted(sizes):
+            grow_weather_data(conn, current, size)
+            current = size
+
+            end = datetime.now()
+            start = end - timedelta(days=30)
+            queries = {
+                'latest': lambda city: get_weather_data(
+                    db_conf, "SELECT * FROM weather_latest", {'city_name': [city]}),
+                'history_page': lambda city: get_weather_data(
+                    db_conf, "SELECT * FROM weather_data", {'city_name': [city]},
+                    start, end, READ_PAGE_SIZE),
+            }
+            for name, query in queries.items():
+                samples = [timed(query, f"city_{index % READ_CITIES}") for index in range(repeat)]
+                results.append(record(
+                    'read', f"{name}/{size}", 'p50_ms', percentile(samples, 0.5) * 1000,
+                    rows=size, p95_ms=percentile(samples, 0.95) * 1000))
+    finally:
+        conn.close()
+    return results
+
+
+
+
+def bench_ingest(db_conf, api_url, city_counts, batch_size):
+    """ Seconds for a full fetch/write ingest cycle by number of cities """
+    client = WeatherAPIClient("bench-key", api_url, pool_size=weather_app.FETCH_WORKERS,
+                              rate_limiter=TokenBucket(rate=1e9, capacity=1e9),
+                              breaker=CircuitBreaker())
+    results = []
+    try:
+        for count in city_counts:
+            pipeline = IngestPipeline(
+                lambda chunk: client.fetch_many(chunk, batch_size),
+                lambda rows: weather_app.write_weather_rows(db_conf, rows),
+                workers=weather_app.FETCH_WORKERS,
+                fetch_batch_size=batch_size,
+                write_batch_size=weather_app.INGEST_WRITE_BATCH_SIZE,
+                flush_interval=weather_app.INGEST_FLUSH_SECONDS
+                )
+            for index in range(count):
+                pipeline.submit(f"ingest_city_{index}")
+
+            def cycle(pipeline=pipeline):
+                pipeline.start()
+                pipeline.close()
+
+            seconds = timed(cycle)
+            results.append(record(
+                'ingest', f"cities/{count}", 'seconds', seconds,
+                cities=count, cities_per_sec=count / seconds, errors=len(pipeline.errors)))
+    finally:
+        client.close()
+    return results
+
+
+
+
+def bench_api(requests_count, concurrency):
+    """ Requests/sec of /api/weather_data with and without the response cache """
+
+    def get_city_weather(index, cached):
+        if not cached:
+            weather_app.WEATHER_CACHE.invalidate()
+        with weather_app.app.test_client() as client:
+            response = client.get(f'/api/weather_data?city_name=city_{index % READ_CITIES}')
+            assert response.status_code == 200, response.status_code
+
+    results = []
+    for cached in (False, True):
+        def load(cached=cached):
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(lambda index: get_city_weather(index, cached),
+                                  range(requests_count)))
+
+        weather_app.WEATHER_CACHE.invalidate()
+        if cached:
+            timed(load)
+        seconds = timed(load)
+        case = f"{'cached' if cached else 'uncached'}/{concurrency}"
+        results.append(record('api', case, 'requests_per_sec', requests_count / seconds,
+                              requests=requests_count, concurrency=concurrency))
+    return results
+
+
+
+
+def git_revision():
+    """ Return the commit being benchmarked, None outside a git checkout """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+
+def compare(previous, current, threshold):
+    """ Print the change of every result also present in previous.
+        Returns the number of results that got worse by more than threshold. """
+    lower_is_better = {'seconds', 'p50_ms'}
+    before = {
+        (entry['benchmark'], entry['case'], entry['metric']): entry['value']
+        for entry in previous['results']
+    }
+
+    regressions = 0
+    print(f"\n{'benchmark':<8} {'case':<24} {'metric':<18} {'before':>12} {'after':>12} {'change':>8}")
+    for entry in current['results']:
+        key = (entry['benchmark'], entry['case'], entry['metric'])
+        if key not in before or not before[key]:
+            continue
+
+        change = (entry['value'] - before[key]) / before[key]
+        worse = change > threshold if entry['metric'] in lower_is_better else change < -threshold
+        regressions += worse
+        print(f"{key[0]:<8} {key[1]:<24} {key[2]:<18} {before[key]:>12.2f} "
+              f"{entry['value']:>12.2f} {change:>+8.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative change reported as a regression")
+    parser.add_argument('--insert-sizes', type=int, nargs='+', default=INSERT_SIZES)
+    parser.add_argument('--max-per-row', type=int, default=max(INSERT_SIZES))
+    parser.add_argument('--read-sizes', type=int, nargs='+', default=READ_SIZES,
+                        help="weather_data sizes, e.g. 1000 100000 1000000 10000000")
+    parser.add_argument('--read-repeat', type=int, default=READ_REPEAT)
+    parser.add_argument('--ingest-cities', type=int, nargs='+', default=INGEST_CITY_COUNTS)
+    parser.add_argument('--batch-size', type=int, default=weather_app.FETCH_BATCH_SIZE)
+    parser.add_argument('--api-latency', type=float, default=0.05,
+                        help="simulated weather API latency in seconds")
+    parser.add_argument('--api-requests', type=int, default=API_REQUESTS)
+    parser.add_argument('--api-concurrency', type=int, default=API_CONCURRENCY)
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'results': [],
+    }
+    working_dir = os.getcwd()
+
+    with testing.postgresql.Postgresql() as postgresql, \
+            StubWeatherAPI(latency=args.api_latency) as stub_api, \
+            tempfile.TemporaryDirectory() as config_dir:
+        db_conf = postgresql.dsn()
+        create_schema(db_conf)
+
+        # The endpoints read their database from database.ini in the
+        # working directory, point it at the throwaway instance
+        with open(os.path.join(config_dir, 'database.ini'), 'w', encoding='utf-8') as config:
+            config.write("[weather_info_database]\n")
+            config.writelines(f"{key} = {value}\n" for key, value in db_conf.items())
+
+        try:
+            report['results'].extend(bench_inserts(db_conf, args.insert_sizes, args.max_per_row))
+            report['results'].extend(bench_reads(db_conf, args.read_sizes, args.read_repeat))
+            report['results'].extend(
+                bench_ingest(db_conf, stub_api.url, args.ingest_cities, args.batch_size))
+            os.chdir(config_dir)
+            report['results'].extend(bench_api(args.api_requests, args.api_concurrency))
+        finally:
+            os.chdir(working_dir)
+            close_all_pools()
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2)
+
+    print(f"{'benchmark':<8} {'case':<24} {'metric':<18} {'value':>12}")
+    for result in report['results']:
+        print(f"{result['benchmark']:<8} {result['case']:<24} {result['metric']:<18} "
+              f"{result['value']:>12.2f}")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous_file:
+            sys.exit(1 if compare(json.load(previous_file), report, args.threshold) else 0)
@@ -0,0 +1,76 @@
+""" Local stub of a weatherstack-style weather API for the benchmarks.
+
+    Answers single (query=Seoul) and bulk (query=Seoul;Paris) lookups with a
+    fixed reading per city, after an optional simulated latency.
+"""
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+
+
+
+class StubWeatherAPIHandler(BaseHTTPRequestHandler):
+    """ Request handler of the stub API, see StubWeatherAPI """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query).get('query', [''])[0]
+        cities = query.split(';')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        readings = [
+            {
+                "location": {"name": city},
+                "current": {"temperature": len(city) % 40, "pressure": 1000, "humidity": 70},
+            }
+            for city in cities
+        ]
+        if len(readings) == 1:
+            body = readings[0]
+        elif self.server.bulk_supported:
+            body = readings
+        else:
+            body = {"success": False, "error": {"code": 604}}
+
+        payload = json.dumps(body).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+
+
+class StubWeatherAPI:
+    """ Stub API server running in a background thread, usable as a context manager """
+
+    def __init__(self, latency=0.0, bulk_supported=True):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubWeatherAPIHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.bulk_supported = bulk_supported
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """ Base URL of the stub API """
+        return f"http://127.0.0.1:{self.server.server_port}/current"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
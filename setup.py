@@ -20,8 +20,6 @@ setuptools.setup(
         'ConfigParser',
         'python-dotenv',
         'requests',
-        'ratelimit',
-        'retrying',
         'psycopg2-binary',
     ],
 )
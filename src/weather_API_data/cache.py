@@ -0,0 +1,101 @@
+""" Module providing an in-process read-through cache for API responses. """
+
+from collections import OrderedDict
+import threading
+import time
+
+
+
+
+DEFAULT_CACHE_MAX_ENTRIES = 1024
+DEFAULT_CACHE_TTL = 300
+
+
+
+
+class ResponseCache:
+    """ Thread-safe LRU cache with a size bound and a time to live.
+
+        invalidate() clears the cache and bumps a generation counter, so a
+        value loaded while a write was happening is never stored.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_MAX_ENTRIES, ttl=DEFAULT_CACHE_TTL,
+                 clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def generation(self):
+        """ Number of times the cache has been invalidated """
+        return self._generation
+
+    def get(self, key, default=None):
+        """ Return the cached value for key, or default on a miss """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+            self._misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        """ Store a value, unless the cache was invalidated since generation """
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key, loader):
+        """ Return the cached value for key, calling loader() to fill it on a miss """
+
+        missing = object()
+        generation = self._generation
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self):
+        """ Drop every entry and start a new generation """
+
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        """ Return a snapshot of the cache counters """
+
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'generation': self._generation,
+            }
@@ -0,0 +1,280 @@
+""" Module providing a thread-safe PostgreSQL connection pool shared
+    by the API request threads and the scheduler worker thread. """
+
+from contextlib import contextmanager
+import threading
+import time
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+from src.weather_API_data.profiling import span
+
+
+
+
+DEFAULT_MIN_CONNECTIONS = 1
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_CHECKOUT_TIMEOUT = 30.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+
+
+class ConnectionPool:
+    """ A bounded pool of autocommit connections to one database.
+
+        Connections idle for longer than health_check_interval are pinged
+        before they are handed out, and broken ones are replaced. getconn
+        waits up to timeout seconds for a free connection before raising
+        PoolError.
+    """
+
+    def __init__(self, db_conf, minconn=DEFAULT_MIN_CONNECTIONS,
+                 maxconn=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_CHECKOUT_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: minconn={minconn}, maxconn={maxconn}")
+
+        self.db_conf = dict(db_conf)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = {}
+        self._opened = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+        }
+
+        try:
+            for _ in range(minconn):
+                self._idle.append((self._connect(), time.monotonic()))
+                self._opened += 1
+
+        except Exception:
+            self.closeall()
+            raise
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_conf)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._cond:
+            self._counters['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+
+        except psycopg2.Error:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _release_slot(self):
+        with self._cond:
+            self._opened -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """ Check a connection out of the pool """
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        conn = None
+        last_used = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._opened < self.maxconn:
+                    self._opened += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolError(
+                        f"Timed out after {timeout}s waiting for a database connection")
+
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        if conn is not None and not self._is_healthy(conn, last_used):
+            print("Discarding broken database connection")
+            self._close_quietly(conn)
+            with self._cond:
+                self._counters['discarded'] += 1
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+
+        with self._cond:
+            self._in_use[id(conn)] = conn
+            self._counters['checkouts'] += 1
+
+        return conn
+
+    def putconn(self, conn, close=False):
+        """ Return a connection to the pool, closing it when asked to
+            or when it can not be reset to a clean autocommit state. """
+
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                raise PoolError("Trying to put back a connection that was not checked out")
+            closed = self._closed
+
+        if not close and not closed and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+
+            except psycopg2.Error:
+                close = True
+
+        if close or closed or conn.closed:
+            self._close_quietly(conn)
+            self._release_slot()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """ Borrow a connection for the duration of a with block """
+
+        with span('db_checkout'):
+            conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        """ Return a snapshot of the pool usage counters """
+
+        with self._cond:
+            stats = {
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'open': self._opened,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+            }
+            stats.update(self._counters)
+            return stats
+
+    def closeall(self):
+        """ Close every idle connection and refuse further checkouts.
+            Connections still checked out are closed when they are put back. """
+
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._opened -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+
+
+def _pool_key(db_conf):
+    return tuple(sorted(db_conf.items()))
+
+
+
+
+def get_pool(db_conf, **pool_options):
+    """ Return the process-wide pool for db_conf, creating it on first use.
+
+        pool_options are only applied when the pool is created, so set them
+        at startup before the first request or scheduled run.
+    """
+
+    key = _pool_key(db_conf)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+    if pool is not None:
+        return pool
+
+    # Opening the first connections can take up to the connect timeout, the
+    # lock is not held meanwhile so other databases stay reachable. When two
+    # threads race, the pool registered first wins and the other is closed
+    pool = ConnectionPool(db_conf, **pool_options)
+    with _POOLS_LOCK:
+        winner = _POOLS.setdefault(key, pool)
+    if winner is not pool:
+        pool.closeall()
+    return winner
+
+
+
+
+def all_pool_stats():
+    """ Return the statistics of every pool, keyed by host/database """
+
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+
+    return {
+        f"{pool.db_conf.get('host', '')}/{pool.db_conf.get('database', '')}": pool.stats()
+        for pool in pools
+    }
+
+
+
+
+def close_all_pools():
+    """ Close and forget every process-wide pool """
+
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+
+    for pool in pools:
+        pool.closeall()
@@ -1,33 +1,133 @@
 """ Module providing functions that load a config file
     and create a weather_table in postgres database. """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from configparser import ConfigParser
 import os
+import threading
+import time
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 import requests
-from ratelimit import limits, sleep_and_retry
-from retrying import retry
+from requests.adapters import HTTPAdapter
+from src.weather_API_data.metrics import OPERATION_SECONDS, API_REQUESTS, API_RETRIES
+from src.weather_API_data.rate_limit import rate_limiter_from_env
+from src.weather_API_data.resilience import (
+    WeatherAPIError,
+    RetryableWeatherAPIError,
+    CircuitOpenError,
+    backoff_delay,
+    parse_retry_after,
+    get_breaker
+)
 
 
 
 
 ONE_MINUTE = 60
+API_CALLS_PER_MINUTE = 60
+# Calls that may go back to back. Every call of burst beyond the first is
+# taken from the steady rate: a burst of 8 refills 53 calls a minute, a
+# burst of 1 spreads all API_CALLS_PER_MINUTE evenly
+DEFAULT_RATE_LIMIT_BURST = 1
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 8.0
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Weatherstack-style bulk queries join up to DEFAULT_BULK_SIZE locations
+# with ';', plans without bulk support answer with error code 604
+DEFAULT_BULK_SIZE = 10
+BULK_SEPARATOR = ';'
+BULK_NOT_SUPPORTED_CODE = 604
+NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
 
+# Parsed config files and loaded .env files, keyed by absolute path and
+# stored with the (mtime, size) signature of the file they were read from
+_CONFIG_CACHE = {}
+_ENV_CACHE = {}
+_CACHE_LOCK = threading.Lock()
 
+# Shared API clients, keyed by (api_key, api_base_url)
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
 
 
-def load_config(filename, section):
-    """ Load weatherInfoDb database configuration from config file """
+
+
+def _file_signature(path):
+    """ Return the (mtime, size) of a file, or None if it can not be read """
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+
+
+def _parse_config(filename):
+    """ Parse every section of a config file into plain dictionaries """
     parser = ConfigParser()
     parser.read(filename,  encoding='locale')
 
-    config = {}
+    return {section: dict(parser.items(section)) for section in parser.sections()}
+
+
+
+
+def invalidate_config_cache(filename=None):
+    """ Drop cached config and .env files so the next load reads them from disk.
+        Drops everything when no filename is given. """
+    with _CACHE_LOCK:
+        if filename is None:
+            _CONFIG_CACHE.clear()
+            _ENV_CACHE.clear()
+        else:
+            _CONFIG_CACHE.pop(os.path.abspath(filename), None)
+            _ENV_CACHE.pop(os.path.abspath(filename), None)
+
+
+
+
+def _load_sections(filename):
+    """ Return every section of a config file, parsed once and re-read
+        only when its mtime changes. """
+    key = os.path.abspath(filename)
+    signature = _file_signature(filename)
+
+    with _CACHE_LOCK:
+        cached = _CONFIG_CACHE.get(key)
+
+    if signature is not None and cached is not None and cached[0] == signature:
+        return cached[1]
+
+    sections = _parse_config(filename)
+    if signature is not None:
+        with _CACHE_LOCK:
+            _CONFIG_CACHE[key] = (signature, sections)
+    return sections
+
 
-    if parser.has_section(section):
-        params = parser.items(section)
-        for param in params:
-            config[param[0]] = param[1]
-        return config
+
+
+def config_sections(filename, prefix=''):
+    """ Return the names of the sections of a config file starting with prefix,
+        in file order. A missing file has no sections. """
+    return [section for section in _load_sections(filename) if section.startswith(prefix)]
+
+
+
+
+def load_config(filename, section):
+    """ Load weatherInfoDb database configuration from config file.
+        The file is parsed once and re-read only when its mtime changes. """
+    sections = _load_sections(filename)
+
+    if section in sections:
+        return dict(sections[section])
 
     raise ValueError(f"Section {section} not found in the {filename} file")
 
@@ -35,12 +135,23 @@ def load_config(filename, section):
 
 
 def env_config_loading(env_path):
-    """ Fetch configuration from .env file """
+    """ Fetch configuration from .env file.
+        The file is loaded once and re-loaded only when its mtime changes. """
     try:
-        load_dotenv(dotenv_path=env_path)
-        if not env_path.exists():
+        signature = _file_signature(env_path)
+        if signature is None:
             raise FileNotFoundError(".env file not found")
 
+        key = os.path.abspath(env_path)
+        with _CACHE_LOCK:
+            loaded = _ENV_CACHE.get(key)
+        if loaded != signature:
+            # The first load leaves variables set by the environment alone,
+            # a changed file replaces what its previous version set
+            load_dotenv(dotenv_path=env_path, override=loaded is not None)
+            with _CACHE_LOCK:
+                _ENV_CACHE[key] = signature
+
         api_key = os.getenv('API_KEY')
         if api_key is None or api_key == '':
             raise ValueError("api_key is not found in the .env file")
@@ -62,17 +173,280 @@ def env_config_loading(env_path):
 
 
 
-@sleep_and_retry
-@limits(calls=60, period=ONE_MINUTE)
-@retry(stop_max_attempt_number=3, wait_fixed=2000)
-def fetch_weather_data(city, api_key, api_base_url):
-    """ Fetch weather data from the API  """
-    url = f"{api_base_url}?access_key={api_key}&query={city}"
+class WeatherAPIClient:
+    """ Weather API client that keeps connections alive between calls.
 
-    try:
-        response = requests.get(url, timeout=10)
-        return response.json()
+        Requests go through a requests.Session whose connection pool holds up
+        to pool_size connections per host, so concurrent fetches reuse TCP and
+        TLS sessions instead of opening a new one per city. Every request first
+        takes a token from rate_limiter, which all threads using the client
+        share; by default it is built from the environment by
+        rate_limiter_from_env.
+
+        Network errors, 429 and 5xx answers are retried up to max_attempts
+        times with jittered exponential backoff, or after the Retry-After the
+        server asked for. Failures feed the circuit breaker of the API host,
+        which makes every client of that host fail fast while it is open.
+    """
+
+    def __init__(self, api_key, api_base_url, pool_size=DEFAULT_FETCH_WORKERS,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 keep_alive=True, rate_limiter=None, breaker=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_cap=DEFAULT_BACKOFF_CAP):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.api_key = api_key
+        self.api_base_url = api_base_url
+        self.timeout = (connect_timeout, read_timeout)
+        if rate_limiter is None:
+            rate_limiter = rate_limiter_from_env(
+                API_CALLS_PER_MINUTE, ONE_MINUTE, DEFAULT_RATE_LIMIT_BURST)
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker or get_breaker(urlsplit(api_base_url).netloc)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bulk_supported = True
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def _request(self, city):
+        """ Send one request, classify its failure and report it to the breaker """
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            API_REQUESTS.inc(outcome='circuit_open')
+            raise
+        params = {'access_key': self.api_key, 'query': city}
+
+        try:
+            self.rate_limiter.acquire()
+            response = self.session.get(self.api_base_url, params=params, timeout=self.timeout)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise RetryableWeatherAPIError(
+                    f"Weather API answered {response.status_code} for {city}",
+                    retry_after=parse_retry_after(response.headers.get('Retry-After')))
+            response_data = response.json() if response.ok else None
+
+        except RetryableWeatherAPIError:
+            API_REQUESTS.inc(outcome='retryable_error')
+            self.breaker.record_failure()
+            raise
+
+        except (*NETWORK_ERRORS, ValueError) as error:
+            API_REQUESTS.inc(outcome='retryable_error')
+            self.breaker.record_failure()
+            raise RetryableWeatherAPIError(f"Request for {city} failed: {error}") from error
+
+        except Exception as error:
+            API_REQUESTS.inc(outcome='error')
+            self.breaker.record_failure()
+            raise WeatherAPIError(f"Request for {city} failed: {error}") from error
+
+        self.breaker.record_success()
+        if response_data is None:
+            API_REQUESTS.inc(outcome='client_error')
+            raise WeatherAPIError(f"Weather API answered {response.status_code} for {city}")
+        API_REQUESTS.inc(outcome='ok')
+        return response_data
 
-    except (requests.RequestException , Exception) as error:
-        print(f"Failed request to fetch weather data : {error}")
+    @OPERATION_SECONDS.timed(operation='fetch_weather_data')
+    def fetch_or_raise(self, city):
+        """ Fetch weather data for one city, retrying transient failures.
+            Raises WeatherAPIError, or its subclasses, once it gives up. """
+        attempt = 0
+        while True:
+            try:
+                return self._request(city)
+
+            except RetryableWeatherAPIError as error:
+                attempt += 1
+                if attempt == self.max_attempts:
+                    raise
+                # A server asking for more than the backoff cap would stall
+                # the whole cycle, leave the city to the next one instead
+                if error.retry_after is not None and error.retry_after > self.backoff_cap:
+                    raise
+                delay = backoff_delay(attempt - 1, self.backoff_base, self.backoff_cap)
+                API_RETRIES.inc()
+                time.sleep(max(delay, error.retry_after or 0))
+
+    def fetch(self, city):
+        """ Fetch weather data for one city from the API, None if it failed """
+        try:
+            return self.fetch_or_raise(city)
+
+        except WeatherAPIError as error:
+            print(f"Failed request to fetch weather data : {error}")
+            return None
+
+    def _split_bulk(self, chunk, response_data):
+        """ Return the per-city results of a bulk response, None if it can not be split """
+        if isinstance(response_data, dict):
+            error = response_data.get('error')
+            if isinstance(error, dict) and error.get('code') == BULK_NOT_SUPPORTED_CODE:
+                print("Bulk queries are not supported by the weather API plan")
+                self.bulk_supported = False
+                return None
+
+        if isinstance(response_data, list) and len(response_data) == len(chunk):
+            # Locations come back in query order
+            return dict(zip(chunk, response_data))
+
+        print(f"Unexpected bulk response for {BULK_SEPARATOR.join(chunk)}")
         return None
+
+    def fetch_many(self, cities, batch_size=DEFAULT_BULK_SIZE):
+        """ Fetch weather data for several cities with as few requests as possible.
+
+            Cities are sent batch_size at a time as one bulk query (query=A;B;C)
+            and the combined response is split back per city. When the plan
+            refuses bulk queries, or a response can not be split, the cities
+            are fetched one by one; once refused, this client stops trying bulk.
+            Returns a (results, errors) tuple of dictionaries keyed by city name.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        results = {}
+        errors = {}
+        single = [city for city in cities if BULK_SEPARATOR in city]
+        bulk = [city for city in cities if BULK_SEPARATOR not in city]
+
+        for start in range(0, len(bulk), batch_size):
+            chunk = bulk[start:start + batch_size]
+            if len(chunk) > 1 and self.bulk_supported:
+                try:
+                    response_data = self.fetch_or_raise(BULK_SEPARATOR.join(chunk))
+                except WeatherAPIError as error:
+                    errors.update(dict.fromkeys(chunk, error))
+                    continue
+
+                split = self._split_bulk(chunk, response_data)
+                if split is not None:
+                    results.update(split)
+                    continue
+            single.extend(chunk)
+
+        for city in single:
+            try:
+                results[city] = self.fetch_or_raise(city)
+            except WeatherAPIError as error:
+                errors[city] = error
+
+        return results, errors
+
+    def close(self):
+        """ Close the pooled connections """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+
+
+def get_client(api_key, api_base_url, **client_options):
+    """ Return the shared client for an API key and base URL, creating it on first use.
+        client_options are only applied when the client is created. """
+    key = (api_key, api_base_url)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = WeatherAPIClient(api_key, api_base_url, **client_options)
+            _CLIENTS[key] = client
+        return client
+
+
+
+
+def close_clients():
+    """ Close and forget every shared client """
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+
+    for client in clients:
+        client.close()
+
+
+
+
+def fetch_weather_data(city, api_key, api_base_url):
+    """ Fetch weather data from the API through the shared keep-alive client """
+    return get_client(api_key, api_base_url).fetch(city)
+
+
+
+
+def fetch_weather_data_concurrently(cities, api_key, api_base_url,
+                                    max_workers=DEFAULT_FETCH_WORKERS, batch_size=1):
+    """ Fetch weather data for several cities with a bounded thread pool.
+
+        Every worker goes through the shared client, so the API rate limit and
+        circuit breaker are shared by all threads. With batch_size above one
+        each worker fetches a chunk of cities through bulk queries, see
+        WeatherAPIClient.fetch_many. Returns a (results, errors) tuple of
+        dictionaries keyed by city name, errors holding the WeatherAPIError
+        each failed city gave up with.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    results = {}
+    errors = {}
+    if not cities:
+        return results, errors
+
+    client = get_client(api_key, api_base_url)
+    if batch_size > 1:
+        chunks = [cities[start:start + batch_size] for start in range(0, len(cities), batch_size)]
+        workers = min(max_workers, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-fetch') as executor:
+            futures = {
+                executor.submit(client.fetch_many, chunk, batch_size): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                try:
+                    chunk_results, chunk_errors = future.result()
+                except Exception as error:
+                    errors.update(dict.fromkeys(futures[future], error))
+                    continue
+                results.update(chunk_results)
+                errors.update(chunk_errors)
+
+        return results, errors
+
+    workers = min(max_workers, len(cities))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-fetch') as executor:
+        futures = {
+            executor.submit(client.fetch_or_raise, city): city
+            for city in cities
+        }
+        for future in as_completed(futures):
+            city = futures[future]
+            try:
+                response_data = future.result()
+            except Exception as error:
+                errors[city] = error
+                continue
+
+            if response_data is None:
+                errors[city] = ValueError(f"No weather data returned for {city}")
+            else:
+                results[city] = response_data
+
+    return results, errors
@@ -0,0 +1,180 @@
+""" Module providing an in-process store of the latest reading of every city,
+    kept in compact typed arrays so that current-weather lookups need no
+    database round trip. """
+
+from array import array
+from datetime import datetime, timedelta
+import sys
+import threading
+
+
+
+
+DEFAULT_MAX_CITIES = 100000
+
+# Placeholders for NULL columns, in arrays that can not hold None
+MISSING_INT = -2 ** 63
+MISSING_FLOAT = float('nan')
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+
+
+def _to_micros(date_time):
+    if date_time is None:
+        return MISSING_INT
+    return (date_time - _EPOCH) // _MICROSECOND
+
+
+
+
+def _from_micros(micros):
+    if micros == MISSING_INT:
+        return None
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+
+
+class LatestReadingStore:
+    """ Latest weather_latest row of up to max_cities cities.
+
+        Every city gets a slot number from a city name dictionary, and each
+        column lives in its own typed array indexed by slot, which takes a
+        few dozen bytes per city instead of a tuple, a datetime and boxed
+        numbers. Rows are (id, city_name, temperature, pressure, humidity,
+        date_time) as in SELECT * FROM weather_latest; a row older than the
+        stored one is ignored, like the upsert of the table. Cities beyond
+        max_cities are not stored, their lookups go to the database.
+    """
+
+    def __init__(self, max_cities=DEFAULT_MAX_CITIES):
+        if max_cities < 1:
+            raise ValueError("max_cities must be at least 1")
+
+        self.max_cities = max_cities
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._ids = array('q')
+        self._temperatures = array('d')
+        self._pressures = array('q')
+        self._humidities = array('q')
+        self._times = array('q')
+        self._newest = MISSING_INT
+        self._rejected = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, city_name):
+        return city_name in self._slots
+
+    def _update(self, row):
+        row_id, city_name, temperature, pressure, humidity, date_time = row
+        micros = _to_micros(date_time)
+
+        slot = self._slots.get(city_name)
+        added = slot is None
+        if added:
+            if len(self._slots) >= self.max_cities:
+                self._rejected += 1
+                return False
+            self._slots[city_name] = len(self._ids)
+            self._ids.append(MISSING_INT)
+            self._temperatures.append(MISSING_FLOAT)
+            self._pressures.append(MISSING_INT)
+            self._humidities.append(MISSING_INT)
+            self._times.append(MISSING_INT)
+            slot = self._slots[city_name]
+
+        elif self._times[slot] != MISSING_INT and micros < self._times[slot]:
+            return False
+
+        row_id = MISSING_INT if row_id is None else int(row_id)
+        temperature = MISSING_FLOAT if temperature is None else float(temperature)
+        pressure = MISSING_INT if pressure is None else int(pressure)
+        humidity = MISSING_INT if humidity is None else int(humidity)
+
+        # The same reading read again is not an update
+        stored_temperature = self._temperatures[slot]
+        if (not added and micros == self._times[slot] and row_id == self._ids[slot]
+                and pressure == self._pressures[slot] and humidity == self._humidities[slot]
+                and (temperature == stored_temperature
+                     or temperature != temperature and stored_temperature != stored_temperature)):
+            return False
+
+        self._ids[slot] = row_id
+        self._temperatures[slot] = temperature
+        self._pressures[slot] = pressure
+        self._humidities[slot] = humidity
+        self._times[slot] = micros
+        self._newest = max(self._newest, micros)
+        return True
+
+    def update(self, row):
+        """ Store row unless a newer reading of its city, or the same
+            reading, is already stored, return whether it was stored """
+        with self._lock:
+            return self._update(row)
+
+    def update_many(self, rows):
+        """ Store every row of rows, return how many changed the store """
+        with self._lock:
+            return sum(1 for row in rows if self._update(row))
+
+    def get(self, city_name):
+        """ Return the latest row of city_name, or None if it is not stored """
+        with self._lock:
+            slot = self._slots.get(city_name)
+            if slot is None:
+                return None
+            row_id = self._ids[slot]
+            temperature = self._temperatures[slot]
+            pressure = self._pressures[slot]
+            humidity = self._humidities[slot]
+            micros = self._times[slot]
+
+        return (
+            None if row_id == MISSING_INT else row_id,
+            city_name,
+            None if temperature != temperature else temperature,
+            None if pressure == MISSING_INT else pressure,
+            None if humidity == MISSING_INT else humidity,
+            _from_micros(micros),
+        )
+
+    def newest_date_time(self):
+        """ Return the most recent reading time in the store, or None """
+        return _from_micros(self._newest)
+
+    def clear(self):
+        """ Drop every stored reading """
+        with self._lock:
+            self._slots.clear()
+            for column in (self._ids, self._temperatures, self._pressures,
+                           self._humidities, self._times):
+                del column[:]
+            self._newest = MISSING_INT
+            self._rejected = 0
+
+    def memory_usage(self):
+        """ Return the approximate bytes held by the store, names included """
+        with self._lock:
+            columns = (self._ids, self._temperatures, self._pressures,
+                       self._humidities, self._times)
+            return (
+                sys.getsizeof(self._slots)
+                + sum(sys.getsizeof(city_name) + sys.getsizeof(slot)
+                      for city_name, slot in self._slots.items())
+                + sum(sys.getsizeof(column) for column in columns)
+            )
+
+    def stats(self):
+        """ Return the number of cities, rejected cities and bytes used """
+        return {
+            'cities': len(self._slots),
+            'max_cities': self.max_cities,
+            'rejected': self._rejected,
+            'bytes': self.memory_usage(),
+        }
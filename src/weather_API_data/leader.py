@@ -0,0 +1,173 @@
+""" Module providing leader election between app processes through a
+    PostgreSQL session advisory lock, so that only one of them runs the
+    background ingest jobs. """
+
+import threading
+import time
+import psycopg2
+
+
+
+
+# Advisory lock held by the process that runs the scheduled jobs
+INGEST_LEADER_LOCK_ID = 7271002
+DEFAULT_HEARTBEAT_INTERVAL = 10.0
+
+# TCP keepalives on the lock connection, so that the server notices a
+# leader host that vanished without closing its socket and frees the lock
+LOCK_CONNECTION_OPTIONS = {
+    'connect_timeout': 5,
+    'keepalives': 1,
+    'keepalives_idle': 10,
+    'keepalives_interval': 5,
+    'keepalives_count': 3,
+}
+
+# Whether this session still holds the lock, in case it was released behind
+# our back (pg_advisory_unlock_all, a pooler reset, ...)
+HOLDS_LOCK_COMMAND = """SELECT EXISTS (
+    SELECT 1 FROM pg_locks
+    WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+        AND classid = %s AND objid = %s AND objsubid = 1
+)"""
+
+
+
+
+class LeaderElector:
+    """ Elects one leader among the processes sharing a database.
+
+        Every process keeps a dedicated connection, outside the pool so the
+        lock is never handed to another user, and tries pg_try_advisory_lock
+        on it. The session that gets the lock is the leader until it releases
+        it or its connection ends; the server then frees the lock and the next
+        follower to heartbeat takes over.
+
+        The heartbeat runs every heartbeat_interval seconds: the leader checks
+        that its session still holds the lock, and steps down at once when it
+        does not or when the connection fails; followers try to take the lock.
+        on_elected and on_demoted are called without arguments on each change.
+    """
+
+    def __init__(self, db_conf, lock_id=INGEST_LEADER_LOCK_ID,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, on_elected=None,
+                 on_demoted=None, connect=psycopg2.connect):
+        self.db_conf = dict(db_conf)
+        self.lock_id = lock_id
+        self.heartbeat_interval = heartbeat_interval
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._connect = connect
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._leader = False
+        self._counters = {
+            'elections': 0,
+            'demotions': 0,
+            'heartbeat_errors': 0,
+        }
+        self._last_heartbeat = None
+
+    @property
+    def is_leader(self):
+        """ True while this process holds the leader lock """
+        return self._leader
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            conn = self._connect(**{**LOCK_CONNECTION_OPTIONS, **self.db_conf})
+            conn.autocommit = True
+            self._conn = conn
+        return self._conn
+
+    def _drop_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def _set_leader(self, leader):
+        if leader == self._leader:
+            return
+        self._leader = leader
+        if leader:
+            self._counters['elections'] += 1
+            print(f"Elected leader for lock {self.lock_id}")
+            callback = self._on_elected
+        else:
+            self._counters['demotions'] += 1
+            print(f"Stepped down as leader for lock {self.lock_id}")
+            callback = self._on_demoted
+
+        if callback is not None:
+            try:
+                callback()
+            except Exception as error:
+                print(f"Leader change callback failed : {error}")
+
+    def heartbeat(self):
+        """ Confirm the lock if leader, otherwise try to take it.
+            Returns whether this process is the leader afterwards. """
+        with self._lock:
+            if self._stopped.is_set():
+                return False
+            try:
+                with self._connection().cursor() as cur:
+                    if self._leader:
+                        cur.execute(HOLDS_LOCK_COMMAND,
+                                    (self.lock_id >> 32, self.lock_id & 0xFFFFFFFF))
+                    else:
+                        cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_id,))
+                    leader = bool(cur.fetchone()[0])
+
+            except psycopg2.Error as error:
+                # The lock went with the session, or will once the server
+                # notices; either way another process may take over now
+                print(f"Leader heartbeat failed : {error}")
+                self._counters['heartbeat_errors'] += 1
+                self._drop_connection()
+                leader = False
+
+            self._last_heartbeat = time.time()
+            self._set_leader(leader)
+            return leader
+
+    def _run(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def start(self):
+        """ Run a first election, then heartbeat in a background thread """
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name='leader-heartbeat', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop the heartbeat and release the lock for the other processes """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._lock:
+            if self._leader and self._conn is not None and not self._conn.closed:
+                try:
+                    with self._conn.cursor() as cur:
+                        cur.execute("SELECT pg_advisory_unlock(%s)", (self.lock_id,))
+                except psycopg2.Error as error:
+                    print(f"Failed to release leader lock : {error}")
+            self._drop_connection()
+            self._set_leader(False)
+
+    def stats(self):
+        """ Return whether this process leads and its election counters """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['leader'] = self._leader
+        stats['last_heartbeat'] = self._last_heartbeat
+        return stats
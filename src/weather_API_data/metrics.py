@@ -0,0 +1,331 @@
+""" Module providing counters, gauges and latency histograms
+    exposed in the Prometheus text format. """
+
+from contextlib import contextmanager
+import functools
+import math
+import threading
+import time
+
+
+
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+
+
+class MetricsRegistry:
+    """ Set of metrics rendered together by render() """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        """ Add a metric, its name must be unique in the registry """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name):
+        """ Remove the metric called name """
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self):
+        """ Return every metric in the Prometheus text exposition format """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+
+
+class _ShardedMetric:
+    """ Metric whose values are kept per thread.
+
+        Each thread only ever writes to its own shard, so recording a value
+        takes no lock. Reads merge the shards; shards of finished threads are
+        folded into a single retired shard so short-lived worker threads do
+        not accumulate.
+    """
+
+    metric_type = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards_lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        if registry is not None:
+            registry.register(self)
+
+    def _label_key(self, labels):
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+
+    def _shard(self):
+        shard = getattr(self._local, 'values', None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._shards_lock:
+                self._retire_finished_threads()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_finished_threads(self):
+        """ Fold the shards of finished threads into the retired shard,
+            with _shards_lock held """
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+                continue
+            for key, values in shard.items():
+                self._retired[key] = self._combine(self._retired.get(key), values)
+        self._shards = live
+
+    def _combine(self, total, values):
+        """ Return total (None when empty) plus the values of one shard """
+        raise NotImplementedError
+
+    def _collect(self):
+        """ Return the merged values of every thread, keyed by label values """
+        with self._shards_lock:
+            self._retire_finished_threads()
+
+            merged = dict(self._retired)
+            for _, shard in self._shards:
+                for key, values in shard.copy().items():
+                    merged[key] = self._combine(merged.get(key), values)
+        return merged
+
+
+
+
+class Counter(_ShardedMetric):
+    """ Monotonically increasing count, e.g. requests or errors """
+
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """ Add amount to the counter of labels """
+        key = self._label_key(labels)
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def _combine(self, total, values):
+        return (total or 0) + values
+
+    def value(self, **labels):
+        """ Return the current total of labels """
+        return self._collect().get(self._label_key(labels), 0)
+
+    def render(self):
+        values = self._collect()
+        if not values and not self.labelnames:
+            values = {(): 0}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+
+
+class Histogram(_ShardedMetric):
+    """ Distribution of observed values, e.g. latencies in seconds """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS,
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, help_text, labelnames, registry)
+
+    def observe(self, value, **labels):
+        """ Record one observation """
+        key = self._label_key(labels)
+        shard = self._shard()
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """ Observe the seconds spent in the with block """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """ Decorator observing the seconds every call of the function takes """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _combine(self, total, values):
+        if total is None:
+            total = [[0] * len(self.buckets), 0.0, 0]
+        return [
+            [a + b for a, b in zip(total[0], values[0])],
+            total[1] + values[1],
+            total[2] + values[2],
+        ]
+
+    def count(self, **labels):
+        """ Return the number of observations of labels """
+        entry = self._collect().get(self._label_key(labels))
+        return 0 if entry is None else entry[2]
+
+    def render(self):
+        lines = []
+        for key, (bucket_counts, total, count) in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+
+
+class Gauge:
+    """ Value that goes up and down.
+
+        Either set explicitly, or read from function at every scrape; function
+        returns a number, or a dictionary of numbers keyed by label values.
+        With metric_type='counter' it exposes a total kept elsewhere, such as
+        the hit count of a cache.
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), function=None, metric_type=None,
+                 registry=REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        if metric_type is not None:
+            self.metric_type = metric_type
+        self._lock = threading.Lock()
+        self._values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def set(self, value, **labels):
+        """ Set the value of labels """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def values(self):
+        """ Return the current values keyed by label values """
+        if self.function is None:
+            with self._lock:
+                return dict(self._values)
+
+        values = self.function()
+        if isinstance(values, dict):
+            return {key if isinstance(key, tuple) else (key,): value
+                    for key, value in values.items()}
+        return {(): values}
+
+    def render(self):
+        try:
+            values = self.values()
+        except Exception as error:
+            print(f"Failed to collect metric {self.name} : {error}")
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+            if value is not None
+        ]
+
+
+
+
+# Metrics of the weather data hot paths
+OPERATION_SECONDS = Histogram(
+    'weather_operation_seconds',
+    'Latency of the fetch, store and read hot paths',
+    ('operation',))
+API_REQUESTS = Counter(
+    'weather_api_requests_total',
+    'Weather API requests by outcome',
+    ('outcome',))
+API_RETRIES = Counter(
+    'weather_api_retries_total',
+    'Weather API requests retried after a transient failure')
+RATE_LIMIT_WAITS = Counter(
+    'weather_api_rate_limit_waits_total',
+    'Times a caller slept waiting for a rate limit token')
+RATE_LIMIT_WAIT_SECONDS = Counter(
+    'weather_api_rate_limit_wait_seconds_total',
+    'Seconds spent waiting for rate limit tokens')
+DB_ERRORS = Counter(
+    'weather_db_errors_total',
+    'Database errors by operation',
+    ('operation',))
@@ -0,0 +1,251 @@
+""" Module providing a small versioned schema migration runner
+    for the weather database. """
+
+import psycopg2
+from src.weather_API_data.db_pool import get_pool
+from src.weather_API_data.store_data import transaction
+
+
+
+
+# Advisory lock taken while migrating, so that several processes starting
+# at the same time apply each migration exactly once
+MIGRATION_LOCK_ID = 7271001
+
+CREATE_SCHEMA_VERSION_COMMAND = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+"""
+
+def _rollup_count_statements(table, unit):
+    """ Statements giving table a count of the non-NULL readings of every
+        measure, with sums of 0 instead of NULL. Buckets whose readings are
+        still in weather_data are recomputed from them, the others, older
+        than the retention, count every reading of a measure with a sum. """
+    measures = ('temperature', 'pressure', 'humidity')
+    return [
+        f"ALTER TABLE {table} " + ", ".join(
+            f"ADD COLUMN {measure}_count INT NOT NULL DEFAULT 0" for measure in measures),
+        f"UPDATE {table} SET " + ", ".join(
+            f"{measure}_count = CASE WHEN {measure}_sum IS NULL THEN 0 ELSE reading_count END, "
+            f"{measure}_sum = COALESCE({measure}_sum, 0)" for measure in measures),
+        f"""INSERT INTO {table} AS rollup (
+                city_name, bucket, reading_count,
+                temperature_min, temperature_max, temperature_sum, temperature_count,
+                pressure_min, pressure_max, pressure_sum, pressure_count,
+                humidity_min, humidity_max, humidity_sum, humidity_count)
+            SELECT city_name, date_trunc('{unit}', date_time), count(*),
+                min(temperature), max(temperature),
+                COALESCE(sum(temperature), 0), count(temperature),
+                min(pressure), max(pressure), COALESCE(sum(pressure), 0), count(pressure),
+                min(humidity), max(humidity), COALESCE(sum(humidity), 0), count(humidity)
+            FROM weather_data
+            WHERE city_name IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (city_name, bucket) DO UPDATE SET
+                reading_count = EXCLUDED.reading_count, """ + ", ".join(
+            f"{measure}_{column} = EXCLUDED.{measure}_{column}"
+            for measure in measures for column in ('min', 'max', 'sum', 'count')),
+    ]
+
+
+
+
+# (version, description, statements), applied in version order
+MIGRATIONS = [
+    (
+        1,
+        "Composite index on weather_data (city_name, date_time DESC)",
+        ["""CREATE INDEX IF NOT EXISTS weather_data_city_time_idx
+            ON weather_data (city_name, date_time DESC)"""],
+    ),
+    (
+        2,
+        "BRIN index on weather_data (date_time)",
+        ["""CREATE INDEX IF NOT EXISTS weather_data_date_time_brin
+            ON weather_data USING BRIN (date_time)"""],
+    ),
+    (
+        3,
+        "Range partition weather_data on date_time",
+        [
+            "ALTER TABLE weather_data RENAME TO weather_data_unpartitioned",
+            "ALTER SEQUENCE weather_data_id_seq OWNED BY NONE",
+            """CREATE TABLE weather_data (
+                id INT NOT NULL DEFAULT nextval('weather_data_id_seq'),
+                city_name VARCHAR(255),
+                temperature FLOAT,
+                pressure INT,
+                humidity INT,
+                date_time TIMESTAMP NOT NULL,
+                PRIMARY KEY (id, date_time)
+            ) PARTITION BY RANGE (date_time)""",
+            "ALTER SEQUENCE weather_data_id_seq OWNED BY weather_data.id",
+            "CREATE TABLE weather_data_default PARTITION OF weather_data DEFAULT",
+            """INSERT INTO weather_data
+                (id, city_name, temperature, pressure, humidity, date_time)
+            SELECT id, city_name, temperature, pressure, humidity, date_time
+            FROM weather_data_unpartitioned
+            WHERE date_time IS NOT NULL""",
+            "DROP TABLE weather_data_unpartitioned",
+            """CREATE INDEX weather_data_city_time_idx
+            ON weather_data (city_name, date_time DESC)""",
+            """CREATE INDEX weather_data_date_time_brin
+            ON weather_data USING BRIN (date_time)""",
+        ],
+    ),
+    (
+        4,
+        "Keyset index on weather_data (city_name, date_time, id)",
+        [
+            """CREATE INDEX IF NOT EXISTS weather_data_city_time_id_idx
+            ON weather_data (city_name, date_time, id)""",
+            "DROP INDEX IF EXISTS weather_data_city_time_idx",
+        ],
+    ),
+    (
+        5,
+        "Hourly and daily per-city rollups of weather_data",
+        [
+            """CREATE TABLE IF NOT EXISTS weather_rollup_hourly (
+                city_name VARCHAR(255) NOT NULL,
+                bucket TIMESTAMP NOT NULL,
+                reading_count INT NOT NULL,
+                temperature_min FLOAT,
+                temperature_max FLOAT,
+                temperature_sum FLOAT,
+                pressure_min INT,
+                pressure_max INT,
+                pressure_sum BIGINT,
+                humidity_min INT,
+                humidity_max INT,
+                humidity_sum BIGINT,
+                PRIMARY KEY (city_name, bucket)
+            )""",
+            """INSERT INTO weather_rollup_hourly
+            SELECT city_name, date_trunc('hour', date_time), count(*),
+                min(temperature), max(temperature), sum(temperature),
+                min(pressure), max(pressure), sum(pressure),
+                min(humidity), max(humidity), sum(humidity)
+            FROM weather_data
+            WHERE city_name IS NOT NULL
+            GROUP BY 1, 2""",
+            """CREATE TABLE IF NOT EXISTS weather_rollup_daily (
+                city_name VARCHAR(255) NOT NULL,
+                bucket TIMESTAMP NOT NULL,
+                reading_count INT NOT NULL,
+                temperature_min FLOAT,
+                temperature_max FLOAT,
+                temperature_sum FLOAT,
+                pressure_min INT,
+                pressure_max INT,
+                pressure_sum BIGINT,
+                humidity_min INT,
+                humidity_max INT,
+                humidity_sum BIGINT,
+                PRIMARY KEY (city_name, bucket)
+            )""",
+            """INSERT INTO weather_rollup_daily
+            SELECT city_name, date_trunc('day', date_time), count(*),
+                min(temperature), max(temperature), sum(temperature),
+                min(pressure), max(pressure), sum(pressure),
+                min(humidity), max(humidity), sum(humidity)
+            FROM weather_data
+            WHERE city_name IS NOT NULL
+            GROUP BY 1, 2""",
+        ],
+    ),
+    (
+        6,
+        "Latest reading of every city in weather_latest",
+        [
+            """CREATE TABLE IF NOT EXISTS weather_latest (
+                id INT,
+                city_name VARCHAR(255) PRIMARY KEY,
+                temperature FLOAT,
+                pressure INT,
+                humidity INT,
+                date_time TIMESTAMP
+            )""",
+            # Current readings are served from this table, fill it from the
+            # history instead of waiting for the next fetch of every city
+            """INSERT INTO weather_latest
+                (id, city_name, temperature, pressure, humidity, date_time)
+            SELECT DISTINCT ON (city_name)
+                id, city_name, temperature, pressure, humidity, date_time
+            FROM weather_data
+            WHERE city_name IS NOT NULL
+            ORDER BY city_name, date_time DESC, id DESC
+            ON CONFLICT (city_name) DO UPDATE SET
+                id = EXCLUDED.id,
+                temperature = EXCLUDED.temperature,
+                pressure = EXCLUDED.pressure,
+                humidity = EXCLUDED.humidity,
+                date_time = EXCLUDED.date_time
+            WHERE weather_latest.date_time IS NULL
+                OR weather_latest.date_time < EXCLUDED.date_time""",
+        ],
+    ),
+    (
+        7,
+        "Per measure reading counts in the weather_data rollups",
+        _rollup_count_statements('weather_rollup_hourly', 'hour')
+        + _rollup_count_statements('weather_rollup_daily', 'day'),
+    ),
+]
+
+
+
+
+def get_schema_version(db_conf):
+    """ Return the highest applied schema version, 0 for a new database """
+
+    with get_pool(db_conf).connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_SCHEMA_VERSION_COMMAND)
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            return cur.fetchone()[0]
+
+
+
+
+def run_migrations(db_conf, migrations=None):
+    """ Apply every pending migration in version order.
+
+        Each migration runs in its own transaction together with the row that
+        records it in schema_version, so a failed migration leaves no trace and
+        is retried on the next start. Returns the versions applied by this call.
+    """
+
+    migrations = MIGRATIONS if migrations is None else migrations
+    applied = []
+
+    try:
+        with get_pool(db_conf).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CREATE_SCHEMA_VERSION_COMMAND)
+
+            for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+                with transaction(conn) as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                    cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (version,))
+                    if cur.fetchone() is not None:
+                        continue
+
+                    for statement in statements:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (version, description))
+
+                print(f"Applied schema migration {version}: {description}")
+                applied.append(version)
+
+        return applied
+
+    except psycopg2.DatabaseError as error:
+        print(f"Failed to migrate weather database : {error}")
+        raise
@@ -0,0 +1,216 @@
+""" Module providing a producer/consumer ingest pipeline that fetches
+    weather data and writes it to the database in separate stages. """
+
+import queue
+import threading
+import time
+from src.weather_API_data.store_data import build_weather_row
+
+
+
+
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_WRITE_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Queue marker that tells a stage to finish
+_STOP = object()
+
+
+
+
+class IngestPipeline:
+    """ Fetch workers and a writer connected by a bounded queue.
+
+        Submitted cities are fetched by worker threads, fetch_batch_size at a
+        time through fetch(cities), which returns a (results, errors) tuple
+        like WeatherAPIClient.fetch_many. Each result becomes a row through
+        build_row and waits in a queue of at most queue_size rows; a full queue
+        blocks the workers until the writer catches up. The writer hands rows
+        to write(rows) in micro-batches of write_batch_size, or whatever it
+        has after flush_interval seconds, so neither stage waits on the other
+        while both have work. close() drains both stages.
+
+        results holds the fetched responses and errors the error of every city
+        that failed to fetch, build or write, both keyed by city name; written
+        is the set of cities whose row reached the database.
+    """
+
+    def __init__(self, fetch, write, workers=DEFAULT_FETCH_WORKERS, fetch_batch_size=1,
+                 queue_size=DEFAULT_QUEUE_SIZE, write_batch_size=DEFAULT_WRITE_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, build_row=build_weather_row,
+                 clock=time.monotonic):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if fetch_batch_size < 1 or write_batch_size < 1:
+            raise ValueError("batch sizes must be at least 1")
+
+        self._fetch = fetch
+        self._write = write
+        self._build_row = build_row
+        self._clock = clock
+        self.fetch_batch_size = fetch_batch_size
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+
+        self._cities = queue.Queue()
+        self._rows = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._fetch_worker, name=f'ingest-fetch-{index}', daemon=True)
+            for index in range(workers)
+        ]
+        self._writer = threading.Thread(target=self._write_worker, name='ingest-write', daemon=True)
+
+        self.results = {}
+        self.errors = {}
+        self.written = set()
+        self._started_at = None
+        self._closed = False
+        self._counters = {
+            'submitted': 0,
+            'fetched': 0,
+            'fetch_errors': 0,
+            'written': 0,
+            'write_errors': 0,
+            'batches': 0,
+            'max_write_queue_depth': 0,
+        }
+
+    def start(self):
+        """ Start the fetch workers and the writer """
+        self._started_at = self._clock()
+        for worker in self._workers:
+            worker.start()
+        self._writer.start()
+        return self
+
+    def submit(self, city):
+        """ Queue a city for fetching """
+        if self._closed:
+            raise RuntimeError("Ingest pipeline is closed")
+        with self._lock:
+            self._counters['submitted'] += 1
+        self._cities.put(city)
+
+    def close(self):
+        """ Stop taking cities, fetch and write everything already queued """
+        if self._closed:
+            return
+        self._closed = True
+
+        for _ in self._workers:
+            self._cities.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._rows.put(_STOP)
+        self._writer.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _record_errors(self, errors, counter):
+        with self._lock:
+            self.errors.update(errors)
+            self._counters[counter] += len(errors)
+
+    def _fetch_worker(self):
+        while True:
+            city = self._cities.get()
+            if city is _STOP:
+                return
+
+            chunk = [city]
+            stop = False
+            while len(chunk) < self.fetch_batch_size:
+                try:
+                    city = self._cities.get_nowait()
+                except queue.Empty:
+                    break
+                if city is _STOP:
+                    stop = True
+                    break
+                chunk.append(city)
+
+            self._fetch_chunk(chunk)
+            if stop:
+                return
+
+    def _fetch_chunk(self, chunk):
+        try:
+            results, errors = self._fetch(chunk)
+        except Exception as error:
+            results, errors = {}, dict.fromkeys(chunk, error)
+
+        with self._lock:
+            self.results.update(results)
+            self._counters['fetched'] += len(results)
+        self._record_errors(errors, 'fetch_errors')
+
+        for city, response_data in results.items():
+            try:
+                row = self._build_row(city, response_data)
+            # Any malformed response, e.g. None or "current": null, fails
+            # its city only, the worker carries on with the others
+            except Exception as error:
+                self._record_errors({city: error}, 'fetch_errors')
+                continue
+
+            # Blocks while the writer is behind
+            self._rows.put((city, row))
+            with self._lock:
+                self._counters['max_write_queue_depth'] = max(
+                    self._counters['max_write_queue_depth'], self._rows.qsize())
+
+    def _write_worker(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - self._clock())
+            try:
+                item = self._rows.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                if not batch:
+                    deadline = self._clock() + self.flush_interval
+                batch.append(item)
+
+            if batch and (item is None or item is _STOP or len(batch) >= self.write_batch_size):
+                self._write_batch(batch)
+                batch = []
+                deadline = None
+
+            if item is _STOP:
+                return
+
+    def _write_batch(self, batch):
+        try:
+            self._write([row for _, row in batch])
+        except Exception as error:
+            print(f"Failed to write {len(batch)} weather readings : {error}")
+            self._record_errors({city: error for city, _ in batch}, 'write_errors')
+            return
+
+        with self._lock:
+            self.written.update(city for city, _ in batch)
+            self._counters['written'] += len(batch)
+            self._counters['batches'] += 1
+
+    def stats(self):
+        """ Return the stage counters, queue depths and rows per second """
+        with self._lock:
+            stats = dict(self._counters)
+
+        elapsed = 0.0 if self._started_at is None else self._clock() - self._started_at
+        stats['fetch_queue_depth'] = max(0, self._cities.qsize())
+        stats['write_queue_depth'] = self._rows.qsize()
+        stats['elapsed'] = elapsed
+        stats['fetch_rate'] = stats['fetched'] / elapsed if elapsed > 0 else 0.0
+        stats['write_rate'] = stats['written'] / elapsed if elapsed > 0 else 0.0
+        return stats
@@ -0,0 +1,253 @@
+""" Module providing opt-in request profiling: per-request phase timings,
+    a slow-query log and sampled cProfile dumps for the Flask API. """
+
+import cProfile
+import contextvars
+import itertools
+import os
+import time
+
+
+
+
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# Profile of the request being served by the current thread, None when
+# request profiling is off or outside of a request
+_CURRENT = contextvars.ContextVar('weather_request_profile', default=None)
+
+# Queries slower than this many seconds are logged, None disables the log
+_SLOW_QUERY_SECONDS = None
+
+
+
+
+class RequestProfile:
+    """ Time spent in each phase of one request, in the order first seen.
+
+        A phase entered several times, such as one query per page, is summed.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.spans = {}
+
+    def add(self, name, seconds):
+        """ Add seconds to the phase called name """
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+    def elapsed(self):
+        """ Seconds since the request started """
+        return self._clock() - self.started
+
+    def server_timing(self):
+        """ Return the phases as a Server-Timing header value """
+        entries = [f"{name};dur={total * 1000:.2f}" for name, (total, _) in self.spans.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+
+
+class _Span:
+    """ Context manager adding the seconds of its with block to a profile """
+
+    __slots__ = ('profile', 'name', 'start')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.add(self.name, time.perf_counter() - self.start)
+
+
+
+
+class _NullSpan:
+    """ Shared no-op stand-in for _Span and QueryTrace when profiling is off """
+
+    __slots__ = ()
+
+    rowcount = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+
+
+def span(name):
+    """ Time a with block as the phase name of the current request.
+        Does nothing, and costs a context variable lookup, when no request
+        is being profiled. """
+    profile = _CURRENT.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+
+
+class QueryTrace:
+    """ Context manager timing one database query.
+
+        The time is added to the 'query' phase of the current request, and
+        the query is printed with its parameters and row count when it takes
+        longer than the slow-query threshold. Set rowcount inside the block.
+    """
+
+    __slots__ = ('sql', 'params', 'rowcount', 'profile', 'start')
+
+    def __init__(self, sql, params, profile):
+        self.sql = sql
+        self.params = params
+        self.rowcount = None
+        self.profile = profile
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.add('query', seconds)
+
+        threshold = _SLOW_QUERY_SECONDS
+        if threshold is not None and seconds >= threshold:
+            sql = " ".join(self.sql.split())
+            print(f"Slow query ({seconds * 1000:.1f} ms, {self.rowcount} rows) : "
+                  f"{sql} params={self.params!r}")
+
+
+
+
+def trace_query(sql, params=None):
+    """ Return a QueryTrace for sql, or a shared no-op when neither the
+        slow-query log nor request profiling is on """
+    profile = _CURRENT.get()
+    if profile is None and _SLOW_QUERY_SECONDS is None:
+        return _NULL_SPAN
+    return QueryTrace(sql, params, profile)
+
+
+
+
+def set_slow_query_threshold(seconds):
+    """ Log queries slower than seconds, None turns the log off """
+    global _SLOW_QUERY_SECONDS
+    _SLOW_QUERY_SECONDS = None if seconds is None else float(seconds)
+
+
+
+
+class ProfileSampler:
+    """ Runs cProfile for one request in every sample_rate and writes
+        the stats to directory, one .prof file per sampled request. """
+
+    def __init__(self, sample_rate, directory=DEFAULT_PROFILE_DIR):
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be at least 1")
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self._requests = itertools.count()
+
+    def start(self):
+        """ Return a running profiler if this request is sampled, else None """
+        if next(self._requests) % self.sample_rate:
+            return None
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another request (or tool) is already profiling this process
+            return None
+        return profiler
+
+    def stop(self, profiler, label):
+        """ Stop profiler and dump its stats, return the file path """
+        profiler.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(
+            self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{label}.prof")
+        profiler.dump_stats(path)
+        return path
+
+
+
+
+def _env_flag(name):
+    return (os.getenv(name) or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+
+
+def init_app(app, spans=None, slow_query_seconds=None, sample_rate=None,
+             profile_dir=None):
+    """ Set up profiling for a Flask app, from the environment by default.
+
+        WEATHER_PROFILE_SPANS turns on per-request phase timings, returned in
+        the Server-Timing response header. WEATHER_SLOW_QUERY_SECONDS logs the
+        queries slower than that many seconds. WEATHER_PROFILE_SAMPLE_RATE=N
+        writes a cProfile dump of one request in N to WEATHER_PROFILE_DIR.
+        Nothing is hooked into the app when all of them are off.
+    """
+    if spans is None:
+        spans = _env_flag('WEATHER_PROFILE_SPANS')
+    if slow_query_seconds is None and os.getenv('WEATHER_SLOW_QUERY_SECONDS'):
+        slow_query_seconds = float(os.getenv('WEATHER_SLOW_QUERY_SECONDS'))
+    if sample_rate is None:
+        sample_rate = int(os.getenv('WEATHER_PROFILE_SAMPLE_RATE') or 0)
+    if profile_dir is None:
+        profile_dir = os.getenv('WEATHER_PROFILE_DIR') or DEFAULT_PROFILE_DIR
+
+    set_slow_query_threshold(slow_query_seconds)
+    sampler = ProfileSampler(sample_rate, profile_dir) if sample_rate else None
+    if not spans and sampler is None:
+        return None
+
+    # Imported here so the rest of the module works without Flask
+    from flask import g, request
+
+    @app.before_request
+    def start_request_profile():
+        if spans:
+            _CURRENT.set(RequestProfile())
+        if sampler is not None:
+            g.weather_profiler = sampler.start()
+
+    @app.after_request
+    def add_server_timing(response):
+        profile = _CURRENT.get()
+        if profile is not None:
+            response.headers['Server-Timing'] = profile.server_timing()
+        return response
+
+    @app.teardown_request
+    def finish_request_profile(error=None):
+        _CURRENT.set(None)
+        profiler = g.pop('weather_profiler', None)
+        if profiler is not None:
+            path = sampler.stop(profiler, request.endpoint or 'unknown')
+            print(f"Wrote request profile {path}")
+
+    return sampler
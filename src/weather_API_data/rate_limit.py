@@ -0,0 +1,180 @@
+""" Module providing token-bucket rate limiters shared by the
+    weather API client threads and, optionally, by several processes. """
+
+import os
+import threading
+import time
+from src.weather_API_data.metrics import RATE_LIMIT_WAITS, RATE_LIMIT_WAIT_SECONDS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+
+
+def _refill(tokens, updated, now, rate, capacity):
+    """ Return the tokens in a bucket last updated at updated, as of now """
+    elapsed = max(0.0, now - updated)
+    return min(capacity, tokens + elapsed * rate)
+
+
+
+
+class TokenBucket:
+    """ Thread-safe token bucket.
+
+        Tokens are added continuously at rate per second, up to capacity, and
+        every call takes one. Over any window of T seconds at most
+        capacity + rate * T calls go through, so bursts are bounded and the
+        quota is used evenly instead of in fixed windows.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _take(self, tokens):
+        """ Take tokens if available, return 0 or the seconds until they are """
+        with self._lock:
+            now = self._clock()
+            self._tokens = _refill(self._tokens, self._updated, now, self.rate, self.capacity)
+            self._updated = now
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def _check(self, tokens):
+        if tokens > self.capacity:
+            raise ValueError(f"Can not take {tokens} tokens from a bucket of {self.capacity}")
+
+    def try_acquire(self, tokens=1):
+        """ Take tokens without waiting, return False if the bucket is short """
+        self._check(tokens)
+        return self._take(tokens) == 0
+
+    def acquire(self, tokens=1, timeout=None):
+        """ Wait until tokens are available and take them.
+            Returns False if they can not be had within timeout seconds. """
+        self._check(tokens)
+        deadline = None if timeout is None else self._clock() + timeout
+
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining < wait:
+                    return False
+            RATE_LIMIT_WAITS.inc()
+            RATE_LIMIT_WAIT_SECONDS.inc(wait)
+            self._sleep(wait)
+
+
+
+
+class FileTokenBucket(TokenBucket):
+    """ Token bucket whose state lives in a file shared by several processes.
+
+        Every take locks the file, refills from the wall clock and writes the
+        bucket back, so gunicorn workers or separate schedulers pointed at the
+        same path draw from one quota. The in-process lock keeps threads from
+        contending on the file lock.
+    """
+
+    def __init__(self, path, rate, capacity=1, clock=time.time, sleep=time.sleep):
+        super().__init__(rate, capacity, clock, sleep)
+        self.path = path
+
+    def _take(self, tokens):
+        with self._lock:
+            with open(self.path, 'a+', encoding='utf-8') as state_file:
+                _lock_file(state_file)
+                try:
+                    state_file.seek(0)
+                    now = self._clock()
+                    try:
+                        stored, updated = (float(v) for v in state_file.read().split())
+                    except ValueError:
+                        stored, updated = self.capacity, now
+
+                    available = _refill(stored, updated, now, self.rate, self.capacity)
+                    wait = 0.0
+                    if available >= tokens:
+                        available -= tokens
+                    else:
+                        wait = (tokens - available) / self.rate
+
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(f"{available!r} {now!r}")
+                    state_file.flush()
+                    return wait
+
+                finally:
+                    _unlock_file(state_file)
+
+
+
+
+def _lock_file(state_file):
+    """ Block until the calling process holds the lock on state_file """
+    if fcntl is not None:
+        fcntl.flock(state_file.fileno(), fcntl.LOCK_EX)
+    else:
+        state_file.seek(0)
+        msvcrt.locking(state_file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+
+
+def _unlock_file(state_file):
+    """ Release the lock taken by _lock_file """
+    if fcntl is not None:
+        fcntl.flock(state_file.fileno(), fcntl.LOCK_UN)
+    else:
+        state_file.seek(0)
+        msvcrt.locking(state_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+
+
+def rate_limiter_from_env(default_calls, period, default_burst):
+    """ Build the API rate limiter from the environment.
+
+        At most API_RATE_LIMIT_CALLS calls in any period seconds, of which
+        up to API_RATE_LIMIT_BURST may be made back to back. The bucket
+        starts full and its last burst token is only spent once it has
+        refilled, so any period seconds hold burst - 1 + rate * period
+        calls: the rate is what the burst leaves of the quota, and a burst
+        of 1 uses all of it. When API_RATE_LIMIT_FILE is set the bucket is
+        shared through that file by every process using it.
+    """
+    calls = int(os.getenv('API_RATE_LIMIT_CALLS') or default_calls)
+    burst = int(os.getenv('API_RATE_LIMIT_BURST') or default_burst)
+    state_path = os.getenv('API_RATE_LIMIT_FILE')
+    if calls < 1:
+        raise ValueError("API_RATE_LIMIT_CALLS must be at least 1")
+
+    burst = max(1, min(burst, calls))
+    rate = (calls - burst + 1) / period
+
+    if state_path:
+        return FileTokenBucket(state_path, rate, burst)
+    return TokenBucket(rate, burst)
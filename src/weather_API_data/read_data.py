@@ -1,54 +1,226 @@
 """ Module providing functions that reads weather data from the postgres database. """
 
+import base64
+import binascii
+from datetime import datetime
+import itertools
+import json
 import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from src.weather_API_data.db_pool import get_pool
+from src.weather_API_data.metrics import OPERATION_SECONDS, DB_ERRORS
+from src.weather_API_data.profiling import span, trace_query
+from src.weather_API_data.store_data import ROLLUP_TABLES
 
 
 
 
-def get_weather_data(db_conf, command, filters=None):
-    """ Retrieve data from the weather_data table """
+DEFAULT_ITERSIZE = 2000
+_STREAM_CURSOR_IDS = itertools.count()
+
+# Positions of the keyset columns in a SELECT * row of weather_data
+ID_COLUMN = 0
+DATE_TIME_COLUMN = 5
+
+AGGREGATE_FIELDS = (
+    'city_name', 'bucket', 'reading_count',
+    'temperature_min', 'temperature_max', 'temperature_avg',
+    'pressure_min', 'pressure_max', 'pressure_avg',
+    'humidity_min', 'humidity_max', 'humidity_avg',
+)
+# Averages are over the readings that have the measure, NULL without any
+SELECT_AGGREGATES_COMMAND = """SELECT city_name, bucket, reading_count,
+    temperature_min, temperature_max, temperature_sum / NULLIF(temperature_count, 0),
+    pressure_min, pressure_max, pressure_sum::float / NULLIF(pressure_count, 0),
+    humidity_min, humidity_max, humidity_sum::float / NULLIF(humidity_count, 0)
+    FROM {}"""
+
+
+
+
+def encode_cursor(row):
+    """ Return the opaque page token pointing just after row """
+
+    key = [row[DATE_TIME_COLUMN].isoformat(), row[ID_COLUMN]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+
+
+def decode_cursor(token):
+    """ Return the (date_time, id) keyset position stored in a page token """
+
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_time, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date_time), int(row_id)
+
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise ValueError(f"Invalid page cursor {token}") from error
+
+
+
+
+def next_cursor(rows, limit):
+    """ Return the token of the page after rows, or None on the last page """
+
+    if limit is not None and rows and len(rows) >= limit:
+        return encode_cursor(rows[-1])
+    return None
+
+
+
+
+def build_query(command, filters=None, start=None, end=None, after=None, limit=None):
+    """ Append the WHERE clause for filters to command and return it with its parameters.
+
+        start and end bound date_time to [start, end). after is a (date_time, id)
+        keyset position; with after or limit the rows are ordered by
+        (date_time, id), so each page seeks straight to its first row.
+    """
+
+    params = []
+    filter_clauses = []
+    if filters:
+        filter_clauses = [
+            f"{key} IN ({','.join(['%s'] * len(value))})" if isinstance(value, list)
+            else f"{key} = %s"
+            for key, value in filters.items()
+        ]
+
+        params = [
+            item
+            for sublist in(
+                [value] if not isinstance(value, list) else value
+                for value in filters.values()
+                )
+                for item in sublist
+                ]
+
+    if start is not None:
+        filter_clauses.append("date_time >= %s")
+        params.append(start)
+    if end is not None:
+        filter_clauses.append("date_time < %s")
+        params.append(end)
+    if after is not None:
+        filter_clauses.append("(date_time, id) > (%s, %s)")
+        params.extend(after)
+
+    if filter_clauses:
+        command += " WHERE " + " AND ".join(filter_clauses)
+
+    if after is not None or limit is not None:
+        command += " ORDER BY date_time, id"
+    if limit is not None:
+        command += " LIMIT %s"
+        params.append(limit)
+
+    return command, params
+
+
+
+
+@OPERATION_SECONDS.timed(operation='get_weather_data')
+def get_weather_data(db_conf, command, filters=None, start=None, end=None,
+                     limit=None, cursor=None):
+    """ Retrieve data from the weather_data table.
+
+        start and end restrict date_time to [start, end). With limit, at most
+        limit rows ordered by (date_time, id) are returned; pass the token from
+        next_cursor(rows, limit) as cursor to read the following page.
+    """
+
+    after = decode_cursor(cursor) if cursor else None
 
     try:
-        with psycopg2.connect(**db_conf) as conn:
-            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-
-            with conn.cursor() as cur:  
-                params = []
-                if filters:
-                    filter_clauses = [
-                        f"{key} IN ({','.join(['%s'] * len(value))})" if isinstance(value, list)
-                        else f"{key} = %s"
-                        for key, value in filters.items()
-                    ]
-
-                    if filter_clauses:
-                        command += " WHERE " + " AND ".join(filter_clauses)
-
-                    params = [
-                        item
-                        for sublist in(
-                            [value] if not isinstance(value, list) else value
-                            for value in filters.values()
-                            )
-                            for item in sublist
-                            ]
-
-                else:
-                    params = []
-
-                new_var = command
-                rows = cur.execute(new_var, params)
-                print("The number of cities: ", cur.rowcount)
-
-                rows = cur.fetchall()
-        
+        with get_pool(db_conf).connection() as conn:
+            with conn.cursor() as cur:
+                new_var, params = build_query(command, filters, start, end, after, limit)
+                with trace_query(new_var, params) as trace:
+                    with span('execute'):
+                        cur.execute(new_var, params)
+                    print("The number of cities: ", cur.rowcount)
+
+                    with span('fetchall'):
+                        rows = cur.fetchall()
+                    trace.rowcount = cur.rowcount
+
                 return rows
 
     except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='get_weather_data')
         print(f"Error connecting to database {error}")
         raise
 
     except Exception as error:
         print(f"Exception occured {error}")
         raise
+
+
+
+
+def iter_weather_data(db_conf, command, filters=None, itersize=DEFAULT_ITERSIZE,
+                      start=None, end=None):
+    """ Yield rows from the weather_data table without loading them all at once.
+
+        Rows are read through a server-side (named) cursor, itersize rows per
+        round trip, so memory stays flat however large the result is. The
+        pooled connection is held until the generator is exhausted or closed.
+    """
+
+    new_var, params = build_query(command, filters, start, end)
+
+    try:
+        with get_pool(db_conf).connection() as conn:
+            # Named cursors only live inside a transaction, the pool rolls
+            # it back and restores autocommit when the connection returns
+            conn.autocommit = False
+            with conn.cursor(name=f"weather_stream_{next(_STREAM_CURSOR_IDS)}") as cur:
+                cur.itersize = itersize
+                cur.execute(new_var, params)
+                yield from cur
+
+    except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='iter_weather_data')
+        print(f"Error connecting to database {error}")
+        raise
+
+
+
+
+@OPERATION_SECONDS.timed(operation='get_weather_aggregates')
+def get_weather_aggregates(db_conf, city_names, granularity='hour', start=None, end=None):
+    """ Retrieve per-city min/max/avg/count buckets from the rollup tables.
+
+        Rows follow AGGREGATE_FIELDS, ordered by city and bucket. start and
+        end restrict the bucket start to [start, end).
+    """
+
+    if granularity not in ROLLUP_TABLES:
+        raise ValueError(f"Unsupported granularity {granularity}, use 'hour' or 'day'")
+    if not city_names:
+        raise ValueError("At least one city name is required")
+
+    command = SELECT_AGGREGATES_COMMAND.format(ROLLUP_TABLES[granularity])
+    command, params = build_query(command, {'city_name': list(city_names)})
+    if start is not None:
+        command += " AND bucket >= %s"
+        params.append(start)
+    if end is not None:
+        command += " AND bucket < %s"
+        params.append(end)
+    command += " ORDER BY city_name, bucket"
+
+    try:
+        with get_pool(db_conf).connection() as conn:
+            with conn.cursor() as cur:
+                with trace_query(command, params) as trace:
+                    cur.execute(command, params)
+                    rows = cur.fetchall()
+                    trace.rowcount = cur.rowcount
+                return rows
+
+    except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='get_weather_aggregates')
+        print(f"Error connecting to database {error}")
+        raise
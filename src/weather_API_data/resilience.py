@@ -0,0 +1,167 @@
+""" Module providing the error classes, retry backoff and per-host
+    circuit breakers used by the weather API client. """
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+
+
+
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Shared circuit breakers, keyed by API host
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+
+
+class WeatherAPIError(Exception):
+    """ A request to the weather API failed and retrying it will not help """
+
+
+
+
+class RetryableWeatherAPIError(WeatherAPIError):
+    """ A request to the weather API failed transiently (network error,
+        429 or 5xx). retry_after holds the delay asked for by the server. """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+
+
+class CircuitOpenError(WeatherAPIError):
+    """ The API host is failing, requests are refused until retry_after seconds """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+
+
+def backoff_delay(attempt, base, cap):
+    """ Return the delay before retry number attempt (from 0), using
+        exponential backoff with full jitter. """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+
+
+def parse_retry_after(value, now=None):
+    """ Return the seconds asked for by a Retry-After header, or None.
+        The header holds either a number of seconds or an HTTP date. """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+
+
+class CircuitBreaker:
+    """ Circuit breaker for one API host.
+
+        After failure_threshold consecutive failures the circuit opens and
+        allow() raises CircuitOpenError without touching the network. Once
+        reset_timeout seconds have passed a single trial request is let
+        through (half open): its success closes the circuit, its failure
+        opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self):
+        """ closed, open or half_open """
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """ Raise CircuitOpenError unless a request may be sent now """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+
+            remaining = self._opened_at + self.reset_timeout - self._clock()
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+                return
+
+            raise CircuitOpenError("Weather API circuit is open", max(0.0, remaining))
+
+    def record_success(self):
+        """ Close the circuit after a request reached the host """
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        """ Count a failed request, opening the circuit at the threshold """
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"Weather API circuit opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def stats(self):
+        """ Return the state and the consecutive failure count """
+        with self._lock:
+            return {'state': self._state, 'failures': self._failures}
+
+
+
+
+def get_breaker(host, **breaker_options):
+    """ Return the shared circuit breaker of an API host, creating it on first use.
+        breaker_options are only applied when the breaker is created. """
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(**breaker_options)
+            _BREAKERS[host] = breaker
+        return breaker
+
+
+
+
+def reset_breakers():
+    """ Forget every shared circuit breaker """
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,310 @@
+""" Module providing read-replica routing: read queries go to healthy,
+    caught-up replicas, writes and DDL stay on the primary database. """
+
+import itertools
+import os
+import threading
+import time
+import psycopg2
+from psycopg2.pool import PoolError
+from src.weather_API_data.db_pool import get_pool
+from src.weather_API_data.fetch_data import config_sections, load_config
+
+
+
+
+ROUTING_SECTION = 'read_routing'
+REPLICA_SECTION_SUFFIX = '_replica'
+STRATEGIES = ('round_robin', 'least_loaded')
+DEFAULT_STRATEGY = 'round_robin'
+DEFAULT_MAX_LAG_SECONDS = 30.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 10.0
+REPLICA_CHECKOUT_TIMEOUT = 2.0
+# Seconds psycopg2.connect may take for a replica that does not set its
+# own connect_timeout, so a blackholed host fails fast
+REPLICA_CONNECT_TIMEOUT = 2
+
+# Replication state of a database: whether it is a standby, whether a WAL
+# receiver runs and its status, the WAL received so far in bytes, whether
+# all of it is replayed and the age of the last replayed transaction.
+# The status is only visible to superusers and members of pg_read_all_stats,
+# other roles read NULL; the receiver row itself is visible to every role
+REPLICATION_STATUS_COMMAND = """SELECT pg_is_in_recovery(),
+    (SELECT count(*) FROM pg_stat_wal_receiver),
+    (SELECT status FROM pg_stat_wal_receiver LIMIT 1),
+    pg_wal_lsn_diff(pg_last_wal_receive_lsn(), '0/0'),
+    pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn(),
+    EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"""
+
+# Errors of a replica that is down or unreachable, as opposed to errors
+# of the query itself, which would fail the same way on the primary
+REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError)
+
+# Routers built from config files, keyed by (path, section)
+_ROUTERS = {}
+_ROUTERS_LOCK = threading.Lock()
+
+
+
+
+class ReadRouter:
+    """ Picks the database connection settings of every read query.
+
+        Reads go to the replicas, in turn with the round_robin strategy or to
+        the one whose pool has the fewest busy connections with least_loaded.
+        A replica is only used once a health check succeeded and found it at
+        most max_lag seconds behind, and until one fails. Reads never wait on
+        a check: the read that finds checks due starts them in a background
+        thread, every health_check_interval seconds, one thread at a time.
+        Without a usable replica, reads go to the primary.
+    """
+
+    def __init__(self, replicas=(), strategy=DEFAULT_STRATEGY,
+                 max_lag=DEFAULT_MAX_LAG_SECONDS,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL, clock=time.monotonic):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unsupported strategy {strategy}, use one of {', '.join(STRATEGIES)}")
+
+        self.replicas = [
+            {'connect_timeout': REPLICA_CONNECT_TIMEOUT, **replica} for replica in replicas]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.health_check_interval = health_check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._turns = itertools.count()
+        self._checker = None
+        # Per replica: healthy, lag in seconds, time of the last check, WAL
+        # received by then and whether the receiver status was hidden
+        self._health = [
+            {'healthy': False, 'lag': None, 'checked_at': None,
+             'received': None, 'status_hidden': False}
+            for _ in self.replicas
+        ]
+        self._counters = {
+            'replica_reads': 0,
+            'primary_reads': 0,
+            'fallbacks': 0,
+        }
+
+    def _due(self, health, now):
+        return (health['checked_at'] is None
+                or now - health['checked_at'] >= self.health_check_interval)
+
+    def _lag(self, index, status_row):
+        """ Return the seconds replica index is behind its primary, or None
+            when its WAL receiver is known not to be streaming.
+
+            A replica that replayed all it received is caught up only while
+            it streams: a disconnected one replays everything it got and then
+            looks caught up however far the primary has moved on. When the
+            role can not read the receiver status, the replica counts as
+            streaming if it received WAL since the previous check, otherwise
+            its lag is the age of its last replayed transaction, which keeps
+            growing once it is cut off.
+        """
+        in_recovery, receivers, status, received, replayed_all, replay_age = status_row
+        if not in_recovery:
+            return 0.0
+
+        describe = _describe(self.replicas[index])
+        if not receivers or status not in (None, 'streaming'):
+            print(f"Read replica {describe} is not streaming from its primary")
+            return None
+
+        with self._lock:
+            health = self._health[index]
+            previous, health['received'] = health['received'], received
+            status_hidden, health['status_hidden'] = health['status_hidden'], status is None
+
+        if status is None:
+            if not status_hidden:
+                print(f"Read replica {describe} hides its WAL receiver status from this role, "
+                      f"grant it pg_read_all_stats or pg_monitor; the replica is checked "
+                      f"by the WAL it receives instead")
+            streaming = previous is not None and received is not None and received > previous
+        else:
+            streaming = True
+
+        if streaming and replayed_all:
+            return 0.0
+        return None if replay_age is None else max(0.0, float(replay_age))
+
+    def _check(self, index):
+        """ Measure the lag of replica index and update its health """
+        lag = None
+        try:
+            pool = get_pool(self.replicas[index])
+            with pool.connection(timeout=REPLICA_CHECKOUT_TIMEOUT) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICATION_STATUS_COMMAND)
+                    status_row = cur.fetchone()
+            lag = self._lag(index, status_row)
+
+        except REPLICA_ERRORS as error:
+            print(f"Read replica {_describe(self.replicas[index])} is unavailable : {error}")
+
+        with self._lock:
+            health = self._health[index]
+            health['lag'] = lag
+            health['healthy'] = lag is not None and lag <= self.max_lag
+            health['checked_at'] = self._clock()
+
+    def check_replicas(self):
+        """ Health check, in the calling thread, every replica whose last
+            check is at least health_check_interval seconds old """
+        now = self._clock()
+        for index, health in enumerate(self._health):
+            if self._due(health, now):
+                self._check(index)
+
+    def _run_checks(self):
+        try:
+            self.check_replicas()
+        finally:
+            with self._lock:
+                self._checker = None
+
+    def _start_checks(self):
+        """ Start check_replicas in a background thread if checks are due
+            and no check is running """
+        now = self._clock()
+        with self._lock:
+            if self._checker is not None:
+                return
+            if not any(self._due(health, now) for health in self._health):
+                return
+            self._checker = threading.Thread(
+                target=self._run_checks, name='replica-health-check', daemon=True)
+            checker = self._checker
+        checker.start()
+
+    def _usable(self):
+        self._start_checks()
+        with self._lock:
+            return [index for index, health in enumerate(self._health) if health['healthy']]
+
+    def choose(self):
+        """ Return the settings of the replica to read from, or None for the primary """
+        if not self.replicas:
+            return None
+
+        usable = self._usable()
+        if not usable:
+            return None
+
+        turn = next(self._turns)
+        if self.strategy == 'least_loaded':
+            def busy(index):
+                stats = get_pool(self.replicas[index]).stats()
+                return stats['in_use'] + stats['waiting']
+            # Replicas equally busy still take turns
+            usable = usable[turn % len(usable):] + usable[:turn % len(usable)]
+            return self.replicas[min(usable, key=busy)]
+        return self.replicas[usable[turn % len(usable)]]
+
+    def mark_failed(self, replica):
+        """ Stop reading from replica until its next successful health check """
+        with self._lock:
+            for index, candidate in enumerate(self.replicas):
+                if candidate == replica:
+                    self._health[index]['healthy'] = False
+                    self._health[index]['checked_at'] = self._clock()
+
+    def read_conf(self, primary_conf):
+        """ Return the settings to run a read query with """
+        replica = self.choose()
+        with self._lock:
+            self._counters['replica_reads' if replica is not None else 'primary_reads'] += 1
+        return primary_conf if replica is None else replica
+
+    def read(self, primary_conf, function, *args, **kwargs):
+        """ Run function(db_conf, *args, **kwargs) on a replica, or on the
+            primary when no replica is usable or the chosen one fails """
+        db_conf = self.read_conf(primary_conf)
+        if db_conf is primary_conf:
+            return function(db_conf, *args, **kwargs)
+
+        try:
+            return function(db_conf, *args, **kwargs)
+
+        except REPLICA_ERRORS as error:
+            print(f"Read on replica {_describe(db_conf)} failed, using the primary : {error}")
+            self.mark_failed(db_conf)
+            with self._lock:
+                self._counters['fallbacks'] += 1
+            return function(primary_conf, *args, **kwargs)
+
+    def stats(self):
+        """ Return the read counters and the health of every replica """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['replicas'] = {
+                _describe(replica): {'healthy': health['healthy'], 'lag': health['lag']}
+                for replica, health in zip(self.replicas, self._health)
+            }
+        return stats
+
+
+
+
+def _describe(db_conf):
+    return f"{db_conf.get('host', '')}:{db_conf.get('port', '')}/{db_conf.get('database', '')}"
+
+
+
+
+def load_replica_configs(filename, section):
+    """ Return the settings of the replicas of section, from the sections
+        named section + '_replica' followed by anything, e.g.
+        [weather_info_database_replica_1], in file order """
+    return [
+        load_config(filename, name)
+        for name in config_sections(filename, section + REPLICA_SECTION_SUFFIX)
+    ]
+
+
+
+
+def load_routing_options(filename):
+    """ Return the ReadRouter options of the optional [read_routing] section:
+        strategy, max_lag_seconds and health_check_interval """
+    if ROUTING_SECTION not in config_sections(filename, ROUTING_SECTION):
+        return {}
+
+    options = load_config(filename, ROUTING_SECTION)
+    parsed = {}
+    if 'strategy' in options:
+        parsed['strategy'] = options['strategy']
+    if 'max_lag_seconds' in options:
+        parsed['max_lag'] = float(options['max_lag_seconds'])
+    if 'health_check_interval' in options:
+        parsed['health_check_interval'] = float(options['health_check_interval'])
+    return parsed
+
+
+
+
+def get_router(filename, section):
+    """ Return the process-wide router for the replicas of section.
+        It is rebuilt when the replica sections or routing options change. """
+    replicas = load_replica_configs(filename, section)
+    options = load_routing_options(filename)
+    key = (os.path.abspath(filename), section)
+
+    with _ROUTERS_LOCK:
+        cached = _ROUTERS.get(key)
+        if cached is not None and cached[0] == (replicas, options):
+            return cached[1]
+
+        router = ReadRouter(replicas, **options)
+        _ROUTERS[key] = ((replicas, options), router)
+        return router
+
+
+
+
+def reset_routers():
+    """ Forget every router built by get_router """
+    with _ROUTERS_LOCK:
+        _ROUTERS.clear()
@@ -0,0 +1,122 @@
+""" Module providing a freshness-aware refresh schedule that spreads
+    the cities to fetch evenly over their refresh interval. """
+
+import heapq
+import itertools
+import threading
+import time
+
+
+
+
+class CityRefreshScheduler:
+    """ Priority queue of cities ordered by the time their reading is due.
+
+        Every city is refreshed once per interval (or its own entry in
+        intervals). The first refresh of the cities is staggered evenly over
+        that interval, and afterwards each city is re-queued one interval
+        after it was fetched, so API calls stay spread out instead of
+        bursting once per cycle. pop_due hands out at most limit cities per
+        call, which keeps each run within the API quota; the others simply
+        stay due for the next run.
+    """
+
+    def __init__(self, cities, interval, intervals=None, clock=time.time):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+
+        self.interval = interval
+        self._intervals = dict(intervals or {})
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._heap = []
+        self._due_at = {}
+        self._sequence = itertools.count()
+
+        cities = list(dict.fromkeys(cities))
+        now = clock()
+        for index, city in enumerate(cities):
+            self._push(city, now + self.interval_of(city) * index / len(cities))
+
+    def _push(self, city, due_at):
+        # Re-queuing leaves the old heap entry behind, it is skipped when
+        # popped because it no longer matches _due_at
+        self._due_at[city] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._sequence), city))
+
+    def interval_of(self, city):
+        """ Return the refresh interval of city in seconds """
+        return self._intervals.get(city, self.interval)
+
+    def set_interval(self, city, interval):
+        """ Change the refresh interval of one city, from its next refresh on """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        with self._lock:
+            self._intervals[city] = interval
+
+    def add_city(self, city, due_at=None):
+        """ Queue a new city, due now unless due_at is given """
+        with self._lock:
+            if city not in self._due_at:
+                self._push(city, self._clock() if due_at is None else due_at)
+
+    def remove_city(self, city):
+        """ Stop refreshing city """
+        with self._lock:
+            self._due_at.pop(city, None)
+
+    def pop_due(self, limit=None):
+        """ Remove and return the cities that are due, most overdue first.
+            Each must be handed back with schedule() once it is dealt with. """
+        now = self._clock()
+        due = []
+        with self._lock:
+            while self._heap and (limit is None or len(due) < limit):
+                due_at, _, city = self._heap[0]
+                if self._due_at.get(city) != due_at:
+                    heapq.heappop(self._heap)
+                    continue
+                if due_at > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._due_at[city]
+                due.append(city)
+        return due
+
+    def schedule(self, city, delay=None, since=None):
+        """ Queue city again, one interval (or delay seconds) after since,
+            which defaults to now. """
+        since = self._clock() if since is None else since
+        with self._lock:
+            self._push(city, since + (self.interval_of(city) if delay is None else delay))
+
+    def defer_fresh(self, cities, reading_times):
+        """ Return the cities whose stored reading is stale.
+
+            reading_times maps a city to the epoch seconds of its stored
+            reading. Cities read less than one interval ago are queued again
+            for when their reading expires instead of being fetched.
+        """
+        now = self._clock()
+        stale = []
+        for city in cities:
+            read_at = reading_times.get(city)
+            if read_at is not None and read_at + self.interval_of(city) > now:
+                self.schedule(city, since=read_at)
+            else:
+                stale.append(city)
+        return stale
+
+    def next_due(self):
+        """ Return the time the next city is due, None when nothing is queued """
+        with self._lock:
+            return min(self._due_at.values(), default=None)
+
+    def __contains__(self, city):
+        with self._lock:
+            return city in self._due_at
+
+    def __len__(self):
+        with self._lock:
+            return len(self._due_at)
@@ -0,0 +1,87 @@
+""" Module providing fast JSON serialization of weather rows,
+    as named records or as one array per column. """
+
+import json
+
+
+
+
+# Columns of a SELECT * row of weather_data and weather_latest
+WEATHER_FIELDS = ('id', 'city_name', 'temperature', 'pressure', 'humidity', 'date_time')
+TIMESTAMP_FIELDS = ('date_time',)
+
+# 'rows' keeps the positional arrays returned by jsonify
+LAYOUTS = ('rows', 'records', 'columns')
+
+
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+
+
+class RowSerializer:
+    """ JSON encoder for rows with a fixed list of columns.
+
+        The row to record conversion is built once for the fields,
+        timestamps are turned into ISO 8601 strings up front, and the
+        result goes through the C JSON encoder without any default hook.
+        records layout: [{"id": 1, "city_name": "Seoul", ...}, ...]
+        columns layout: {"id": [1, ...], "city_name": ["Seoul", ...], ...},
+        which does not repeat the field names on every row.
+    """
+
+    def __init__(self, fields, timestamp_fields=TIMESTAMP_FIELDS):
+        self.fields = tuple(fields)
+        self._timestamp_indexes = tuple(
+            index for index, field in enumerate(self.fields) if field in timestamp_fields)
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+        self._record = self._compile_record()
+
+    def _compile_record(self):
+        """ Build the row to record function, with the timestamp
+            positions looked up once instead of on every row """
+        fields = self.fields
+        timestamps = tuple((fields[index], index) for index in self._timestamp_indexes)
+
+        if not timestamps:
+            def record(row):
+                return dict(zip(fields, row))
+            return record
+
+        def record(row):
+            values = dict(zip(fields, row))
+            # Replacing a value keeps the field order of the record
+            for field, index in timestamps:
+                values[field] = _isoformat(row[index])
+            return values
+        return record
+
+    def record(self, row):
+        """ Return row as a dictionary of JSON-ready values """
+        return self._record(row)
+
+    def records(self, rows):
+        """ Encode rows as a JSON array of objects """
+        record = self._record
+        return self._encoder.encode([record(row) for row in rows])
+
+    def columns(self, rows):
+        """ Encode rows as a JSON object of one array per field """
+        columns = list(zip(*rows)) if rows else [()] * len(self.fields)
+        for index in self._timestamp_indexes:
+            columns[index] = [_isoformat(value) for value in columns[index]]
+        return self._encoder.encode(dict(zip(self.fields, columns)))
+
+    def dumps(self, rows, layout):
+        """ Encode rows in the records or columns layout """
+        if layout == 'records':
+            return self.records(rows)
+        if layout == 'columns':
+            return self.columns(rows)
+        raise ValueError(f"Unsupported layout {layout}, use one of {', '.join(LAYOUTS)}")
+
+
+WEATHER_ROW_SERIALIZER = RowSerializer(WEATHER_FIELDS)
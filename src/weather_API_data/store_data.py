@@ -1,9 +1,59 @@
 """ Module providing functions that fetch weather data
     and store it in postgres database. """
 
-from datetime import datetime
+from contextlib import contextmanager
+import csv
+from datetime import datetime, timedelta
+import io
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_values
+from src.weather_API_data.db_pool import get_pool
+from src.weather_API_data.metrics import OPERATION_SECONDS, DB_ERRORS
+
+
+
+
+WEATHER_COLUMNS = ('city_name', 'temperature', 'pressure', 'humidity', 'date_time')
+PARTITION_NAME_FORMATS = {'day': '%Y%m%d', 'month': '%Y%m'}
+ROLLUP_TABLES = {'hour': 'weather_rollup_hourly', 'day': 'weather_rollup_daily'}
+
+# Folds a batch of weather_data rows into one rollup table. Rows are
+# aggregated per (city, bucket) first, then merged into existing buckets
+# so only the new readings are ever read. Each measure keeps the count of
+# its non-NULL readings, which averages divide by, and a sum that is 0
+# rather than NULL when it has none, so a batch of NULLs never voids it.
+UPSERT_ROLLUP_COMMAND = """
+    INSERT INTO {table} AS rollup (
+        city_name, bucket, reading_count,
+        temperature_min, temperature_max, temperature_sum, temperature_count,
+        pressure_min, pressure_max, pressure_sum, pressure_count,
+        humidity_min, humidity_max, humidity_sum, humidity_count)
+    SELECT city_name::varchar, date_trunc({unit}, date_time::timestamp), count(*),
+        min(temperature::float), max(temperature::float),
+        COALESCE(sum(temperature::float), 0), count(temperature),
+        min(pressure::int), max(pressure::int),
+        COALESCE(sum(pressure::int), 0), count(pressure),
+        min(humidity::int), max(humidity::int),
+        COALESCE(sum(humidity::int), 0), count(humidity)
+    FROM (VALUES %s) AS batch (city_name, temperature, pressure, humidity, date_time)
+    GROUP BY 1, 2
+    ON CONFLICT (city_name, bucket) DO UPDATE SET
+        reading_count = rollup.reading_count + EXCLUDED.reading_count,
+        temperature_min = LEAST(rollup.temperature_min, EXCLUDED.temperature_min),
+        temperature_max = GREATEST(rollup.temperature_max, EXCLUDED.temperature_max),
+        temperature_sum = rollup.temperature_sum + EXCLUDED.temperature_sum,
+        temperature_count = rollup.temperature_count + EXCLUDED.temperature_count,
+        pressure_min = LEAST(rollup.pressure_min, EXCLUDED.pressure_min),
+        pressure_max = GREATEST(rollup.pressure_max, EXCLUDED.pressure_max),
+        pressure_sum = rollup.pressure_sum + EXCLUDED.pressure_sum,
+        pressure_count = rollup.pressure_count + EXCLUDED.pressure_count,
+        humidity_min = LEAST(rollup.humidity_min, EXCLUDED.humidity_min),
+        humidity_max = GREATEST(rollup.humidity_max, EXCLUDED.humidity_max),
+        humidity_sum = rollup.humidity_sum + EXCLUDED.humidity_sum,
+        humidity_count = rollup.humidity_count + EXCLUDED.humidity_count
+"""
 
 
 
@@ -39,15 +89,24 @@ def create_weather_database(config_main_db, config_new_db, command):
 
 
 def create_weather_table(config_new_db, command):
-    """ Create weather_data table in the PostgreSQL database"""
+    """ Create weather_data table in the PostgreSQL database.
+
+        The returned connection is checked out of the shared pool, give it
+        back with get_pool(config_new_db).putconn(conn) when done.
+    """
 
     try:
-        conn = psycopg2.connect(**config_new_db)
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = conn.cursor()
+        pool = get_pool(config_new_db)
+        conn = pool.getconn()
+        try:
+            cur = conn.cursor()
 
-        # Create the table if it does not exist
-        cur.execute(command)
+            # Create the table if it does not exist
+            cur.execute(command)
+
+        except Exception:
+            pool.putconn(conn)
+            raise
 
         return conn
 
@@ -62,8 +121,13 @@ def create_weather_table(config_new_db, command):
 
 
 
-def insert_data(conn, city_name, response_dict, command):
-    """ Inset data in the weather_data table """
+@OPERATION_SECONDS.timed(operation='insert_data')
+def insert_data(conn, city_name, response_dict, command, update_rollups=False):
+    """ Inset data in the weather_data table.
+        With update_rollups the reading is also folded into the hourly and
+        daily rollups, in the same transaction. It is off by default because
+        command may target another table; writes to weather_data that leave
+        it off are missing from the rollups until they are rebuilt. """
 
     if 'current' not in response_dict:
         raise ValueError(
@@ -76,19 +140,24 @@ def insert_data(conn, city_name, response_dict, command):
         pressure = response_dict['current']['pressure']
         humidity = response_dict['current']['humidity']
 
-        with conn.cursor() as cur:
+        with transaction(conn) if update_rollups else conn.cursor() as cur:
             now = datetime.now()
             date_time = now.strftime("%m/%d/%Y, %H:%M:%S")
             val = (city_name, temperature, pressure, humidity, date_time)
             cur.execute(command, val)
             print(cur.rowcount, "record inserted.")
-
+            # Read the RETURNING id before the rollup statements replace
+            # the result of the cursor
             rows = cur.fetchone()
+            if update_rollups:
+                upsert_rollups(cur, [val])
+
             if rows:
                 inserted_id = rows[0]
                 return inserted_id
 
     except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='insert_data')
         print(f"""Database error : {error}""")
         raise
 
@@ -99,3 +168,282 @@ def insert_data(conn, city_name, response_dict, command):
     except Exception as error:
         print(f"Failed to save data into weather database : {error}")
         raise
+
+
+
+
+def build_weather_row(city_name, response_dict, date_time=None):
+    """ Build a weather_data row tuple from an API response """
+
+    if 'current' not in response_dict:
+        raise ValueError(
+            f"""Error fetching data for {
+                city_name
+                }: 'current' key not found in response""")
+
+    if date_time is None:
+        date_time = datetime.now()
+
+    current = response_dict['current']
+    return (
+        city_name,
+        current['temperature'],
+        current['pressure'],
+        current['humidity'],
+        date_time
+    )
+
+
+
+
+@contextmanager
+def transaction(conn):
+    """ Run the enclosed statements in a single transaction, even on an
+        autocommit connection, and restore the connection mode afterwards. """
+
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            yield cur
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.autocommit = autocommit
+
+
+
+
+def upsert_rollups(cur, rows, page_size=1000):
+    """ Fold weather rows into every rollup table through cur """
+
+    for unit, table in ROLLUP_TABLES.items():
+        command = sql.SQL(UPSERT_ROLLUP_COMMAND).format(
+            table=sql.Identifier(table), unit=sql.Literal(unit))
+        execute_values(cur, command, rows, page_size=page_size)
+
+
+
+
+def latest_rows(rows, ids):
+    """ Pair rows with their generated ids and keep the newest row per city """
+
+    latest = {}
+    for row_id, row in zip(ids, rows):
+        city_name, date_time = row[0], row[4]
+        current = latest.get(city_name)
+        if current is None or (current[5], current[0]) <= (date_time, row_id):
+            latest[city_name] = (row_id,) + tuple(row)
+
+    return list(latest.values())
+
+
+
+
+@OPERATION_SECONDS.timed(operation='insert_many')
+def insert_many(conn, rows, command, return_ids=False, page_size=1000, latest_command=None,
+                update_rollups=False):
+    """ Insert a batch of weather rows with multi-row VALUES statements.
+
+        The command must hold a single VALUES %s placeholder. The whole batch
+        is written in one transaction; when return_ids is set the command must
+        end with RETURNING id and the generated ids are returned in order.
+        When latest_command is given, the newest row per city is upserted with
+        it as (id, city_name, temperature, pressure, humidity, date_time) in
+        the same transaction, which also requires RETURNING id. With
+        update_rollups the batch is folded into the hourly and daily rollups;
+        like insert_data, writes to weather_data without it leave them behind.
+    """
+
+    rows = list(rows)
+    if not rows:
+        return [] if return_ids else 0
+
+    fetch = return_ids or latest_command is not None
+    try:
+        with transaction(conn) as cur:
+            result = execute_values(cur, command, rows, page_size=page_size, fetch=fetch)
+            print(len(rows), "records inserted.")
+
+            ids = [row[0] for row in result] if fetch else None
+            if latest_command is not None:
+                execute_values(cur, latest_command, latest_rows(rows, ids), page_size=page_size)
+            if update_rollups:
+                upsert_rollups(cur, rows, page_size)
+
+        if return_ids:
+            return ids
+        return len(rows)
+
+    except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='insert_many')
+        print(f"""Database error : {error}""")
+        raise
+
+
+
+
+@OPERATION_SECONDS.timed(operation='copy_many')
+def copy_many(conn, rows, table='weather_data'):
+    """ Insert a batch of weather rows through COPY FROM STDIN in one transaction """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    if count == 0:
+        return 0
+    buffer.seek(0)
+
+    command = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, WEATHER_COLUMNS))
+        )
+    try:
+        with transaction(conn) as cur:
+            cur.copy_expert(command, buffer)
+            print(count, "records copied.")
+        return count
+
+    except psycopg2.DatabaseError as error:
+        DB_ERRORS.inc(operation='copy_many')
+        print(f"""Database error : {error}""")
+        raise
+
+
+
+
+def partition_start(moment, interval):
+    """ Return the start of the day or month partition holding moment """
+
+    if interval == 'day':
+        return datetime(moment.year, moment.month, moment.day)
+    if interval == 'month':
+        return datetime(moment.year, moment.month, 1)
+
+    raise ValueError(f"Unsupported partition interval {interval}, use 'day' or 'month'")
+
+
+
+
+def shift_partition(start, interval, count):
+    """ Return the start of the partition count intervals after start """
+
+    if interval == 'day':
+        return start + timedelta(days=count)
+
+    months = start.year * 12 + start.month - 1 + count
+    return datetime(months // 12, months % 12 + 1, 1)
+
+
+
+
+def partition_name(table, start, interval):
+    """ Return the name of the partition of table starting at start """
+
+    return f"{table}_p{start.strftime(PARTITION_NAME_FORMATS[interval])}"
+
+
+
+
+def create_partition(conn, start, interval, table='weather_data'):
+    """ Create the range partition of table starting at start, if missing.
+
+        Rows of the range that already landed in the default partition are
+        moved into the new partition before it is attached.
+    """
+
+    start = partition_start(start, interval)
+    end = shift_partition(start, interval, 1)
+    name = partition_name(table, start, interval)
+
+    with transaction(conn) as cur:
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is not None:
+            return False
+
+        cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(
+            sql.Identifier(name), sql.Identifier(table)))
+        cur.execute(sql.SQL("""
+            WITH moved AS (
+                DELETE FROM {} WHERE date_time >= %s AND date_time < %s RETURNING *
+            )
+            INSERT INTO {} SELECT * FROM moved""").format(
+                sql.Identifier(f"{table}_default"), sql.Identifier(name)),
+            (start, end))
+        cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})").format(
+            sql.Identifier(table),
+            sql.Identifier(name),
+            sql.Literal(start.isoformat(sep=' ')),
+            sql.Literal(end.isoformat(sep=' '))))
+
+    print(f"Partition {name} created.")
+    return True
+
+
+
+
+def ensure_partitions(conn, interval='month', ahead=2, now=None, table='weather_data'):
+    """ Pre-create the current partition and the next ahead ones """
+
+    start = partition_start(now or datetime.now(), interval)
+    created = []
+    for count in range(ahead + 1):
+        partition = shift_partition(start, interval, count)
+        if create_partition(conn, partition, interval, table):
+            created.append(partition_name(table, partition, interval))
+
+    return created
+
+
+
+
+def list_partitions(conn, table='weather_data'):
+    """ Return the names of the partitions attached to table """
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY child.relname""", (table,))
+        return [row[0] for row in cur.fetchall()]
+
+
+
+
+def drop_expired_partitions(conn, interval='month', retention=12, now=None,
+                            table='weather_data'):
+    """ Drop partitions that end before the last retention intervals.
+
+        Dropping a partition is a catalog change, unlike DELETE it leaves no
+        dead rows to vacuum. The default partition is never dropped.
+    """
+
+    cutoff = shift_partition(partition_start(now or datetime.now(), interval),
+                             interval, -retention)
+    prefix = f"{table}_p"
+    dropped = []
+
+    for name in list_partitions(conn, table):
+        if not name.startswith(prefix):
+            continue
+        try:
+            start = datetime.strptime(name[len(prefix):], PARTITION_NAME_FORMATS[interval])
+        except ValueError:
+            continue
+
+        if shift_partition(start, interval, 1) <= cutoff:
+            with transaction(conn) as cur:
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+            print(f"Partition {name} dropped.")
+            dropped.append(name)
+
+    return dropped
@@ -2,10 +2,11 @@
 
 import sys
 import os
+import json
 import unittest
 from unittest.mock import patch
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import psycopg2
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.weather_API_data.fetch_data import (
@@ -15,10 +16,19 @@ from src.weather_API_data.fetch_data import (
     )
 from src.weather_API_data.store_data import (
     insert_data,
+    insert_many,
+    ensure_partitions,
     create_weather_database,
     create_weather_table
     )
-from src.weather_API_data.read_data import get_weather_data
+from src.weather_API_data.read_data import (
+    get_weather_data,
+    get_weather_aggregates,
+    next_cursor
+    )
+from src.weather_API_data.db_pool import close_all_pools
+from src.weather_API_data.migrations import run_migrations, get_schema_version
+from src.weather_API_data.routing import ReadRouter, load_replica_configs
 
 
 
@@ -203,6 +213,7 @@ class TestIntegrationStoreWeatherData(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         db_name = 'test_weather_db'
+        close_all_pools()
         if hasattr(cls, 'conn') and cls.conn is not None:
             cls.conn.close()
 
@@ -324,6 +335,7 @@ class TestIntegrationReadWeatherData(unittest.TestCase):
     def test_get_weather_data_conn_error(self, mock_connect):
         """Integration test for get_weather_data method failure : Connection problem."""
 
+        close_all_pools()
         mock_connect.side_effect = psycopg2.DatabaseError('Connection error')
         with self.assertRaises(psycopg2.DatabaseError) as context:
             get_weather_data( self.test_db_conf, self.read_data_command, self.city_filter)
@@ -345,6 +357,7 @@ class TestIntegrationReadWeatherData(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         db_name = 'test_weather_db'
+        close_all_pools()
         if hasattr(cls, 'conn') and cls.conn is not None:
             cls.conn.close()
 
@@ -386,6 +399,298 @@ class TestIntegrationReadWeatherData(unittest.TestCase):
 
 
 
+class TestIntegrationMigrations(unittest.TestCase):
+    """List of integartion tests for the weather_data schema migrations."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up the test environment."""
+
+        db_create_cmd = """CREATE DATABASE test_weather_db"""
+        create_table_cmd = """
+                CREATE TABLE IF NOT EXISTS weather_data (
+                    id SERIAL PRIMARY KEY,
+                    city_name VARCHAR(255),
+                    temperature FLOAT,
+                    pressure INT,
+                    humidity INT,
+                    date_time TIMESTAMP
+                )
+                """
+        insert_many_cmd = """INSERT INTO weather_data (
+                        city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s RETURNING id"""
+
+        cls.main_db_conf = load_config('test_database.ini', 'main_database')
+        cls.test_db_conf = load_config('test_database.ini', 'test_weather_database')
+
+        cls.db_conn = create_weather_database(cls.main_db_conf, cls.test_db_conf, db_create_cmd)
+        assert cls.db_conn is not None
+
+        cls.conn = psycopg2.connect(**cls.test_db_conf)
+        cls.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with cls.conn.cursor() as cur:
+            cur.execute(create_table_cmd)
+
+        # Enough history for the planner to prefer an index over a sequential scan
+        start = datetime(2024, 1, 1)
+        rows = [
+            (f"city_{index % 500}", 20.0, 1000, 70, start + timedelta(minutes=index))
+            for index in range(50000)
+        ]
+        insert_many(cls.conn, rows, insert_many_cmd)
+
+        cls.applied = run_migrations(cls.test_db_conf)
+        cls.created = ensure_partitions(cls.conn, 'month', ahead=1, now=start)
+        with cls.conn.cursor() as cur:
+            cur.execute("ANALYZE weather_data")
+
+    def partition_indexes(self, method):
+        """Return the names of the partition indexes built with an access method."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT indexname FROM pg_indexes
+                WHERE tablename LIKE 'weather_data_p%%' AND indexdef LIKE %s""",
+                (f"% USING {method} %",))
+            return [row[0] for row in cur.fetchall()]
+
+    def explain(self, query, params, settings=()):
+        """Return the JSON query plan of a query as text."""
+        with self.conn.cursor() as cur:
+            cur.execute("BEGIN")
+            for setting in settings:
+                cur.execute(setting)
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0]
+            cur.execute("ROLLBACK")
+        return json.dumps(plan)
+
+    def test_migrations_recorded(self):
+        """Integration test for run_migrations: versions are recorded once."""
+
+        self.assertEqual(self.applied, [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(get_schema_version(self.test_db_conf), 7)
+        self.assertEqual(run_migrations(self.test_db_conf), [])
+        self.assertEqual(self.created, ['weather_data_p202401', 'weather_data_p202402'])
+
+    def test_partitions_hold_all_rows(self):
+        """Integration test for ensure_partitions: rows leave the default partition."""
+
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM weather_data")
+            self.assertEqual(cur.fetchone()[0], 50000)
+            cur.execute("SELECT count(*) FROM weather_data_default")
+            self.assertEqual(cur.fetchone()[0], 0)
+
+    def test_rollups_backfilled(self):
+        """Integration test for get_weather_aggregates: rollups cover existing rows."""
+
+        for granularity in ('hour', 'day'):
+            buckets = get_weather_aggregates(self.test_db_conf, ['city_7'], granularity)
+            self.assertEqual(sum(bucket[2] for bucket in buckets), 100)
+            self.assertEqual(buckets[0][5], 20.0)
+
+    def test_latest_backfilled(self):
+        """Integration test: weather_latest holds the newest existing reading of every city."""
+
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM weather_latest")
+            self.assertEqual(cur.fetchone()[0], 500)
+            cur.execute("SELECT date_time FROM weather_latest WHERE city_name = 'city_7'")
+            self.assertEqual(cur.fetchone()[0], datetime(2024, 1, 1) + timedelta(minutes=49507))
+
+    def test_insert_data_updates_rollups(self):
+        """Integration test for insert_data: the reading is folded into the rollups."""
+
+        insert_cmd = """INSERT INTO weather_data (
+                        city_name, temperature, pressure, humidity, date_time)
+                        VALUES (%s, %s, %s, %s, %s) RETURNING id;"""
+        reading = {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}}
+        try:
+            row_id = insert_data(self.conn, "rollup_city", reading, insert_cmd,
+                                 update_rollups=True)
+            self.assertIsNotNone(row_id)
+            for granularity in ('hour', 'day'):
+                buckets = get_weather_aggregates(self.test_db_conf, ['rollup_city'], granularity)
+                self.assertEqual([bucket[2] for bucket in buckets], [1])
+
+        finally:
+            with self.conn.cursor() as cur:
+                cur.execute("DELETE FROM weather_data WHERE city_name = 'rollup_city'")
+
+    def test_rollups_skip_null_measures(self):
+        """Integration test for upsert_rollups: NULL measures neither void the
+        sums nor count towards the averages."""
+
+        insert_many_cmd = """INSERT INTO weather_data (
+                        city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s RETURNING id"""
+        reading_time = datetime(2024, 1, 2, 10, 30)
+        try:
+            insert_many(self.conn, [("null_city", None, None, None, reading_time)],
+                        insert_many_cmd, update_rollups=True)
+            insert_many(self.conn, [("null_city", 20.0, 1000, None, reading_time)],
+                        insert_many_cmd, update_rollups=True)
+            buckets = get_weather_aggregates(self.test_db_conf, ['null_city'], 'hour')
+            self.assertEqual(buckets[0][2], 2)
+            self.assertEqual((buckets[0][5], buckets[0][8], buckets[0][11]), (20.0, 1000.0, None))
+
+        finally:
+            with self.conn.cursor() as cur:
+                cur.execute("DELETE FROM weather_data WHERE city_name = 'null_city'")
+                for table in ('weather_rollup_hourly', 'weather_rollup_daily'):
+                    cur.execute(f"DELETE FROM {table} WHERE city_name = 'null_city'")
+
+    def test_city_query_uses_composite_index(self):
+        """Integration test for the city filter: the composite index is used."""
+
+        plan = self.explain(
+            "SELECT * FROM weather_data WHERE city_name IN (%s)", ["city_7"])
+        self.assertTrue(any(index in plan for index in self.partition_indexes("btree")))
+        self.assertNotIn('"Seq Scan"', plan)
+
+    def test_keyset_pagination(self):
+        """Integration test for get_weather_data: pages cover the range exactly once."""
+
+        command = "SELECT * FROM weather_data"
+        city_filter = {'city_name': ['city_7']}
+        start, end = datetime(2024, 1, 2), datetime(2024, 1, 20)
+        expected = sorted(
+            get_weather_data(self.test_db_conf, command, city_filter, start, end),
+            key=lambda row: (row[5], row[0]))
+
+        pages = []
+        cursor = None
+        while True:
+            rows = get_weather_data(
+                self.test_db_conf, command, city_filter, start, end, limit=7, cursor=cursor)
+            pages.extend(rows)
+            cursor = next_cursor(rows, 7)
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, expected)
+
+        plan = self.explain(
+            command + " WHERE city_name = %s AND (date_time, id) > (%s, %s)"
+            " ORDER BY date_time, id LIMIT 500",
+            ["city_7", datetime(2024, 1, 2), 0])
+        self.assertNotIn('"Seq Scan"', plan)
+
+    def test_time_range_query_prunes_partitions(self):
+        """Integration test for a time range filter: other partitions are pruned."""
+
+        plan = self.explain(
+            "SELECT * FROM weather_data WHERE date_time >= %s AND date_time < %s",
+            [datetime(2024, 1, 2), datetime(2024, 1, 3)])
+        self.assertIn("weather_data_p202401", plan)
+        self.assertNotIn("weather_data_p202402", plan)
+        self.assertNotIn("weather_data_default", plan)
+
+    def test_time_range_query_uses_brin_index(self):
+        """Integration test for a time range filter: the BRIN index is usable."""
+
+        plan = self.explain(
+            "SELECT * FROM weather_data WHERE date_time >= %s AND date_time < %s",
+            [datetime(2024, 1, 2), datetime(2024, 1, 3)],
+            settings=["SET LOCAL enable_seqscan = off", "SET LOCAL enable_indexscan = off"])
+        self.assertTrue(any(index in plan for index in self.partition_indexes("brin")))
+
+    @classmethod
+    def tearDownClass(cls):
+        db_name = 'test_weather_db'
+        close_all_pools()
+        cls.conn.close()
+        cls.db_conn.close()
+
+        conn = psycopg2.connect(**cls.main_db_conf)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            SELECT pg_terminate_backend(pg_stat_activity.pid)
+                            FROM pg_stat_activity
+                            WHERE pg_stat_activity.datname = %s
+                            AND pid <> pg_backend_pid();
+                            """, (db_name,))
+                cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+                print(f"Database {db_name} dropped successfully")
+
+        except(psycopg2.DatabaseError, Exception) as error:
+            print(f"Error dropping database {db_name} : {error}")
+
+        finally:
+            conn.close()
+
+
+
+
+class TestIntegrationReadReplicas(unittest.TestCase):
+    """Integration tests for read routing between two local PostgreSQL instances.
+
+    The second instance is configured as [main_database_replica_1] in
+    test_database.ini; it does not need to replicate the first one, each
+    instance gets its own copy of a test table so reads show where they went.
+    """
+
+    table = "test_replica_weather_data"
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up a test table with a different row on each instance."""
+
+        cls.primary_conf = load_config('test_database.ini', 'main_database')
+        replicas = load_replica_configs('test_database.ini', 'main_database')
+        if not replicas:
+            raise unittest.SkipTest("No [main_database_replica_1] section in test_database.ini")
+        cls.replica_conf = replicas[0]
+
+        for db_conf, city in ((cls.primary_conf, "Primary"), (cls.replica_conf, "Replica")):
+            conn = psycopg2.connect(**db_conf)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"""CREATE TABLE IF NOT EXISTS {cls.table} (
+                    id SERIAL PRIMARY KEY, city_name VARCHAR(255), temperature FLOAT,
+                    pressure INT, humidity INT, date_time TIMESTAMP)""")
+                cur.execute(f"TRUNCATE {cls.table}")
+                cur.execute(f"INSERT INTO {cls.table} (city_name) VALUES (%s)", (city,))
+            conn.close()
+
+    def read_city(self, router):
+        rows = router.read(self.primary_conf, get_weather_data, f"SELECT * FROM {self.table}")
+        return rows[0][1]
+
+    def test_reads_go_to_replica(self):
+        """Integration test: reads are served by the caught-up replica."""
+
+        router = ReadRouter([self.replica_conf])
+        router.check_replicas()
+        self.assertEqual(self.read_city(router), "Replica")
+        self.assertEqual(router.stats()['replica_reads'], 1)
+        self.assertEqual(list(router.stats()['replicas'].values())[0]['lag'], 0)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        """Integration test: reads go to the primary when the replica is down."""
+
+        down = dict(self.replica_conf, port='1')
+        router = ReadRouter([down])
+        router.check_replicas()
+        self.assertEqual(self.read_city(router), "Primary")
+        self.assertFalse(list(router.stats()['replicas'].values())[0]['healthy'])
+
+    @classmethod
+    def tearDownClass(cls):
+        close_all_pools()
+        for db_conf in (cls.primary_conf, cls.replica_conf):
+            conn = psycopg2.connect(**db_conf)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {cls.table}")
+            conn.close()
+
+
+
+
 
 if __name__ == '__main__':
     unittest.main()
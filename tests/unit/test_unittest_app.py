@@ -0,0 +1,530 @@
+""" Module providing Unit Tests for the API endpoints in app.py file. """
+
+import unittest
+import sys
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+sys.path.append('./')
+from api import app as weather_app
+from src.weather_API_data.scheduling import CityRefreshScheduler
+from src.weather_API_data.latest_store import LatestReadingStore
+
+
+
+
+class TestGetCityWeather(unittest.TestCase):
+    """Tests for the /api/weather_data endpoint."""
+
+    def setUp(self):
+        weather_app.WEATHER_CACHE.invalidate()
+        self.client = weather_app.app.test_client()
+        self.weather_data = [[5, "Seoul", 24.0, 1001, 74, "Thu, 04 Jul 2024 22:42:12 GMT"]]
+        self.latest_store = LatestReadingStore()
+        patcher = patch('api.app.LATEST_STORE', self.latest_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_city_name(self):
+        """Test that city_name is required."""
+
+        response = self.client.get('/api/weather_data')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_cached_response(self, mock_get_weather_data, mock_load_config):
+        """Test that repeated requests are served from the cache."""
+
+        mock_get_weather_data.return_value = self.weather_data
+        before = self.client.get('/api/cache_stats').get_json()
+
+        first = self.client.get('/api/weather_data?city_name=Seoul')
+        second = self.client.get('/api/weather_data?city_name=Seoul')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.get_json(), self.weather_data)
+        mock_get_weather_data.assert_called_once()
+        self.assertEqual(mock_get_weather_data.call_args[0][1], "SELECT * FROM weather_latest")
+        mock_load_config.assert_called_once()
+
+        stats = self.client.get('/api/cache_stats').get_json()
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+
+    @patch('api.app.get_weather_data')
+    def test_latest_served_from_memory(self, mock_get_weather_data):
+        """Test that stored current readings are served without a query."""
+
+        self.latest_store.update((5, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 22, 42, 12)))
+
+        response = self.client.get('/api/weather_data?city_name=Seoul')
+        records = self.client.get('/api/weather_data?city_name=Seoul&layout=records')
+
+        self.assertEqual(response.get_json(), self.weather_data)
+        self.assertEqual(records.get_json()[0]['date_time'], "2024-07-04T22:42:12")
+        mock_get_weather_data.assert_not_called()
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_refresh_latest_store(self, mock_get_weather_data, mock_load_config):
+        """Test that the refresh job loads everything first, then only newer
+        readings, and drops the cached responses when readings change."""
+
+        mock_get_weather_data.return_value = [
+            (5, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 22, 42, 12)),
+            (6, "Paris", 21.0, 1012, 70, datetime(2024, 7, 4, 22, 40, 0)),
+        ]
+
+        generation = weather_app.WEATHER_CACHE.generation
+        self.assertEqual(weather_app.scheduled_job_refresh_latest_store(), 2)
+        self.assertIsNone(mock_get_weather_data.call_args[1]['start'])
+        self.assertEqual(weather_app.WEATHER_CACHE.generation, generation + 1)
+
+        # The overlap reads the same readings again, which changes nothing
+        self.assertEqual(weather_app.scheduled_job_refresh_latest_store(), 0)
+        self.assertEqual(weather_app.WEATHER_CACHE.generation, generation + 1)
+
+        self.assertEqual(mock_get_weather_data.call_args[1]['start'],
+                         datetime(2024, 7, 4, 22, 41, 12))
+        self.assertEqual(self.latest_store.get("Paris")[0], 6)
+        mock_load_config.assert_called_with('database.ini', 'weather_info_database')
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_cache_invalidated_by_write(self, mock_get_weather_data, mock_load_config):
+        """Test that a scheduled write invalidates cached responses."""
+
+        mock_get_weather_data.return_value = []
+
+        self.assertEqual(self.client.get('/api/weather_data?city_name=Seoul').status_code, 404)
+        weather_app.WEATHER_CACHE.invalidate()
+        mock_get_weather_data.return_value = self.weather_data
+
+        response = self.client.get('/api/weather_data?city_name=Seoul')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get_weather_data.call_count, 2)
+        mock_load_config.assert_called()
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_history_page(self, mock_get_weather_data, mock_load_config):
+        """Test that from/to/limit return a history page and the next cursor."""
+
+        rows = [
+            [1, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 10, 0, 0)],
+            [2, "Seoul", 25.0, 1001, 74, datetime(2024, 7, 4, 11, 0, 0)],
+        ]
+        mock_get_weather_data.return_value = rows
+
+        response = self.client.get(
+            '/api/weather_data?city_name=Seoul&from=2024-07-04T00:00:00&to=2024-07-05&limit=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+        self.assertIn('X-Next-Cursor', response.headers)
+        args = mock_get_weather_data.call_args[0]
+        self.assertEqual(args[1], "SELECT * FROM weather_data")
+        self.assertEqual(args[3:], (datetime(2024, 7, 4), datetime(2024, 7, 5), 2, None))
+        mock_load_config.assert_called_once()
+
+    @patch('api.app.get_weather_data')
+    def test_history_last_page(self, mock_get_weather_data):
+        """Test that a short page carries no next cursor."""
+
+        mock_get_weather_data.return_value = []
+
+        with patch('api.app.load_config'):
+            response = self.client.get('/api/weather_data?city_name=Seoul&limit=10')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_history_columns_layout(self, mock_get_weather_data, mock_load_config):
+        """Test that layout=columns returns one array per field with ISO timestamps."""
+
+        mock_get_weather_data.return_value = [
+            (1, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 10, 0, 0)),
+            (2, "Seoul", 25.0, 1002, 75, datetime(2024, 7, 4, 11, 0, 0)),
+        ]
+
+        response = self.client.get('/api/weather_data?city_name=Seoul&limit=2&layout=columns')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(response.get_json()['temperature'], [24.0, 25.0])
+        self.assertEqual(response.get_json()['date_time'],
+                         ["2024-07-04T10:00:00", "2024-07-04T11:00:00"])
+        self.assertIn('X-Next-Cursor', response.headers)
+        mock_load_config.assert_called_once()
+
+    def test_invalid_layout(self):
+        """Test that unknown layouts are rejected."""
+
+        response = self.client.get('/api/weather_data?city_name=Seoul&layout=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_invalid_parameters(self):
+        """Test that malformed time bounds, limits and cursors are rejected."""
+
+        for query in ('from=yesterday', 'limit=0', 'limit=abc', 'cursor=bogus'):
+            response = self.client.get(f'/api/weather_data?city_name=Seoul&{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+
+
+class TestGetCitiesWeather(unittest.TestCase):
+    """Tests for the /api/weather_data/batch endpoint."""
+
+    def setUp(self):
+        weather_app.WEATHER_CACHE.invalidate()
+        self.client = weather_app.app.test_client()
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_batch_single_query(self, mock_get_weather_data, mock_load_config):
+        """Test that repeated and comma-separated cities are resolved in one query."""
+
+        mock_get_weather_data.return_value = [
+            [5, "Seoul", 24.0, 1001, 74, None],
+            [7, "Paris", 21.0, 1200, 70, None],
+        ]
+
+        response = self.client.get(
+            '/api/weather_data/batch?city_name=Seoul,Paris&city_name=Atlantis&city_name=Seoul')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["data"]["Paris"], [7, "Paris", 21.0, 1200, 70, None])
+        self.assertEqual(sorted(body["data"]), ["Paris", "Seoul"])
+        self.assertEqual(body["not_found"], ["Atlantis"])
+        mock_get_weather_data.assert_called_once()
+        self.assertEqual(mock_get_weather_data.call_args[0][2],
+                         {'city_name': ["Seoul", "Paris", "Atlantis"]})
+        mock_load_config.assert_called_once()
+
+    def test_batch_requires_city(self):
+        """Test that at least one city is required."""
+
+        self.assertEqual(self.client.get('/api/weather_data/batch').status_code, 400)
+        self.assertEqual(self.client.get('/api/weather_data/batch?city_name=,').status_code, 400)
+
+    def test_batch_too_many_cities(self):
+        """Test that the number of cities per request is bounded."""
+
+        city_names = ",".join(f"city_{index}" for index in range(weather_app.MAX_BATCH_CITIES + 1))
+        response = self.client.get(f'/api/weather_data/batch?city_name={city_names}')
+        self.assertEqual(response.status_code, 400)
+
+
+
+
+class TestWeatherAggregates(unittest.TestCase):
+    """Tests for the /api/weather_data/aggregates endpoint."""
+
+    def setUp(self):
+        weather_app.WEATHER_CACHE.invalidate()
+        self.client = weather_app.app.test_client()
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_aggregates')
+    def test_aggregates_named_fields(self, mock_get_weather_aggregates, mock_load_config):
+        """Test that rollup rows are returned with named fields."""
+
+        mock_get_weather_aggregates.return_value = [
+            ("Seoul", None, 2, 20.0, 24.0, 22.0, 1000, 1002, 1001.0, 70, 74, 72.0),
+        ]
+
+        response = self.client.get(
+            '/api/weather_data/aggregates?city_name=Seoul&granularity=day&from=2024-07-01')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body[0]["temperature_avg"], 22.0)
+        self.assertEqual(body[0]["reading_count"], 2)
+        mock_get_weather_aggregates.assert_called_once_with(
+            mock_load_config.return_value, ["Seoul"], 'day', datetime(2024, 7, 1), None)
+
+    def test_aggregates_invalid_parameters(self):
+        """Test that a missing city or unknown granularity is rejected."""
+
+        self.assertEqual(self.client.get('/api/weather_data/aggregates').status_code, 400)
+        response = self.client.get('/api/weather_data/aggregates?city_name=Seoul&granularity=week')
+        self.assertEqual(response.status_code, 400)
+
+
+
+
+class TestExportWeatherData(unittest.TestCase):
+    """Tests for the /api/weather_data/export endpoint."""
+
+    def setUp(self):
+        self.client = weather_app.app.test_client()
+
+    @patch('api.app.load_config')
+    @patch('api.app.iter_weather_data')
+    def test_export_streams_ndjson(self, mock_iter_weather_data, mock_load_config):
+        """Test that the export is streamed as one JSON line per row."""
+
+        mock_iter_weather_data.return_value = iter([
+            [1, "Seoul", 24.0, 1001, 74, None],
+            [2, "Paris", 21.0, 1200, 70, None],
+        ])
+
+        response = self.client.get('/api/weather_data/export?city_name=Seoul&city_name=Paris')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertTrue(response.is_streamed)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[1], '[2, "Paris", 21.0, 1200, 70, null]')
+        self.assertEqual(mock_iter_weather_data.call_args[0][2],
+                         {'city_name': ["Seoul", "Paris"]})
+        mock_load_config.assert_called_once()
+
+
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for the /metrics endpoint."""
+
+    def setUp(self):
+        self.client = weather_app.app.test_client()
+
+    @patch('api.app.load_config')
+    @patch('api.app.get_weather_data')
+    def test_metrics_exposition(self, mock_get_weather_data, mock_load_config):
+        """Test that cache and scheduler metrics are exposed as Prometheus text."""
+
+        weather_app.WEATHER_CACHE.invalidate()
+        mock_get_weather_data.return_value = [[5, "Seoul", 24.0, 1001, 74, None]]
+        self.client.get('/api/weather_data?city_name=Seoul')
+        self.client.get('/api/weather_data?city_name=Seoul')
+
+        response = self.client.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE weather_cache_requests_total counter', text)
+        self.assertIn('weather_cache_requests_total{result="hit"}', text)
+        self.assertIn('weather_scheduler_queued_cities', text)
+        self.assertIn('# TYPE weather_operation_seconds histogram', text)
+        mock_load_config.assert_called_once()
+
+    def test_scheduler_metrics_leader_only(self):
+        """Test that a follower, whose schedule never advances, reports no scheduler lag."""
+
+        with patch('api.app.LEADER', MagicMock(is_leader=False)):
+            text = self.client.get('/metrics').get_data(as_text=True)
+        lines = text.splitlines()
+
+        self.assertIn('weather_scheduler_leader 0', lines)
+        self.assertFalse([line for line in lines
+                          if line.startswith(('weather_scheduler_lag_seconds',
+                                              'weather_scheduler_queued_cities'))])
+
+
+
+
+class TestScheduledJob(unittest.TestCase):
+    """Tests for the scheduled fetch and store job."""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.scheduler = CityRefreshScheduler(
+            ["Seoul", "Paris", "London", "Taipei"], 3600, clock=lambda: self.now)
+        self.now = 5000.0
+        patcher = patch('api.app.REFRESH_SCHEDULER', self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.latest_store = LatestReadingStore()
+        patcher = patch('api.app.LATEST_STORE', self.latest_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('api.app.get_weather_data')
+    @patch('api.app.insert_many')
+    @patch('api.app.get_pool')
+    @patch('api.app.get_client')
+    @patch('api.app.env_config_loading')
+    @patch('api.app.load_config')
+    def test_job_stores_batch_and_invalidates_cache(self, mock_load_config, mock_env,
+                                                    mock_get_client, mock_get_pool,
+                                                    mock_insert_many, mock_get_weather_data):
+        """Test that the job writes one batch, reports errors and invalidates the cache."""
+
+        mock_get_weather_data.return_value = [("Taipei", datetime.fromtimestamp(4000.0))]
+        mock_env.return_value = ("key", "http://api.fakeweatherapi.com")
+        mock_get_client.return_value.fetch_many.return_value = (
+            {
+                "Seoul": {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}},
+                "Paris": {"error": {"code": 104}},
+            },
+            {"London": ValueError("No weather data returned for London")},
+        )
+        mock_conn = MagicMock()
+        mock_get_pool.return_value.connection.return_value.__enter__.return_value = mock_conn
+        mock_insert_many.return_value = [41]
+        generation = weather_app.WEATHER_CACHE.generation
+
+        results, errors = weather_app.scheduled_job_fetch_store_wether_data()
+
+        mock_get_client.return_value.fetch_many.assert_called_once_with(
+            ["Seoul", "Paris", "London"], weather_app.FETCH_BATCH_SIZE)
+        rows = mock_insert_many.call_args[0][1]
+        self.assertEqual(mock_insert_many.call_args[1]['latest_command'],
+                         weather_app.UPSERT_LATEST_COMMAND)
+        self.assertTrue(mock_insert_many.call_args[1]['update_rollups'])
+        mock_conn.cursor.assert_not_called()
+        self.assertEqual([row[0] for row in rows], ["Seoul"])
+        self.assertEqual(set(errors), {"Paris", "London"})
+        self.assertEqual(set(results), {"Seoul", "Paris"})
+        self.assertEqual(weather_app.WEATHER_CACHE.generation, generation + 1)
+        self.assertEqual(self.latest_store.get("Seoul")[:3], (41, "Seoul", 24.0))
+        mock_load_config.assert_called_with('database.ini', 'weather_info_database')
+
+        stats = weather_app.app.test_client().get('/api/ingest_stats').get_json()
+        self.assertEqual(stats['written'], 1)
+        self.assertEqual(stats['fetch_errors'], 2)
+
+        # Fetched cities wait a full interval, failed ones the retry delay and
+        # Taipei, read by someone else, until its reading expires
+        self.now = 5000.0 + weather_app.RETRY_DELAY_SECONDS
+        self.assertEqual(sorted(self.scheduler.pop_due()), ["London", "Paris"])
+        self.now = 7600.0
+        self.assertEqual(self.scheduler.pop_due(), ["Taipei"])
+        self.now = 8600.0
+        self.assertEqual(self.scheduler.pop_due(), ["Seoul"])
+
+    @patch('api.app.get_weather_data')
+    @patch('api.app.insert_many')
+    @patch('api.app.get_pool')
+    @patch('api.app.get_client')
+    @patch('api.app.env_config_loading')
+    @patch('api.app.load_config')
+    def test_job_retries_cities_not_written(self, mock_load_config, mock_env, mock_get_client,
+                                            mock_get_pool, mock_insert_many,
+                                            mock_get_weather_data):
+        """Test that a malformed response or a city missing from the fetch
+        results is retried early, not left for a full interval."""
+
+        mock_get_weather_data.return_value = []
+        mock_env.return_value = ("key", "http://api.fakeweatherapi.com")
+        mock_get_client.return_value.fetch_many.return_value = (
+            {
+                "Seoul": {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}},
+                "Paris": {"current": None},
+            },
+            {},
+        )
+        mock_insert_many.return_value = [41]
+
+        with patch('api.app.MAX_CITIES_PER_TICK', 3):
+            results, errors = weather_app.scheduled_job_fetch_store_wether_data()
+
+        self.assertEqual(set(results), {"Seoul", "Paris"})
+        self.assertIsInstance(errors["Paris"], TypeError)
+        self.assertNotIn("London", errors)
+        self.now = 5000.0 + weather_app.RETRY_DELAY_SECONDS
+        self.assertEqual(sorted(self.scheduler.pop_due()), ["London", "Paris", "Taipei"])
+        self.now = 8600.0
+        self.assertEqual(self.scheduler.pop_due(), ["Seoul"])
+        mock_load_config.assert_called_with('database.ini', 'weather_info_database')
+
+    @patch('api.app.insert_many')
+    @patch('api.app.get_pool')
+    @patch('api.app.get_client')
+    @patch('api.app.env_config_loading')
+    @patch('api.app.load_config')
+    def test_job_write_failure_retried(self, mock_load_config, mock_env, mock_get_client,
+                                       mock_get_pool, mock_insert_many):
+        """Test that cities whose rows could not be written are retried early."""
+
+        mock_env.return_value = ("key", "http://api.fakeweatherapi.com")
+        mock_get_client.return_value.fetch_many.return_value = (
+            {"Seoul": {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}}},
+            {},
+        )
+        mock_insert_many.side_effect = RuntimeError("database unavailable")
+
+        with patch('api.app.get_weather_data', return_value=[]):
+            with patch('api.app.MAX_CITIES_PER_TICK', 1):
+                results, errors = weather_app.scheduled_job_fetch_store_wether_data()
+
+        self.assertEqual(list(results), ["Seoul"])
+        self.assertIsInstance(errors["Seoul"], RuntimeError)
+        self.now = 5000.0 + weather_app.RETRY_DELAY_SECONDS
+        self.assertIn("Seoul", self.scheduler.pop_due())
+        mock_load_config.assert_called_once()
+
+    @patch('api.app.env_config_loading')
+    @patch('api.app.get_weather_data')
+    @patch('api.app.load_config')
+    def test_job_limits_cities_per_run(self, mock_load_config, mock_get_weather_data,
+                                       mock_env):
+        """Test that one run takes no more cities than the quota allows."""
+
+        mock_get_weather_data.return_value = [("Seoul", None), ("Paris", None)]
+        mock_env.side_effect = FileNotFoundError(".env file not found")
+
+        with patch('api.app.MAX_CITIES_PER_TICK', 2):
+            with self.assertRaises(FileNotFoundError):
+                weather_app.scheduled_job_fetch_store_wether_data()
+
+        mock_get_weather_data.assert_called_once_with(
+            mock_load_config.return_value, weather_app.SELECT_LATEST_TIMES_COMMAND,
+            {'city_name': ["Seoul", "Paris"]})
+        self.assertEqual(len(self.scheduler), 4)
+        self.assertEqual(self.scheduler.pop_due(), ["London", "Taipei"])
+        mock_load_config.assert_called_once()
+
+    @patch('api.app.fetch_store_due_cities')
+    @patch('api.app.get_client')
+    @patch('api.app.env_config_loading')
+    def test_job_budget_follows_bulk_support(self, mock_env, mock_get_client,
+                                             mock_fetch_store):
+        """Test that a run takes one city per API call once bulk requests are refused."""
+
+        mock_env.return_value = ("key", "http://api.fakeweatherapi.com")
+        mock_fetch_store.return_value = ({}, {})
+
+        mock_get_client.return_value.bulk_supported = True
+        with patch('api.app.MAX_CITIES_PER_TICK', 20), patch('api.app.FETCH_BATCH_SIZE', 10):
+            self.assertEqual(weather_app.cities_per_tick(), 20)
+            mock_get_client.return_value.bulk_supported = False
+            self.assertEqual(weather_app.cities_per_tick(), 2)
+            weather_app.scheduled_job_fetch_store_wether_data()
+
+        self.assertEqual(mock_fetch_store.call_args[0][0], ["Seoul", "Paris"])
+        mock_get_client.assert_called_with("key", "http://api.fakeweatherapi.com")
+
+    @patch('api.app.fetch_store_due_cities')
+    def test_job_skipped_by_follower(self, mock_fetch_store):
+        """Test that only the leader process runs the scheduled jobs."""
+
+        with patch('api.app.LEADER', MagicMock(is_leader=False)):
+            self.assertEqual(weather_app.scheduled_job_fetch_store_wether_data(), ({}, {}))
+            self.assertEqual(weather_app.scheduled_job_maintain_partitions(), ([], []))
+
+        mock_fetch_store.assert_not_called()
+        self.assertEqual(len(self.scheduler), 4)
+
+    @patch('api.app.fetch_store_due_cities')
+    def test_job_skips_overlapping_run(self, mock_fetch_store):
+        """Test that a run is skipped while the previous one holds the lock."""
+
+        with weather_app.FETCH_JOB_LOCK:
+            self.assertEqual(weather_app.scheduled_job_fetch_store_wether_data(), ({}, {}))
+
+        mock_fetch_store.assert_not_called()
+        self.assertEqual(len(self.scheduler), 4)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+""" Module providing Unit Tests for the ResponseCache class in cache.py file. """
+
+import unittest
+import sys
+from unittest.mock import MagicMock
+sys.path.append('./')
+from src.weather_API_data.cache import ResponseCache
+
+
+
+
+class FakeClock:
+    """ Manually advanced clock for TTL tests """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for the read-through response cache."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_get_or_load_hit_and_miss(self):
+        """Test that the loader only runs on a miss."""
+
+        loader = MagicMock(return_value=[(1, "Seoul")])
+
+        self.assertEqual(self.cache.get_or_load("Seoul", loader), [(1, "Seoul")])
+        self.assertEqual(self.cache.get_or_load("Seoul", loader), [(1, "Seoul")])
+
+        loader.assert_called_once()
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+
+        self.cache.set("Seoul", 1)
+        self.cache.set("Paris", 2)
+        self.cache.get("Seoul")
+        self.cache.set("London", 3)
+
+        self.assertEqual(self.cache.get("Seoul"), 1)
+        self.assertIsNone(self.cache.get("Paris"))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL."""
+
+        self.cache.set("Seoul", 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get("Seoul"), 1)
+
+        self.clock.now = 10.0
+        self.assertIsNone(self.cache.get("Seoul"))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_invalidate_bumps_generation(self):
+        """Test that invalidate drops entries and starts a new generation."""
+
+        self.cache.set("Seoul", 1)
+        self.cache.invalidate()
+
+        self.assertIsNone(self.cache.get("Seoul"))
+        self.assertEqual(self.cache.generation, 1)
+
+    def test_load_racing_invalidation_is_not_stored(self):
+        """Test that a value loaded across an invalidation is not cached."""
+
+        def loader():
+            self.cache.invalidate()
+            return "stale"
+
+        self.assertEqual(self.cache.get_or_load("Seoul", loader), "stale")
+        self.assertIsNone(self.cache.get("Seoul"))
+
+    def test_invalid_size(self):
+        """Test failure for ResponseCache: maxsize below one."""
+
+        with self.assertRaises(ValueError):
+            ResponseCache(maxsize=0)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
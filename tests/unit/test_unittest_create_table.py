@@ -2,15 +2,46 @@
     fetch_weather_data methods in create_table.py file. """
 
 import os
+import tempfile
+import threading
 from pathlib import Path
 from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 import json
 import unittest
 import sys
 sys.path.append('./')
 from unittest.mock import MagicMock, patch, mock_open
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from src.weather_API_data.fetch_data import load_config, env_config_loading, fetch_weather_data
+from src.weather_API_data.fetch_data import (
+    load_config,
+    invalidate_config_cache,
+    env_config_loading,
+    fetch_weather_data,
+    fetch_weather_data_concurrently,
+    WeatherAPIClient,
+    get_client,
+    close_clients
+)
+from src.weather_API_data.rate_limit import TokenBucket
+from src.weather_API_data.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryableWeatherAPIError,
+    WeatherAPIError,
+    reset_breakers
+)
+
+
+
+
+def setUpModule():
+    """Let clients built with the default rate limiter call the fake API
+    back to back, the default spaces calls a second apart."""
+    patcher = patch.dict(os.environ, {'API_RATE_LIMIT_BURST': '60'})
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
 
 
 
@@ -63,9 +94,69 @@ class TestLoadConfig(unittest.TestCase):
 
 
 
+
+class TestLoadConfigCache(unittest.TestCase):
+    """Test Suite for the load_config cache."""
+
+    def setUp(self):
+        invalidate_config_cache()
+        handle, self.filename = tempfile.mkstemp(suffix='.ini')
+        with os.fdopen(handle, 'w', encoding='locale') as config_file:
+            config_file.write("[postgresql]\nhost=localhost\n")
+
+    def tearDown(self):
+        invalidate_config_cache()
+        os.remove(self.filename)
+
+    def rewrite_config(self, content, mtime_ns):
+        """Rewrite the config file and force a new modification time."""
+        with open(self.filename, 'w', encoding='locale') as config_file:
+            config_file.write(content)
+        os.utime(self.filename, ns=(mtime_ns, mtime_ns))
+
+    def test_load_config_parses_file_once(self):
+        """Test that repeated loads of an unchanged file are served from the cache."""
+        load_config(self.filename, 'postgresql')
+        with patch('src.weather_API_data.fetch_data.ConfigParser.read') as mock_read:
+            config_infos = load_config(self.filename, 'postgresql')
+
+        mock_read.assert_not_called()
+        self.assertEqual(config_infos, {'host': 'localhost'})
+
+    def test_load_config_reloads_on_mtime_change(self):
+        """Test that a modified file is parsed again."""
+        load_config(self.filename, 'postgresql')
+        self.rewrite_config("[postgresql]\nhost=db.example.com\n", 10**18)
+
+        config_infos = load_config(self.filename, 'postgresql')
+        self.assertEqual(config_infos['host'], 'db.example.com')
+
+    def test_load_config_returns_copy(self):
+        """Test that callers can not modify the cached config."""
+        config_infos = load_config(self.filename, 'postgresql')
+        config_infos['host'] = 'changed'
+
+        self.assertEqual(load_config(self.filename, 'postgresql')['host'], 'localhost')
+
+    def test_invalidate_config_cache(self):
+        """Test that invalidation forces a new parse."""
+        load_config(self.filename, 'postgresql')
+        invalidate_config_cache(self.filename)
+
+        with patch('src.weather_API_data.fetch_data.ConfigParser.read') as mock_read:
+            with self.assertRaises(ValueError):
+                load_config(self.filename, 'postgresql')
+        mock_read.assert_called_once()
+
+
+
+
 class TestLoadEnvConfig(unittest.TestCase):
     """Test Suite for env_config_loading method."""
 
+    def setUp(self):
+        invalidate_config_cache()
+
     @patch('builtins.open', new_callable=mock_open, read_data="""
            API_KEY=test_key\nAPI_BASE_URL=https://api.example.com""")
     @patch('os.getenv')
@@ -108,6 +199,21 @@ class TestLoadEnvConfig(unittest.TestCase):
 
         mock_file.assert_called_with(env_path, encoding='utf-8')
 
+    @patch.dict(os.environ, {})
+    def test_env_config_loading_reloads_changed_file(self):
+        """Test that a key changed in the .env file is picked up."""
+        os.environ.pop('API_KEY', None)
+        os.environ.pop('API_BASE_URL', None)
+        with tempfile.TemporaryDirectory() as directory:
+            env_path = Path(directory) / '.env'
+            env_path.write_text("API_KEY=old\nAPI_BASE_URL=http://a\n", encoding='utf-8')
+            self.assertEqual(env_config_loading(env_path), ('old', 'http://a'))
+
+            env_path.write_text("API_KEY=new\nAPI_BASE_URL=http://b\n", encoding='utf-8')
+            mtime = env_path.stat().st_mtime + 10
+            os.utime(env_path, (mtime, mtime))
+            self.assertEqual(env_config_loading(env_path), ('new', 'http://b'))
+
     def test_env_config_loading_inexistent_file(self):
         """Test Failure for env_config_loading: .env file is inexitent"""
         env_path = Path('.') / '.nonexistentenv'
@@ -119,6 +225,10 @@ class TestLoadEnvConfig(unittest.TestCase):
 
 class TestFetchWeatherData(unittest.TestCase):
     """Test Suite for fetch_weather_data method."""
+    def tearDown(self):
+        close_clients()
+        reset_breakers()
+
     @classmethod
     def setUpClass(cls):
         file_path = os.path.join(os.path.dirname(__file__), "resources", "weather.json")
@@ -130,7 +240,7 @@ class TestFetchWeatherData(unittest.TestCase):
             cls.fake_api_base_url = "http://api.fakeweatherapi.com"
             cls.city = "Seoul"
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_weather_data_success(self, mocker_get):
         """Given a city name, test that a HTML report about the weather is generated
         correctly."""
@@ -144,7 +254,7 @@ class TestFetchWeatherData(unittest.TestCase):
         mocker_get.assert_called()
         self.assertEqual(weather_info, self.json_object_success)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_weather_data_failure(self, mocker_get):
         """Test that your monthly usage limit has been reached."""
         # Creates a fake requests response object
@@ -157,6 +267,289 @@ class TestFetchWeatherData(unittest.TestCase):
         mocker_get.assert_called()
         self.assertEqual(weather_info, self.json_object_104)
 
+    @patch('requests.Session.get')
+    def test_fetch_weather_data_reuses_client(self, mocker_get):
+        """Test that consecutive fetches share one keep-alive client."""
+        fake_resp = MagicMock()
+        fake_resp.json.return_value = self.json_object_success
+        mocker_get.return_value = fake_resp
+
+        fetch_weather_data(self.city, self.fake_api_key, self.fake_api_base_url)
+        fetch_weather_data("Paris", self.fake_api_key, self.fake_api_base_url)
+
+        client = get_client(self.fake_api_key, self.fake_api_base_url)
+        self.assertIs(get_client(self.fake_api_key, self.fake_api_base_url), client)
+        mocker_get.assert_called_with(
+            self.fake_api_base_url,
+            params={'access_key': self.fake_api_key, 'query': "Paris"},
+            timeout=client.timeout)
+
+
+
+
+class TestWeatherAPIClient(unittest.TestCase):
+    """Test Suite for the WeatherAPIClient class."""
+
+    def test_client_pool_and_timeouts(self):
+        """Test that the client mounts a pooled adapter with the given timeouts."""
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com", pool_size=4,
+                              connect_timeout=1, read_timeout=5) as client:
+            adapter = client.session.get_adapter("https://api.fakeweatherapi.com")
+            self.assertEqual(adapter._pool_maxsize, 4)
+            self.assertEqual(client.timeout, (1, 5))
+            self.assertNotEqual(client.session.headers.get('Connection'), 'close')
+
+    def test_client_without_keep_alive(self):
+        """Test that keep_alive=False asks the server to close connections."""
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com", keep_alive=False) as client:
+            self.assertEqual(client.session.headers['Connection'], 'close')
+
+    @patch('requests.Session.get')
+    def test_client_fetch_takes_token(self, mocker_get):
+        """Test that every request waits for a token from the rate limiter."""
+        limiter = MagicMock()
+        mocker_get.return_value.json.return_value = {"current": {}}
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com",
+                              rate_limiter=limiter) as client:
+            client.fetch("Seoul")
+            client.fetch("Paris")
+
+        self.assertEqual(limiter.acquire.call_count, 2)
+
+    @patch('src.weather_API_data.fetch_data.time.sleep')
+    @patch('requests.Session.get')
+    def test_client_fetch_failure(self, mocker_get, mock_sleep):
+        """Test that a failed request is retried with backoff, then returns None."""
+        mocker_get.side_effect = ConnectionError("Connection refused")
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com",
+                              breaker=CircuitBreaker(), backoff_base=1) as client:
+            self.assertIsNone(client.fetch("Seoul"))
+
+        self.assertEqual(mocker_get.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertLessEqual(mock_sleep.call_args_list[1][0][0], 2)
+
+    @patch('src.weather_API_data.fetch_data.time.sleep')
+    @patch('requests.Session.get')
+    def test_client_retry_after(self, mocker_get, mock_sleep):
+        """Test that a 503 is retried after the delay asked for by Retry-After."""
+        unavailable = MagicMock(status_code=503, headers={'Retry-After': '3'})
+        success = MagicMock(status_code=200)
+        success.json.return_value = {"current": {}}
+        mocker_get.side_effect = [unavailable, success]
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com",
+                              breaker=CircuitBreaker(), backoff_base=0.01) as client:
+            self.assertEqual(client.fetch_or_raise("Seoul"), {"current": {}})
+
+        mock_sleep.assert_called_once_with(3.0)
+
+    @patch('src.weather_API_data.fetch_data.time.sleep')
+    @patch('requests.Session.get')
+    def test_client_long_retry_after_gives_up(self, mocker_get, mock_sleep):
+        """Test that a Retry-After beyond the backoff cap is not waited for."""
+        mocker_get.return_value = MagicMock(status_code=429, headers={'Retry-After': '3600'})
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com",
+                              breaker=CircuitBreaker()) as client:
+            with self.assertRaises(RetryableWeatherAPIError) as context:
+                client.fetch_or_raise("Seoul")
+
+        self.assertEqual(context.exception.retry_after, 3600)
+        mocker_get.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_client_client_error_not_retried(self, mocker_get):
+        """Test that a 4xx answer fails at once and keeps the circuit closed."""
+        mocker_get.return_value = MagicMock(status_code=401, ok=False)
+        breaker = CircuitBreaker(failure_threshold=1)
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com", breaker=breaker) as client:
+            with self.assertRaises(WeatherAPIError):
+                client.fetch_or_raise("Seoul")
+
+        mocker_get.assert_called_once()
+        self.assertEqual(breaker.state, 'closed')
+
+    @patch('src.weather_API_data.fetch_data.time.sleep')
+    @patch('requests.Session.get')
+    def test_client_open_circuit_fails_fast(self, mocker_get, mock_sleep):
+        """Test that an open circuit refuses requests without touching the network."""
+        mocker_get.side_effect = ConnectionError("Connection refused")
+        breaker = CircuitBreaker(failure_threshold=3)
+
+        with WeatherAPIClient("key", "https://api.fakeweatherapi.com", breaker=breaker) as client:
+            self.assertIsNone(client.fetch("Seoul"))
+            with self.assertRaises(CircuitOpenError):
+                client.fetch_or_raise("Paris")
+
+        self.assertEqual(mocker_get.call_count, 3)
+        self.assertEqual(breaker.state, 'open')
+
+
+
+
+class TestFetchWeatherDataConcurrently(unittest.TestCase):
+    """Test Suite for fetch_weather_data_concurrently method."""
+
+    def tearDown(self):
+        close_clients()
+        reset_breakers()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake_api_key = "1234567890qwertyuiop"
+        cls.fake_api_base_url = "http://api.fakeweatherapi.com"
+        cls.cities = ["Seoul", "Paris", "London"]
+
+    @patch('requests.Session.get')
+    def test_fetch_weather_data_concurrently_success(self, mocker_get):
+        """Test that every city gets its own result."""
+        def fake_get(url, params, timeout):
+            fake_resp = MagicMock()
+            city = params['query']
+            fake_resp.json.return_value = {"current": {"temperature": len(city)}}
+            return fake_resp
+        mocker_get.side_effect = fake_get
+
+        results, errors = fetch_weather_data_concurrently(
+            self.cities, self.fake_api_key, self.fake_api_base_url, max_workers=2)
+
+        self.assertEqual(mocker_get.call_count, len(self.cities))
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results), set(self.cities))
+        self.assertEqual(results["Paris"], {"current": {"temperature": 5}})
+
+    @patch('src.weather_API_data.fetch_data.time.sleep')
+    @patch('requests.Session.get')
+    def test_fetch_weather_data_concurrently_errors(self, mocker_get, mock_sleep):
+        """Test that failed cities are reported without losing the others."""
+        def fake_get(url, params, timeout):
+            if params['query'] == "Paris":
+                raise ConnectionError("Connection refused")
+            fake_resp = MagicMock()
+            fake_resp.json.return_value = {"current": {}}
+            return fake_resp
+        mocker_get.side_effect = fake_get
+
+        results, errors = fetch_weather_data_concurrently(
+            self.cities, self.fake_api_key, self.fake_api_base_url)
+
+        self.assertEqual(set(results), {"Seoul", "London"})
+        self.assertEqual(list(errors), ["Paris"])
+        self.assertIsInstance(errors["Paris"], RetryableWeatherAPIError)
+
+    def test_fetch_weather_data_concurrently_invalid_workers(self):
+        """Test failure for fetch_weather_data_concurrently: no workers."""
+        with self.assertRaises(ValueError):
+            fetch_weather_data_concurrently(
+                self.cities, self.fake_api_key, self.fake_api_base_url, max_workers=0)
+
+
+
+
+class StubWeatherAPI(BaseHTTPRequestHandler):
+    """ Weather API stub answering weatherstack-style single and bulk queries """
+
+    bulk_supported = True
+    queries = []
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)['query'][0]
+        self.queries.append(query)
+        cities = query.split(';')
+
+        if len(cities) == 1:
+            body = {"location": {"name": query}, "current": {"temperature": len(query)}}
+        elif self.bulk_supported:
+            body = [{"location": {"name": city}, "current": {"temperature": len(city)}}
+                    for city in cities]
+        else:
+            body = {"success": False, "error": {"code": 604}}
+
+        payload = json.dumps(body).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+
+
+class TestFetchMany(unittest.TestCase):
+    """Test Suite for bulk fetching against a local stub API server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubWeatherAPI)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.api_base_url = f"http://127.0.0.1:{cls.server.server_port}/current"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubWeatherAPI.bulk_supported = True
+        StubWeatherAPI.queries = []
+        self.cities = ["Seoul", "Paris", "London", "Taipei", "Malmö"]
+        self.client = WeatherAPIClient("key", self.api_base_url,
+                                       rate_limiter=TokenBucket(rate=1000, capacity=100),
+                                       breaker=CircuitBreaker())
+
+    def tearDown(self):
+        self.client.close()
+        close_clients()
+        reset_breakers()
+
+    def test_fetch_many_bulk(self):
+        """Test that cities are fetched in chunks and split back per city."""
+
+        results, errors = self.client.fetch_many(self.cities, batch_size=2)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(StubWeatherAPI.queries, ["Seoul;Paris", "London;Taipei", "Malmö"])
+        self.assertEqual(results["Taipei"]["location"]["name"], "Taipei")
+        self.assertEqual(results["Malmö"]["current"]["temperature"], 5)
+
+    def test_fetch_many_falls_back_to_single(self):
+        """Test that a plan without bulk support is served one city at a time."""
+
+        StubWeatherAPI.bulk_supported = False
+
+        results, errors = self.client.fetch_many(self.cities, batch_size=2)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results), set(self.cities))
+        self.assertFalse(self.client.bulk_supported)
+        self.assertEqual(StubWeatherAPI.queries[0], "Seoul;Paris")
+        self.assertEqual(StubWeatherAPI.queries[1:], self.cities)
+
+    def test_fetch_many_invalid_batch_size(self):
+        """Test failure for fetch_many: batch size below one."""
+
+        with self.assertRaises(ValueError):
+            self.client.fetch_many(self.cities, batch_size=0)
+
+    def test_fetch_weather_data_concurrently_in_batches(self):
+        """Test that the concurrent fetch sends one request per chunk."""
+
+        results, errors = fetch_weather_data_concurrently(
+            self.cities, "key", self.api_base_url, max_workers=2, batch_size=3)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results), set(self.cities))
+        self.assertEqual(sorted(StubWeatherAPI.queries), ["Seoul;Paris;London", "Taipei;Malmö"])
+
 
 
 
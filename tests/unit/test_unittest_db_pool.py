@@ -0,0 +1,224 @@
+""" Module providing Unit Tests for the ConnectionPool class
+    and get_pool method in db_pool.py file. """
+
+import threading
+import time
+import unittest
+import sys
+from unittest.mock import MagicMock, patch
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+sys.path.append('./')
+from src.weather_API_data.db_pool import ConnectionPool, get_pool, close_all_pools
+
+
+
+
+def make_mock_connection():
+    """ Create a mock psycopg2 connection in a clean autocommit state """
+    mock_conn = MagicMock()
+    mock_conn.closed = 0
+    mock_conn.autocommit = True
+    mock_conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return mock_conn
+
+
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for checking connections in and out of the pool."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.config = {
+            'host': 'localhost',
+            'database': 'test_db',
+            'user': 'test_user',
+            'password': 'test_password',
+        }
+
+    @patch('psycopg2.connect')
+    def test_getconn_reuses_connection(self, mock_connect):
+        """Test that a returned connection is handed out again."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        pool = ConnectionPool(self.config, minconn=1, maxconn=2)
+
+        conn = pool.getconn()
+        conn.set_isolation_level.assert_called_with(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        mock_connect.assert_called_once_with(**self.config)
+
+    @patch('psycopg2.connect')
+    def test_getconn_timeout_when_exhausted(self, mock_connect):
+        """Test that getconn raises PoolError once maxconn connections are out."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        pool = ConnectionPool(self.config, minconn=0, maxconn=1)
+        pool.getconn()
+
+        with self.assertRaises(PoolError):
+            pool.getconn(timeout=0.01)
+
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    @patch('psycopg2.connect')
+    def test_getconn_waits_for_returned_connection(self, mock_connect):
+        """Test that a waiting thread gets the connection another thread puts back."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        pool = ConnectionPool(self.config, minconn=0, maxconn=1)
+        conn = pool.getconn()
+
+        timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+        timer.start()
+        self.assertIs(pool.getconn(timeout=5), conn)
+        timer.join()
+
+    @patch('psycopg2.connect')
+    def test_health_check_replaces_broken_connection(self, mock_connect):
+        """Test that a connection failing the health check is replaced."""
+
+        broken_conn = make_mock_connection()
+        broken_conn.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            psycopg2.OperationalError("server closed the connection"))
+        fresh_conn = make_mock_connection()
+        mock_connect.side_effect = [broken_conn, fresh_conn]
+
+        pool = ConnectionPool(self.config, minconn=1, maxconn=1, health_check_interval=0)
+
+        self.assertIs(pool.getconn(), fresh_conn)
+        broken_conn.close.assert_called_once()
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    @patch('psycopg2.connect')
+    def test_putconn_resets_connection_state(self, mock_connect):
+        """Test that putconn rolls back open transactions and restores autocommit."""
+
+        mock_conn = make_mock_connection()
+        mock_connect.return_value = mock_conn
+        pool = ConnectionPool(self.config, minconn=1, maxconn=1)
+
+        conn = pool.getconn()
+        conn.autocommit = False
+        conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+
+        mock_conn.rollback.assert_called_once()
+        self.assertTrue(mock_conn.autocommit)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    @patch('psycopg2.connect')
+    def test_putconn_unknown_connection(self, mock_connect):
+        """Test that putting back a foreign connection fails."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        pool = ConnectionPool(self.config, minconn=0, maxconn=1)
+
+        with self.assertRaises(PoolError):
+            pool.putconn(make_mock_connection())
+
+    @patch('psycopg2.connect')
+    def test_connection_context_manager_stats(self, mock_connect):
+        """Test that the connection context manager checks in on exit."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        pool = ConnectionPool(self.config, minconn=0, maxconn=2)
+
+        with pool.connection():
+            self.assertEqual(pool.stats()['in_use'], 1)
+
+        stats = pool.stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['created'], 1)
+
+    @patch('psycopg2.connect')
+    def test_closeall(self, mock_connect):
+        """Test that a closed pool closes idle connections and refuses checkouts."""
+
+        mock_conn = make_mock_connection()
+        mock_connect.return_value = mock_conn
+        pool = ConnectionPool(self.config, minconn=1, maxconn=1)
+
+        pool.closeall()
+
+        mock_conn.close.assert_called_once()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+    def test_invalid_pool_size(self):
+        """Test failure for ConnectionPool: minconn above maxconn."""
+
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.config, minconn=3, maxconn=2)
+
+
+
+
+class TestGetPool(unittest.TestCase):
+    """Tests for the process-wide pool registry."""
+
+    def setUp(self):
+        close_all_pools()
+        self.config = {'host': 'localhost', 'database': 'test_db'}
+
+    def tearDown(self):
+        close_all_pools()
+
+    @patch('psycopg2.connect')
+    def test_get_pool_returns_same_pool(self, mock_connect):
+        """Test that the same configuration shares one pool."""
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+
+        pool = get_pool(self.config, maxconn=3)
+        self.assertIs(get_pool(dict(self.config)), pool)
+        self.assertEqual(pool.maxconn, 3)
+
+    @patch('psycopg2.connect')
+    def test_get_pool_connection_error(self, mock_connect):
+        """Test that a failing database leaves no pool behind."""
+
+        mock_connect.side_effect = psycopg2.DatabaseError("Connection error")
+
+        with self.assertRaises(psycopg2.DatabaseError):
+            get_pool(self.config)
+
+        mock_connect.side_effect = lambda **kwargs: make_mock_connection()
+        self.assertIsNotNone(get_pool(self.config))
+        self.assertEqual(mock_connect.call_count, 2)
+
+    @patch('psycopg2.connect')
+    def test_slow_database_does_not_block_others(self, mock_connect):
+        """Test that a pool still connecting does not hold up other databases."""
+
+        connecting, released = threading.Event(), threading.Event()
+
+        def connect(**kwargs):
+            if kwargs['host'] == 'blackholed':
+                connecting.set()
+                released.wait(5)
+            return make_mock_connection()
+
+        mock_connect.side_effect = connect
+        slow = threading.Thread(target=get_pool, args=({'host': 'blackholed'},))
+        slow.start()
+        try:
+            connecting.wait(5)
+            start = time.monotonic()
+            self.assertIsNotNone(get_pool(self.config))
+            self.assertLess(time.monotonic() - start, 1)
+        finally:
+            released.set()
+            slow.join()
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+""" Module providing Unit Tests for the LatestReadingStore class in latest_store.py file. """
+
+import unittest
+import sys
+from datetime import datetime
+sys.path.append('./')
+from src.weather_API_data.latest_store import LatestReadingStore
+
+
+
+
+class TestLatestReadingStore(unittest.TestCase):
+    """Tests for the array-backed latest reading store."""
+
+    def setUp(self):
+        self.store = LatestReadingStore(max_cities=2)
+        self.row = (5, "Seoul", 24.5, 1001, 74, datetime(2024, 7, 4, 22, 42, 12, 345678))
+
+    def test_round_trip(self):
+        """Test that a stored row is returned unchanged."""
+
+        self.assertTrue(self.store.update(self.row))
+        self.assertEqual(self.store.get("Seoul"), self.row)
+        self.assertIn("Seoul", self.store)
+        self.assertIsNone(self.store.get("Paris"))
+
+    def test_null_columns(self):
+        """Test that NULL columns come back as None."""
+
+        self.store.update((None, "Paris", None, None, None, None))
+        self.assertEqual(self.store.get("Paris"), (None, "Paris", None, None, None, None))
+        self.assertIsNone(self.store.newest_date_time())
+
+    def test_older_reading_ignored(self):
+        """Test that a reading older than the stored one does not replace it."""
+
+        self.store.update(self.row)
+        older = (4, "Seoul", 20.0, 1000, 70, datetime(2024, 7, 4, 21, 0, 0))
+        newer = (6, "Seoul", 25.0, 1002, 75, datetime(2024, 7, 4, 23, 0, 0))
+
+        self.assertEqual(self.store.update_many([older, newer]), 1)
+        self.assertEqual(self.store.get("Seoul"), newer)
+        self.assertEqual(self.store.newest_date_time(), datetime(2024, 7, 4, 23, 0, 0))
+
+    def test_same_reading_not_counted(self):
+        """Test that reading a stored row again does not count as an update."""
+
+        null_row = (None, "Paris", None, None, None, None)
+        self.assertEqual(self.store.update_many([self.row, null_row]), 2)
+
+        self.assertEqual(self.store.update_many([self.row, null_row]), 0)
+        corrected = self.row[:2] + (25.5,) + self.row[3:]
+        self.assertTrue(self.store.update(corrected))
+        self.assertEqual(self.store.get("Seoul"), corrected)
+
+    def test_bounded(self):
+        """Test that cities beyond max_cities are not stored."""
+
+        self.store.update(self.row)
+        self.store.update((6, "Paris", 21.0, 1012, 70, datetime(2024, 7, 4)))
+        self.assertFalse(self.store.update((7, "London", 18.0, 1010, 80, datetime(2024, 7, 4))))
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.stats()['rejected'], 1)
+        self.assertGreater(self.store.stats()['bytes'], 0)
+
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertTrue(self.store.update((7, "London", 18.0, 1010, 80, datetime(2024, 7, 4))))
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+""" Module providing Unit Tests for the LeaderElector class in leader.py file. """
+
+import unittest
+import sys
+import psycopg2
+sys.path.append('./')
+from src.weather_API_data.leader import LeaderElector, HOLDS_LOCK_COMMAND
+
+
+
+
+class FakeServer:
+    """Advisory locks of a database, owned by fake sessions."""
+
+    def __init__(self):
+        self.locks = {}
+        self.down = False
+
+    def connect(self, **kwargs):
+        if self.down:
+            raise psycopg2.OperationalError("server is down")
+        return FakeConnection(self)
+
+
+
+
+class FakeConnection:
+    """Session that can take, check and release advisory locks."""
+
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+        for lock_id, owner in list(self.server.locks.items()):
+            if owner is self:
+                del self.server.locks[lock_id]
+
+
+
+
+class FakeCursor:
+    """Cursor answering the queries LeaderElector sends."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return None
+
+    def execute(self, command, params):
+        locks = self.conn.server.locks
+        if self.conn.server.down:
+            raise psycopg2.OperationalError("connection lost")
+        if command == HOLDS_LOCK_COMMAND:
+            self.result = (locks.get((params[0] << 32) | params[1]) is self.conn,)
+        elif 'pg_try_advisory_lock' in command:
+            owner = locks.setdefault(params[0], self.conn)
+            self.result = (owner is self.conn,)
+        elif 'pg_advisory_unlock' in command:
+            self.result = (locks.pop(params[0], None) is self.conn,)
+
+    def fetchone(self):
+        return self.result
+
+
+
+
+class TestLeaderElector(unittest.TestCase):
+    """Tests for the advisory lock leader election."""
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.db_conf = {'host': 'localhost', 'database': 'weather_info_db'}
+
+    def elector(self, **kwargs):
+        return LeaderElector(self.db_conf, lock_id=42, connect=self.server.connect, **kwargs)
+
+    def test_single_leader(self):
+        """Test that only the first process to ask becomes the leader."""
+
+        first, second = self.elector(), self.elector()
+
+        self.assertTrue(first.heartbeat())
+        self.assertFalse(second.heartbeat())
+        self.assertTrue(first.heartbeat())
+        self.assertTrue(first.is_leader)
+        self.assertFalse(second.is_leader)
+        self.assertEqual(first.stats()['elections'], 1)
+
+    def test_failover_when_leader_session_ends(self):
+        """Test that a follower takes over once the leader's connection is gone."""
+
+        elected = []
+        first, second = self.elector(), self.elector(on_elected=lambda: elected.append(2))
+        first.heartbeat()
+        second.heartbeat()
+
+        first._conn.close()
+        self.assertFalse(first.heartbeat())
+        self.assertTrue(second.heartbeat())
+        self.assertEqual(elected, [2])
+        self.assertEqual(first.stats()['demotions'], 1)
+
+    def test_steps_down_on_heartbeat_error(self):
+        """Test that the leader steps down when it can not reach the database."""
+
+        demoted = []
+        leader = self.elector(on_demoted=lambda: demoted.append(True))
+        leader.heartbeat()
+
+        self.server.down = True
+        self.assertFalse(leader.heartbeat())
+        self.assertEqual(demoted, [True])
+        self.assertEqual(leader.stats()['heartbeat_errors'], 1)
+
+        self.server.down = False
+        self.assertTrue(leader.heartbeat())
+
+    def test_stop_releases_lock(self):
+        """Test that stopping the leader lets another process take over."""
+
+        first, second = self.elector(heartbeat_interval=60), self.elector()
+        first.start()
+        self.assertTrue(first.is_leader)
+        first.stop()
+
+        self.assertFalse(first.is_leader)
+        self.assertFalse(first.heartbeat())
+        self.assertTrue(second.heartbeat())
+        self.assertEqual(self.server.locks, {42: second._conn})
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+""" Module providing Unit Tests for the Counter, Histogram, Gauge and
+    MetricsRegistry classes in metrics.py file. """
+
+import threading
+import unittest
+import sys
+sys.path.append('./')
+from src.weather_API_data.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry
+)
+
+
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for the per-thread metrics and their text exposition."""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_sums_threads(self):
+        """Test that increments from many threads are all counted."""
+
+        counter = Counter('test_requests_total', 'Requests', ('outcome',), registry=self.registry)
+
+        def worker():
+            for _ in range(1000):
+                counter.inc(outcome='ok')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(2, outcome='error')
+
+        self.assertEqual(counter.value(outcome='ok'), 8000)
+        self.assertIn('test_requests_total{outcome="error"} 2', self.registry.render())
+        # Finished threads are folded away, their counts are kept
+        self.assertEqual(len(counter._shards), 1)
+        self.assertEqual(counter.value(outcome='ok'), 8000)
+
+    def test_counter_labels_checked(self):
+        """Test failure for Counter: wrong label names."""
+
+        counter = Counter('test_errors_total', 'Errors', ('operation',), registry=self.registry)
+        with self.assertRaises(ValueError):
+            counter.inc(table='weather_data')
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_histogram_render(self):
+        """Test that buckets are cumulative and end with +Inf, _sum and _count."""
+
+        histogram = Histogram('test_seconds', 'Latency', ('operation',), buckets=(0.1, 1),
+                              registry=self.registry)
+        histogram.observe(0.05, operation='read')
+        histogram.observe(0.5, operation='read')
+        histogram.observe(3, operation='read')
+        with histogram.time(operation='write'):
+            pass
+
+        lines = self.registry.render().splitlines()
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{operation="read",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{operation="read",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{operation="read",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{operation="read"} 3.55', lines)
+        self.assertIn('test_seconds_count{operation="read"} 3', lines)
+        self.assertEqual(histogram.count(operation='write'), 1)
+
+    def test_histogram_timed_decorator(self):
+        """Test that a decorated function is observed even when it raises."""
+
+        histogram = Histogram('test_call_seconds', 'Latency', registry=self.registry)
+
+        @histogram.timed()
+        def failing():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            failing()
+        self.assertEqual(histogram.count(), 1)
+
+    def test_gauge_function_and_set(self):
+        """Test that gauges are read at render time or set explicitly."""
+
+        Gauge('test_pool_connections', 'Connections', ('state',),
+              function=lambda: {'idle': 2, 'in_use': 1}, registry=self.registry)
+        lag = Gauge('test_lag_seconds', 'Lag', registry=self.registry)
+        lag.set(1.5)
+        Counter('test_retries_total', 'Retries', registry=self.registry)
+
+        text = self.registry.render()
+        self.assertIn('test_pool_connections{state="idle"} 2', text)
+        self.assertIn('test_lag_seconds 1.5', text)
+        self.assertIn('test_retries_total 0', text)
+
+    def test_label_values_escaped(self):
+        """Test that quotes in label values are escaped."""
+
+        counter = Counter('test_cities_total', 'Cities', ('city',), registry=self.registry)
+        counter.inc(city='Say "hi"')
+        self.assertIn('test_cities_total{city="Say \\"hi\\""} 1', self.registry.render())
+
+    def test_duplicate_name(self):
+        """Test failure for MetricsRegistry: a name registered twice."""
+
+        Counter('test_total', 'Total', registry=self.registry)
+        with self.assertRaises(ValueError):
+            Counter('test_total', 'Total', registry=self.registry)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
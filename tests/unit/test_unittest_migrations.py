@@ -0,0 +1,105 @@
+""" Module providing Unit Tests for run_migrations and
+    get_schema_version methods in migrations.py file. """
+
+import unittest
+import sys
+from unittest.mock import MagicMock, patch
+import psycopg2
+sys.path.append('./')
+from src.weather_API_data.migrations import (
+    MIGRATIONS,
+    MIGRATION_LOCK_ID,
+    get_schema_version,
+    run_migrations
+)
+
+
+
+
+class TestRunMigrations(unittest.TestCase):
+    """Tests for applying versioned schema migrations."""
+
+    def setUp(self):
+        self.config = {'host': 'localhost', 'database': 'test_db'}
+        self.mock_conn = MagicMock()
+        self.mock_conn.autocommit = True
+        self.mock_cur = MagicMock()
+        self.mock_conn.cursor.return_value.__enter__.return_value = self.mock_cur
+        patcher = patch('src.weather_API_data.migrations.get_pool')
+        self.mock_get_pool = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get_pool.return_value.connection.return_value.__enter__.return_value = (
+            self.mock_conn)
+        self.migrations = [
+            (2, "second", ["CREATE INDEX second_idx ON weather_data (date_time)"]),
+            (1, "first", ["CREATE INDEX first_idx ON weather_data (city_name)"]),
+        ]
+
+    def executed_statements(self):
+        """Return the SQL strings executed on the mock cursor."""
+        return [call[0][0] for call in self.mock_cur.execute.call_args_list]
+
+    def test_run_migrations_applies_pending_in_order(self):
+        """Test that pending migrations run in version order and are recorded."""
+
+        self.mock_cur.fetchone.return_value = None
+
+        applied = run_migrations(self.config, self.migrations)
+
+        self.assertEqual(applied, [1, 2])
+        statements = self.executed_statements()
+        self.assertLess(statements.index(self.migrations[1][2][0]),
+                        statements.index(self.migrations[0][2][0]))
+        self.mock_cur.execute.assert_any_call(
+            "SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        self.mock_cur.execute.assert_any_call(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)", (1, "first"))
+        self.assertEqual(self.mock_conn.commit.call_count, 2)
+
+    def test_run_migrations_skips_applied(self):
+        """Test that already recorded migrations are not applied again."""
+
+        self.mock_cur.fetchone.side_effect = [(1,), None]
+
+        applied = run_migrations(self.config, self.migrations)
+
+        self.assertEqual(applied, [2])
+        self.assertNotIn(self.migrations[1][2][0], self.executed_statements())
+
+    def test_run_migrations_failure_rolls_back(self):
+        """Test that a failing migration is rolled back and reported."""
+
+        def fake_execute(statement, *args):
+            if statement.startswith("CREATE INDEX"):
+                raise psycopg2.ProgrammingError("syntax error")
+
+        self.mock_cur.fetchone.return_value = None
+        self.mock_cur.execute.side_effect = fake_execute
+
+        with self.assertRaises(psycopg2.DatabaseError):
+            run_migrations(self.config, self.migrations)
+
+        self.mock_conn.rollback.assert_called_once()
+        self.assertTrue(self.mock_conn.autocommit)
+
+    def test_default_migrations_create_indexes(self):
+        """Test that the shipped migrations add the weather_data indexes."""
+
+        statements = " ".join(" ".join(m[2]) for m in MIGRATIONS)
+        self.assertIn("(city_name, date_time DESC)", statements)
+        self.assertIn("USING BRIN (date_time)", statements)
+        self.assertIn("INSERT INTO weather_latest", statements)
+        self.assertIn("ORDER BY city_name, date_time DESC, id DESC", statements)
+        self.assertEqual([m[0] for m in MIGRATIONS], list(range(1, len(MIGRATIONS) + 1)))
+
+    def test_get_schema_version(self):
+        """Test that get_schema_version returns the highest applied version."""
+
+        self.mock_cur.fetchone.return_value = (2,)
+        self.assertEqual(get_schema_version(self.config), 2)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
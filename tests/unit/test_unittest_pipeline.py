@@ -0,0 +1,163 @@
+""" Module providing Unit Tests for the IngestPipeline class in pipeline.py file. """
+
+import threading
+import time
+import unittest
+import sys
+sys.path.append('./')
+from src.weather_API_data.pipeline import IngestPipeline
+
+
+
+
+def fake_fetch(cities):
+    """ Return a weather response for every city but Atlantis """
+    results = {
+        city: {"current": {"temperature": len(city), "pressure": 1000, "humidity": 70}}
+        for city in cities if city != "Atlantis"
+    }
+    errors = {city: ValueError("unknown city") for city in cities if city == "Atlantis"}
+    return results, errors
+
+
+
+
+class TestIngestPipeline(unittest.TestCase):
+    """Tests for the fetch/write ingest pipeline."""
+
+    def setUp(self):
+        self.batches = []
+        self.cities = [f"city_{index}" for index in range(10)]
+
+    def write(self, rows):
+        """Record a written micro-batch."""
+        self.batches.append(rows)
+
+    def test_close_drains_all_stages(self):
+        """Test that every submitted city is fetched and written before close returns."""
+
+        pipeline = IngestPipeline(fake_fetch, self.write, workers=3, write_batch_size=4)
+        with pipeline:
+            for city in self.cities + ["Atlantis"]:
+                pipeline.submit(city)
+
+        written = [row[0] for batch in self.batches for row in batch]
+        self.assertEqual(sorted(written), sorted(self.cities))
+        self.assertTrue(all(len(batch) <= 4 for batch in self.batches))
+        self.assertEqual(list(pipeline.errors), ["Atlantis"])
+        stats = pipeline.stats()
+        self.assertEqual((stats['submitted'], stats['fetched'], stats['written']), (11, 10, 10))
+        self.assertEqual(stats['fetch_errors'], 1)
+        self.assertEqual(stats['write_queue_depth'], 0)
+
+    def test_fetch_batches(self):
+        """Test that queued cities are fetched fetch_batch_size at a time."""
+
+        chunks = []
+
+        def fetch(cities):
+            chunks.append(list(cities))
+            return fake_fetch(cities)
+
+        pipeline = IngestPipeline(fetch, self.write, workers=1, fetch_batch_size=4)
+        for city in self.cities:
+            pipeline.submit(city)
+        pipeline.start()
+        pipeline.close()
+
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+
+    def test_flush_on_interval(self):
+        """Test that a partial batch is written once the flush interval passes."""
+
+        written = threading.Event()
+
+        def write(rows):
+            self.batches.append(rows)
+            written.set()
+
+        pipeline = IngestPipeline(fake_fetch, write, write_batch_size=100, flush_interval=0.05)
+        pipeline.start()
+        pipeline.submit("Seoul")
+
+        self.assertTrue(written.wait(2))
+        self.assertEqual(len(self.batches[0]), 1)
+        pipeline.close()
+
+    def test_backpressure(self):
+        """Test that a slow writer bounds the rows waiting between the stages."""
+
+        release = threading.Event()
+
+        def slow_write(rows):
+            release.wait(2)
+            self.batches.append(rows)
+
+        pipeline = IngestPipeline(fake_fetch, slow_write, workers=2, queue_size=2,
+                                  write_batch_size=1)
+        pipeline.start()
+        for city in self.cities:
+            pipeline.submit(city)
+        time.sleep(0.1)
+
+        self.assertLessEqual(pipeline.stats()['write_queue_depth'], 2)
+        self.assertGreater(pipeline.stats()['fetch_queue_depth'], 0)
+        release.set()
+        pipeline.close()
+        self.assertEqual(pipeline.stats()['max_write_queue_depth'], 2)
+        self.assertEqual(len(self.batches), len(self.cities))
+
+    def test_stage_failures_recorded(self):
+        """Test that fetch and write failures are reported per city."""
+
+        def broken_fetch(cities):
+            if "Paris" in cities:
+                raise ConnectionError("Connection refused")
+            return fake_fetch(cities)
+
+        def broken_write(rows):
+            raise RuntimeError("database unavailable")
+
+        pipeline = IngestPipeline(broken_fetch, broken_write, workers=1)
+        with pipeline:
+            pipeline.submit("Paris")
+            pipeline.submit("Seoul")
+
+        self.assertIsInstance(pipeline.errors["Paris"], ConnectionError)
+        self.assertIsInstance(pipeline.errors["Seoul"], RuntimeError)
+        self.assertEqual(pipeline.stats()['write_errors'], 1)
+        with self.assertRaises(RuntimeError):
+            pipeline.submit("London")
+
+    def test_malformed_response_recorded(self):
+        """Test that a response the row builder can not read fails its city
+        only, and the single worker goes on with the next cities."""
+
+        def fetch(cities):
+            results, errors = fake_fetch(cities)
+            results.update({city: None for city in cities if city == "Paris"})
+            results.update({city: {"current": None} for city in cities if city == "Oslo"})
+            return results, errors
+
+        pipeline = IngestPipeline(fetch, self.write, workers=1)
+        with pipeline:
+            for city in ["Paris", "Oslo"] + self.cities:
+                pipeline.submit(city)
+
+        self.assertEqual(sorted(pipeline.errors), ["Oslo", "Paris"])
+        self.assertIsInstance(pipeline.errors["Paris"], TypeError)
+        self.assertEqual(pipeline.written, set(self.cities))
+
+    def test_invalid_parameters(self):
+        """Test failure for IngestPipeline: no workers or empty batches."""
+
+        with self.assertRaises(ValueError):
+            IngestPipeline(fake_fetch, self.write, workers=0)
+        with self.assertRaises(ValueError):
+            IngestPipeline(fake_fetch, self.write, write_batch_size=0)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+""" Module providing Unit Tests for the request profiling helpers in profiling.py file. """
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import sys
+from flask import Flask
+sys.path.append('./')
+from src.weather_API_data import profiling
+from src.weather_API_data.profiling import (
+    RequestProfile,
+    ProfileSampler,
+    init_app,
+    set_slow_query_threshold,
+    span,
+    trace_query
+)
+
+
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for spans, the slow-query log and cProfile sampling."""
+
+    def tearDown(self):
+        set_slow_query_threshold(None)
+        profiling._CURRENT.set(None)
+
+    def test_span_noop_when_off(self):
+        """Test that spans and query traces are shared no-ops when profiling is off."""
+
+        self.assertIs(span('execute'), span('fetchall'))
+        with trace_query("SELECT 1") as trace:
+            trace.rowcount = 1
+        self.assertIsNone(trace.rowcount)
+
+    def test_spans_summed_per_phase(self):
+        """Test that repeated phases of a request are summed."""
+
+        profile = RequestProfile()
+        profiling._CURRENT.set(profile)
+        for _ in range(3):
+            with span('execute'):
+                pass
+        with trace_query("SELECT 1") as trace:
+            trace.rowcount = 1
+
+        self.assertEqual(list(profile.spans), ['execute', 'query'])
+        self.assertEqual(profile.spans['execute'][1], 3)
+        self.assertRegex(profile.server_timing(),
+                         r'^execute;dur=[\d.]+, query;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_slow_query_logged(self):
+        """Test that queries over the threshold are logged with their parameters."""
+
+        set_slow_query_threshold(0)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with trace_query("SELECT *\n    FROM weather_latest WHERE city_name = %s",
+                             ['Seoul']) as trace:
+                trace.rowcount = 1
+
+        self.assertIn("1 rows) : SELECT * FROM weather_latest WHERE city_name = %s "
+                      "params=['Seoul']", output.getvalue())
+
+    def test_fast_query_not_logged(self):
+        """Test that queries under the threshold are not logged."""
+
+        set_slow_query_threshold(60)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with trace_query("SELECT 1"):
+                pass
+        self.assertEqual(output.getvalue(), "")
+
+    def test_init_app_server_timing(self):
+        """Test that profiled requests carry a Server-Timing header."""
+
+        app = Flask(__name__)
+
+        @app.route('/ping')
+        def ping():
+            with span('work'):
+                return 'pong'
+
+        self.assertIsNone(init_app(app, spans=False, sample_rate=0))
+        self.assertNotIn('Server-Timing', app.test_client().get('/ping').headers)
+
+        app = Flask(__name__)
+        app.add_url_rule('/ping', 'ping', ping)
+        init_app(app, spans=True, sample_rate=0)
+        header = app.test_client().get('/ping').headers['Server-Timing']
+        self.assertTrue(header.startswith('work;dur='))
+        self.assertIsNone(profiling._CURRENT.get())
+
+    def test_sampler_writes_one_in_n(self):
+        """Test that one request in sample_rate is profiled to a file."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            sampler = ProfileSampler(2, directory)
+            first = sampler.start()
+            self.assertIsNotNone(first)
+            path = sampler.stop(first, 'get_city_weather')
+            self.assertIsNone(sampler.start())
+
+            self.assertTrue(path.endswith('-get_city_weather.prof'))
+            self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+
+        with self.assertRaises(ValueError):
+            ProfileSampler(0)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+""" Module providing Unit Tests for the TokenBucket and
+    FileTokenBucket classes in rate_limit.py file. """
+
+import os
+import tempfile
+import threading
+import unittest
+import sys
+from unittest.mock import patch
+sys.path.append('./')
+from src.weather_API_data.fetch_data import (
+    API_CALLS_PER_MINUTE,
+    DEFAULT_RATE_LIMIT_BURST,
+    ONE_MINUTE
+)
+from src.weather_API_data.rate_limit import (
+    TokenBucket,
+    FileTokenBucket,
+    rate_limiter_from_env
+)
+
+
+
+
+class FakeClock:
+    """ Manually advanced clock, sleeping advances it """
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for the in-process token bucket."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=1, capacity=3, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_refill(self):
+        """Test that a full bucket allows capacity calls, then refills at rate."""
+
+        self.assertTrue(all(self.bucket.try_acquire() for _ in range(3)))
+        self.assertFalse(self.bucket.try_acquire())
+
+        self.clock.now = 1.0
+        self.assertTrue(self.bucket.try_acquire())
+        self.assertFalse(self.bucket.try_acquire())
+
+    def test_refill_capped_at_capacity(self):
+        """Test that an idle bucket never holds more than capacity tokens."""
+
+        self.clock.now = 100.0
+        self.assertTrue(all(self.bucket.try_acquire() for _ in range(3)))
+        self.assertFalse(self.bucket.try_acquire())
+
+    def test_acquire_waits_for_token(self):
+        """Test that acquire sleeps exactly until the next token."""
+
+        for _ in range(3):
+            self.bucket.acquire()
+        self.assertTrue(self.bucket.acquire())
+        self.assertEqual(self.clock.slept, [1.0])
+
+    def test_acquire_timeout(self):
+        """Test that acquire gives up when the token comes after the timeout."""
+
+        for _ in range(3):
+            self.bucket.acquire()
+        self.assertFalse(self.bucket.acquire(timeout=0.5))
+        self.assertEqual(self.clock.slept, [])
+
+    def test_threads_share_quota(self):
+        """Test that concurrent callers never take more than the bucket holds."""
+
+        bucket = TokenBucket(rate=0.001, capacity=50)
+        taken = []
+
+        def worker():
+            taken.extend(1 for _ in range(20) if bucket.try_acquire())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(taken), 50)
+
+    def test_invalid_parameters(self):
+        """Test failure for TokenBucket: bad rate, capacity or request size."""
+
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=1, capacity=0)
+        with self.assertRaises(ValueError):
+            self.bucket.try_acquire(4)
+
+
+
+
+class TestFileTokenBucket(unittest.TestCase):
+    """Tests for the file-backed token bucket shared between processes."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "api_rate_limit")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_bucket(self):
+        """Return a bucket on the shared state file."""
+        return FileTokenBucket(self.path, rate=1, capacity=2,
+                               clock=self.clock, sleep=self.clock.sleep)
+
+    def test_buckets_share_state(self):
+        """Test that two buckets on one file draw from a single quota."""
+
+        first, second = self.make_bucket(), self.make_bucket()
+
+        self.assertTrue(first.try_acquire())
+        self.assertTrue(second.try_acquire())
+        self.assertFalse(first.try_acquire())
+
+        self.clock.now = 1.0
+        self.assertTrue(second.try_acquire())
+        self.assertFalse(first.try_acquire())
+
+    def test_corrupt_state_starts_full(self):
+        """Test that an unreadable state file is treated as a full bucket."""
+
+        with open(self.path, 'w', encoding='utf-8') as state_file:
+            state_file.write("garbage")
+
+        bucket = self.make_bucket()
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+
+
+
+class TestRateLimiterFromEnv(unittest.TestCase):
+    """Tests for building the API rate limiter from the environment."""
+
+    @patch.dict(os.environ, {'API_RATE_LIMIT_CALLS': '120', 'API_RATE_LIMIT_BURST': '4'})
+    def test_in_process_limiter(self):
+        """Test that the calls per period and burst come from the environment."""
+
+        os.environ.pop('API_RATE_LIMIT_FILE', None)
+        limiter = rate_limiter_from_env(60, 60, 8)
+
+        self.assertIs(type(limiter), TokenBucket)
+        self.assertEqual(limiter.rate, 117 / 60)
+        self.assertEqual(limiter.capacity, 4.0)
+
+    def call_times(self, limiter, seconds=600):
+        """Return when callers retrying every quarter of a second get through."""
+        clock = FakeClock()
+        bucket = TokenBucket(limiter.rate, limiter.capacity, clock=clock, sleep=clock.sleep)
+        call_times = []
+        for tick in range(seconds * 4):
+            clock.now = tick / 4
+            while bucket.try_acquire():
+                call_times.append(clock.now)
+        return call_times
+
+    def assert_within_quota(self, call_times, calls):
+        """Assert that no minute, the first one included, holds more than calls."""
+        for start in [0.0] + call_times:
+            self.assertLessEqual(
+                sum(1 for when in call_times if start <= when < start + 60), calls)
+
+    @patch.dict(os.environ, {'API_RATE_LIMIT_CALLS': '', 'API_RATE_LIMIT_BURST': ''})
+    def test_default_limiter_uses_the_quota(self):
+        """Test that the default limiter lets exactly 60 calls through in
+        every minute, the first one included."""
+
+        os.environ.pop('API_RATE_LIMIT_FILE', None)
+        call_times = self.call_times(rate_limiter_from_env(
+            API_CALLS_PER_MINUTE, ONE_MINUTE, DEFAULT_RATE_LIMIT_BURST))
+
+        self.assert_within_quota(call_times, 60)
+        self.assertEqual(sum(1 for when in call_times if when < 60), 60)
+        self.assertGreaterEqual(len(call_times), 600 - 1)
+
+    @patch.dict(os.environ, {'API_RATE_LIMIT_CALLS': '60', 'API_RATE_LIMIT_BURST': '8'})
+    def test_burst_keeps_the_quota(self):
+        """Test that a burst, starting full, never lets more than 60 calls
+        through in a minute, at the cost of the steady rate."""
+
+        os.environ.pop('API_RATE_LIMIT_FILE', None)
+        limiter = rate_limiter_from_env(60, 60, 1)
+        call_times = self.call_times(limiter)
+
+        self.assertEqual(limiter.rate, 53 / 60)
+        self.assert_within_quota(call_times, 60)
+        self.assertEqual(call_times[:8], [0.0] * 8)
+
+    @patch.dict(os.environ, {'API_RATE_LIMIT_CALLS': '5', 'API_RATE_LIMIT_BURST': '8'})
+    def test_burst_capped_at_calls(self):
+        """Test that a burst larger than the quota is cut down to it."""
+
+        os.environ.pop('API_RATE_LIMIT_FILE', None)
+        limiter = rate_limiter_from_env(60, 60, 8)
+
+        self.assertEqual(limiter.capacity, 5.0)
+        self.assertEqual(limiter.rate, 1 / 60)
+        self.assert_within_quota(self.call_times(limiter), 5)
+
+    @patch.dict(os.environ, {'API_RATE_LIMIT_FILE': '/tmp/weather_api_rate_limit'})
+    def test_shared_limiter(self):
+        """Test that a state file selects the cross-process limiter."""
+
+        limiter = rate_limiter_from_env(60, 60, 8)
+
+        self.assertIsInstance(limiter, FileTokenBucket)
+        self.assertEqual(limiter.path, '/tmp/weather_api_rate_limit')
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,22 @@
 """ Module providing Unit Tests for get_weather_data. """
 
 import unittest
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 import sys
 import psycopg2
 from psycopg2 import extensions
 sys.path.append('./')
-from src.weather_API_data.read_data import get_weather_data
+from src.weather_API_data.read_data import (
+    get_weather_data,
+    iter_weather_data,
+    build_query,
+    get_weather_aggregates,
+    encode_cursor,
+    decode_cursor,
+    next_cursor
+)
+from src.weather_API_data.db_pool import close_all_pools
 
 
 
@@ -26,6 +36,10 @@ class TestReadData(unittest.TestCase):
             [5, "Seoul", 24.0, 1001, 74, "Thu, 04 Jul 2024 22:42:12 GMT"]
             ]
         self.read_data_command = "SELECT * FROM weather_data"
+        close_all_pools()
+
+    def tearDown(self):
+        close_all_pools()
 
     @patch('psycopg2.connect')
     def test_get_weather_data_success(self, mock_connect):
@@ -34,6 +48,7 @@ class TestReadData(unittest.TestCase):
         mock_conn = MagicMock()
         mock_cur = MagicMock()
         mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cur
         mock_conn.set_isolation_level.return_value = None
@@ -56,6 +71,7 @@ class TestReadData(unittest.TestCase):
         mock_conn = MagicMock()
         mock_cur = MagicMock()
         mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cur
         mock_conn.set_isolation_level.return_value = None
@@ -81,6 +97,129 @@ class TestReadData(unittest.TestCase):
             mock_connect.assert_called_once_with(**self.config)
             self.assertIsNone(weather_data)
 
+    def test_build_query(self):
+        """Test that list filters become IN clauses and scalars become equalities."""
+
+        command, params = build_query(
+            self.read_data_command, {'city_name': ['Seoul', 'Paris'], 'humidity': 74})
+
+        self.assertEqual(
+            command, "SELECT * FROM weather_data WHERE city_name IN (%s,%s) AND humidity = %s")
+        self.assertEqual(params, ['Seoul', 'Paris', 74])
+
+    def test_build_query_time_range_and_keyset(self):
+        """Test that time bounds, the keyset position and the limit are appended."""
+
+        start, end = datetime(2024, 7, 4), datetime(2024, 7, 5)
+        after = (datetime(2024, 7, 4, 12, 0, 0), 42)
+
+        command, params = build_query(
+            self.read_data_command, self.city_filter, start, end, after, 500)
+
+        self.assertEqual(
+            command,
+            "SELECT * FROM weather_data WHERE city_name IN (%s) AND date_time >= %s"
+            " AND date_time < %s AND (date_time, id) > (%s, %s)"
+            " ORDER BY date_time, id LIMIT %s")
+        self.assertEqual(params, ['Seoul', start, end, after[0], 42, 500])
+
+    def test_cursor_round_trip(self):
+        """Test that a page token decodes to the keyset of the row it was built from."""
+
+        row = (42, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 12, 0, 0))
+
+        token = encode_cursor(row)
+
+        self.assertEqual(decode_cursor(token), (row[5], 42))
+        self.assertEqual(next_cursor([row], 1), token)
+        self.assertIsNone(next_cursor([row], 2))
+        self.assertIsNone(next_cursor([row], None))
+
+    def test_decode_cursor_invalid(self):
+        """Test failure for decode_cursor: tampered token."""
+
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    @patch('psycopg2.connect')
+    def test_get_weather_data_page(self, mock_connect):
+        """Test that get_weather_data seeks past the cursor position."""
+
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.fetchall.return_value = self.weather_data
+        position = (datetime(2024, 7, 4, 12, 0, 0), 42)
+        token = encode_cursor((42, None, None, None, None, position[0]))
+
+        get_weather_data(self.config, self.read_data_command, self.city_filter,
+                         limit=10, cursor=token)
+
+        mock_cur.execute.assert_called_once_with(
+            "SELECT * FROM weather_data WHERE city_name IN (%s)"
+            " AND (date_time, id) > (%s, %s) ORDER BY date_time, id LIMIT %s",
+            ['Seoul', position[0], 42, 10])
+
+    @patch('psycopg2.connect')
+    def test_get_weather_aggregates(self, mock_connect):
+        """Test that aggregates are read from the rollup table of the granularity."""
+
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.fetchall.return_value = []
+        start = datetime(2024, 7, 1)
+
+        get_weather_aggregates(self.config, ['Seoul'], 'day', start=start)
+
+        command, params = mock_cur.execute.call_args[0]
+        self.assertIn("FROM weather_rollup_daily WHERE city_name IN (%s) AND bucket >= %s", command)
+        self.assertTrue(command.endswith("ORDER BY city_name, bucket"))
+        self.assertIn("temperature_sum / NULLIF(temperature_count, 0)", command)
+        self.assertEqual(params, ['Seoul', start])
+
+    def test_get_weather_aggregates_invalid(self):
+        """Test failure for get_weather_aggregates: bad granularity or no city."""
+
+        with self.assertRaises(ValueError):
+            get_weather_aggregates(self.config, ['Seoul'], 'week')
+        with self.assertRaises(ValueError):
+            get_weather_aggregates(self.config, [], 'hour')
+
+    @patch('psycopg2.connect')
+    def test_iter_weather_data_streams_rows(self, mock_connect):
+        """Test that iter_weather_data reads through a named cursor."""
+
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.__iter__.return_value = iter(self.weather_data)
+
+        rows = iter_weather_data(self.config, self.read_data_command, self.city_filter, itersize=50)
+        mock_connect.assert_not_called()
+
+        self.assertEqual(list(rows), self.weather_data)
+        self.assertTrue(mock_conn.cursor.call_args[1]['name'].startswith('weather_stream_'))
+        self.assertEqual(mock_cur.itersize, 50)
+        mock_cur.execute.assert_called_once_with(
+            "SELECT * FROM weather_data WHERE city_name IN (%s)", ['Seoul'])
+        self.assertTrue(mock_conn.autocommit)
+
+    @patch('psycopg2.connect')
+    def test_iter_weather_data_failure(self, mock_connect):
+        """Test for failure case of iter_weather_data."""
+
+        mock_connect.side_effect = psycopg2.DatabaseError("Connection error")
+
+        with self.assertRaises(psycopg2.DatabaseError):
+            list(iter_weather_data(self.config, self.read_data_command))
+
 
 
 
@@ -0,0 +1,135 @@
+""" Module providing Unit Tests for the CircuitBreaker class and the
+    backoff_delay and parse_retry_after functions in resilience.py file. """
+
+from datetime import datetime, timezone
+import unittest
+import sys
+from unittest.mock import patch
+sys.path.append('./')
+from src.weather_API_data.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    get_breaker,
+    parse_retry_after,
+    reset_breakers
+)
+
+
+
+
+class FakeClock:
+    """ Manually advanced clock for cool-down tests """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the per-host circuit breaker."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the threshold and fails fast."""
+
+        self.breaker.record_failure()
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError) as context:
+            self.breaker.allow()
+        self.assertEqual(context.exception.retry_after, 30)
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_success_resets_failures(self):
+        """Test that only consecutive failures count."""
+
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.breaker.allow()
+        self.assertEqual(self.breaker.stats(), {'state': 'closed', 'failures': 1})
+
+    def test_half_open_trial(self):
+        """Test that one trial is let through after the cool-down."""
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 30.0
+
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, 'half_open')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial opens the circuit for another cool-down."""
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 30.0
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        self.clock.now = 59.0
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_shared_breakers(self):
+        """Test that clients of one host share a breaker."""
+
+        self.addCleanup(reset_breakers)
+        self.assertIs(get_breaker("api.weatherstack.com"), get_breaker("api.weatherstack.com"))
+        self.assertIsNot(get_breaker("api.weatherstack.com"), get_breaker("localhost"))
+
+    def test_invalid_threshold(self):
+        """Test failure for CircuitBreaker: threshold below one."""
+
+        with self.assertRaises(ValueError):
+            CircuitBreaker(failure_threshold=0)
+
+
+
+
+class TestBackoff(unittest.TestCase):
+    """Tests for the retry delays."""
+
+    @patch('src.weather_API_data.resilience.random.uniform')
+    def test_backoff_delay_full_jitter(self, mock_uniform):
+        """Test that the jitter range doubles per attempt up to the cap."""
+
+        backoff_delay(0, 0.5, 8)
+        backoff_delay(3, 0.5, 8)
+        backoff_delay(10, 0.5, 8)
+
+        self.assertEqual([call[0] for call in mock_uniform.call_args_list],
+                         [(0, 0.5), (0, 4.0), (0, 8)])
+
+    def test_parse_retry_after(self):
+        """Test that Retry-After accepts seconds and HTTP dates."""
+
+        now = datetime(2024, 7, 4, 22, 0, 0, tzinfo=timezone.utc)
+
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("Thu, 04 Jul 2024 22:00:30 GMT", now), 30.0)
+        self.assertEqual(parse_retry_after("Thu, 04 Jul 2024 21:00:00 GMT", now), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
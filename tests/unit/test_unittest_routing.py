@@ -0,0 +1,266 @@
+""" Module providing Unit Tests for the ReadRouter class and the replica
+    config loading in routing.py file. """
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import psycopg2
+sys.path.append('./')
+from src.weather_API_data.fetch_data import invalidate_config_cache
+from src.weather_API_data.routing import (
+    REPLICA_CONNECT_TIMEOUT,
+    ReadRouter,
+    get_router,
+    load_replica_configs,
+    reset_routers
+)
+
+
+
+
+def status_row(lag):
+    """ Replication status of a streaming standby lag seconds behind,
+        None for a standby whose WAL receiver is down """
+    if lag is None:
+        return (True, 0, None, 100, True, 5.0)
+    return (True, 1, 'streaming', 100, lag == 0, lag)
+
+
+
+
+class FakePools:
+    """Replica pools answering the status query with a configurable lag,
+    or with the status row of rows when the replica has one."""
+
+    def __init__(self):
+        self.lags = {}
+        self.rows = {}
+        self.busy = {}
+        self.checks = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_pool(self, db_conf):
+        host = db_conf['host']
+        pool = MagicMock()
+        cur = pool.connection.return_value.__enter__.return_value.cursor.return_value.__enter__
+        lag = self.lags.get(host, 0)
+        if isinstance(lag, Exception):
+            cur.return_value.execute.side_effect = lag
+        else:
+            cur.return_value.fetchone.return_value = self.rows.get(host) or status_row(lag)
+        pool.connection.side_effect = self._count(pool.connection)
+        pool.stats.return_value = {'in_use': self.busy.get(host, 0), 'waiting': 0}
+        return pool
+
+    def _count(self, connection):
+        def checkout(*args, **kwargs):
+            self.gate.wait(5)
+            self.checks += 1
+            return connection.return_value
+        return checkout
+
+
+
+
+class TestReadRouter(unittest.TestCase):
+    """Tests for routing reads to replicas with primary fallback."""
+
+    def setUp(self):
+        self.pools = FakePools()
+        patcher = patch('src.weather_API_data.routing.get_pool', self.pools.get_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = 0.0
+        self.primary = {'host': 'primary'}
+        self.replicas = [{'host': 'replica-1'}, {'host': 'replica-2'}]
+
+    def router(self, **kwargs):
+        router = ReadRouter(self.replicas, clock=lambda: self.now, **kwargs)
+        router.check_replicas()
+        return router
+
+    def hosts(self, router, count):
+        return [router.read_conf(self.primary)['host'] for _ in range(count)]
+
+    def test_no_replicas(self):
+        """Test that without replicas every read goes to the primary."""
+
+        read = MagicMock(return_value=[1])
+        self.assertEqual(ReadRouter().read(self.primary, read, "SELECT 1"), [1])
+        read.assert_called_once_with(self.primary, "SELECT 1")
+
+    def test_replicas_unused_until_checked(self):
+        """Test that reads go to the primary until a replica passed a health check."""
+
+        self.pools.gate.clear()
+        router = ReadRouter(self.replicas, clock=lambda: self.now)
+        self.assertEqual(router.read_conf(self.primary), self.primary)
+
+        checker = router._checker
+        self.pools.gate.set()
+        checker.join()
+        self.assertEqual(self.pools.checks, 2)
+        self.assertEqual(self.hosts(router, 1), ['replica-1'])
+        self.assertEqual(router.replicas[0]['connect_timeout'], REPLICA_CONNECT_TIMEOUT)
+
+    def test_round_robin(self):
+        """Test that reads take turns over the healthy replicas."""
+
+        router = self.router()
+        self.assertEqual(self.hosts(router, 4),
+                         ['replica-1', 'replica-2', 'replica-1', 'replica-2'])
+        self.assertEqual(router.stats()['replica_reads'], 4)
+
+    def test_health_checked_once_per_interval(self):
+        """Test that replicas are checked again only after the interval."""
+
+        router = self.router(health_check_interval=10)
+        self.hosts(router, 5)
+        self.assertEqual(self.pools.checks, 2)
+
+        # Due checks run in the background, reads keep the last known health
+        self.now = 11.0
+        self.pools.gate.clear()
+        self.assertEqual(self.hosts(router, 1), ['replica-2'])
+        checker = router._checker
+        self.pools.gate.set()
+        checker.join()
+        self.assertEqual(self.pools.checks, 4)
+
+    def test_lagging_and_down_replicas_skipped(self):
+        """Test that replicas behind max_lag or unreachable are not used."""
+
+        self.pools.lags = {'replica-1': 45.0}
+        router = self.router(max_lag=30)
+        self.assertEqual(self.hosts(router, 2), ['replica-2', 'replica-2'])
+
+        self.pools.lags['replica-2'] = psycopg2.OperationalError("connection refused")
+        self.now = 60.0
+        router.check_replicas()
+        self.assertEqual(self.hosts(router, 1), ['primary'])
+        self.assertFalse(router.stats()['replicas']['replica-2:/']['healthy'])
+
+    def test_replica_not_streaming_skipped(self):
+        """Test that a replica whose WAL receiver is not streaming has no lag and is skipped."""
+
+        self.pools.lags = {'replica-1': None}
+        router = self.router()
+        self.assertEqual(self.hosts(router, 2), ['replica-2', 'replica-2'])
+        self.assertIsNone(router.stats()['replicas']['replica-1:/']['lag'])
+
+    def test_hidden_receiver_status(self):
+        """Test that without the receiver status a replica is caught up only
+        while the WAL it received keeps advancing."""
+
+        self.replicas = [{'host': 'replica-1'}]
+        self.pools.rows = {'replica-1': (True, 1, None, 100, True, 45.0)}
+        router = self.router(max_lag=30)
+        self.assertEqual(self.hosts(router, 1), ['primary'])
+        self.assertEqual(router.stats()['replicas']['replica-1:/']['lag'], 45.0)
+
+        self.pools.rows['replica-1'] = (True, 1, None, 200, True, 0.5)
+        self.now = 60.0
+        router.check_replicas()
+        self.assertEqual(self.hosts(router, 1), ['replica-1'])
+        self.assertEqual(router.stats()['replicas']['replica-1:/']['lag'], 0)
+
+        # Disconnected: nothing received, the last replay keeps getting older
+        self.pools.rows['replica-1'] = (True, 1, None, 200, True, 60.5)
+        self.now = 120.0
+        router.check_replicas()
+        self.assertEqual(self.hosts(router, 1), ['primary'])
+
+    def test_primary_as_replica(self):
+        """Test that a database that is not a standby has no lag."""
+
+        self.pools.rows = {'replica-1': (False, 0, None, None, None, None)}
+        router = self.router()
+        self.assertEqual(router.stats()['replicas']['replica-1:/']['lag'], 0)
+
+    def test_fallback_to_primary(self):
+        """Test that a read failing on a replica is retried on the primary."""
+
+        router = self.router()
+        read = MagicMock(side_effect=[psycopg2.OperationalError("server closed"), [1]])
+
+        self.assertEqual(router.read(self.primary, read, "SELECT 1"), [1])
+        self.assertEqual(read.call_args_list[1][0], (self.primary, "SELECT 1"))
+        self.assertEqual(router.stats()['fallbacks'], 1)
+        # The failed replica sits out until its next health check
+        self.assertEqual(self.hosts(router, 2), ['replica-2', 'replica-2'])
+
+    def test_query_errors_not_retried(self):
+        """Test that errors of the query itself are raised, not retried."""
+
+        router = self.router()
+        read = MagicMock(side_effect=psycopg2.ProgrammingError("syntax error"))
+
+        with self.assertRaises(psycopg2.ProgrammingError):
+            router.read(self.primary, read, "SELEC 1")
+        read.assert_called_once()
+
+    def test_least_loaded(self):
+        """Test that least_loaded picks the replica with the fewest busy connections."""
+
+        self.pools.busy = {'replica-1': 5, 'replica-2': 1}
+        router = self.router(strategy='least_loaded')
+        self.assertEqual(self.hosts(router, 3), ['replica-2'] * 3)
+
+        with self.assertRaises(ValueError):
+            ReadRouter(self.replicas, strategy='random')
+
+
+
+
+class TestReplicaConfig(unittest.TestCase):
+    """Tests for loading replica sections and routing options from database.ini."""
+
+    def setUp(self):
+        reset_routers()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'database.ini')
+
+    def tearDown(self):
+        invalidate_config_cache()
+        reset_routers()
+
+    def write(self, text):
+        with open(self.path, 'w', encoding='utf-8') as config_file:
+            config_file.write(text)
+        invalidate_config_cache(self.path)
+
+    def test_replica_sections(self):
+        """Test that replica sections and the read_routing section are loaded."""
+
+        self.write("[weather_info_database]\nhost=primary\n"
+                   "[weather_info_database_replica_1]\nhost=replica-1\n"
+                   "[weather_info_database_replica_2]\nhost=replica-2\n"
+                   "[read_routing]\nstrategy=least_loaded\nmax_lag_seconds=5\n")
+
+        self.assertEqual(load_replica_configs(self.path, 'weather_info_database'),
+                         [{'host': 'replica-1'}, {'host': 'replica-2'}])
+        router = get_router(self.path, 'weather_info_database')
+        self.assertEqual(router.strategy, 'least_loaded')
+        self.assertEqual(router.max_lag, 5.0)
+        self.assertIs(get_router(self.path, 'weather_info_database'), router)
+
+        self.write("[weather_info_database]\nhost=primary\n")
+        self.assertEqual(get_router(self.path, 'weather_info_database').replicas, [])
+
+    def test_missing_file(self):
+        """Test that a missing config file means no replicas."""
+
+        router = get_router(self.path, 'weather_info_database')
+        self.assertEqual(router.replicas, [])
+        self.assertEqual(router.strategy, 'round_robin')
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+""" Module providing Unit Tests for the CityRefreshScheduler class
+    in scheduling.py file. """
+
+import unittest
+import sys
+sys.path.append('./')
+from src.weather_API_data.scheduling import CityRefreshScheduler
+
+
+
+
+class FakeClock:
+    """ Manually advanced clock for scheduling tests """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+
+
+class TestCityRefreshScheduler(unittest.TestCase):
+    """Tests for the staggered, freshness-aware refresh schedule."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cities = ["Seoul", "Paris", "London", "Taipei"]
+        self.scheduler = CityRefreshScheduler(self.cities, 100, clock=self.clock)
+
+    def test_first_refresh_staggered(self):
+        """Test that the first refresh of the cities is spread over the interval."""
+
+        due_times = []
+        for step in range(4):
+            self.clock.now = 1000.0 + step * 25
+            due_times.append(self.scheduler.pop_due())
+
+        self.assertEqual(due_times, [["Seoul"], ["Paris"], ["London"], ["Taipei"]])
+        self.assertIsNone(self.scheduler.next_due())
+
+    def test_pop_due_limit(self):
+        """Test that at most limit cities are handed out, most overdue first."""
+
+        self.clock.now = 2000.0
+
+        self.assertEqual(self.scheduler.pop_due(limit=3), ["Seoul", "Paris", "London"])
+        self.assertEqual(self.scheduler.pop_due(limit=3), ["Taipei"])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_schedule_per_city_interval(self):
+        """Test that a fetched city is due again after its own interval."""
+
+        self.scheduler.set_interval("Seoul", 10)
+        self.assertEqual(self.scheduler.pop_due(), ["Seoul"])
+        self.scheduler.schedule("Seoul")
+
+        self.assertIn("Seoul", self.scheduler)
+        self.clock.now = 1010.0
+        self.assertEqual(self.scheduler.pop_due(), ["Seoul"])
+
+    def test_defer_fresh(self):
+        """Test that cities with a fresh stored reading are not fetched."""
+
+        self.clock.now = 2000.0
+        due = self.scheduler.pop_due()
+
+        stale = self.scheduler.defer_fresh(due, {"Seoul": 1950.0, "Paris": 1800.0})
+
+        self.assertEqual(stale, ["Paris", "London", "Taipei"])
+        self.assertEqual(self.scheduler.next_due(), 2050.0)
+
+    def test_add_and_remove_city(self):
+        """Test that cities can join and leave the schedule."""
+
+        self.scheduler.remove_city("Seoul")
+        self.scheduler.add_city("Malmö")
+
+        self.assertEqual(self.scheduler.pop_due(), ["Malmö"])
+        self.assertNotIn("Seoul", self.scheduler)
+
+    def test_invalid_interval(self):
+        """Test failure for CityRefreshScheduler: non positive interval."""
+
+        with self.assertRaises(ValueError):
+            CityRefreshScheduler(self.cities, 0)
+        with self.assertRaises(ValueError):
+            self.scheduler.set_interval("Seoul", -1)
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+""" Module providing Unit Tests for the RowSerializer class in serializers.py file. """
+
+import json
+import unittest
+import sys
+from datetime import datetime
+sys.path.append('./')
+from src.weather_API_data.serializers import RowSerializer, WEATHER_ROW_SERIALIZER
+
+
+
+
+class TestRowSerializer(unittest.TestCase):
+    """Tests for the records and columns JSON layouts."""
+
+    def setUp(self):
+        self.rows = [
+            (1, "Seoul", 24.0, 1001, 74, datetime(2024, 7, 4, 22, 42, 12)),
+            (2, "Malmö", 18.5, 1012, 80, None),
+        ]
+
+    def test_records(self):
+        """Test that rows become objects with named fields and ISO timestamps."""
+
+        records = json.loads(WEATHER_ROW_SERIALIZER.records(self.rows))
+
+        self.assertEqual(records[0], {
+            "id": 1, "city_name": "Seoul", "temperature": 24.0,
+            "pressure": 1001, "humidity": 74, "date_time": "2024-07-04T22:42:12",
+        })
+        self.assertEqual(records[1]['city_name'], "Malmö")
+        self.assertIsNone(records[1]['date_time'])
+
+    def test_columns(self):
+        """Test that rows become one array per field."""
+
+        columns = json.loads(WEATHER_ROW_SERIALIZER.dumps(self.rows, 'columns'))
+
+        self.assertEqual(list(columns), list(WEATHER_ROW_SERIALIZER.fields))
+        self.assertEqual(columns['city_name'], ["Seoul", "Malmö"])
+        self.assertEqual(columns['date_time'], ["2024-07-04T22:42:12", None])
+
+    def test_empty_rows(self):
+        """Test that no rows give an empty array or empty columns."""
+
+        self.assertEqual(WEATHER_ROW_SERIALIZER.dumps([], 'records'), '[]')
+        columns = json.loads(WEATHER_ROW_SERIALIZER.dumps([], 'columns'))
+        self.assertEqual(columns['id'], [])
+        self.assertEqual(len(columns), 6)
+
+    def test_custom_fields(self):
+        """Test a serializer built for other columns."""
+
+        serializer = RowSerializer(('city_name', 'bucket'), timestamp_fields=('bucket',))
+        self.assertEqual(serializer.record(("Seoul", datetime(2024, 7, 4))),
+                         {'city_name': "Seoul", 'bucket': "2024-07-04T00:00:00"})
+
+        serializer = RowSerializer(('start', 'city_name', 'end'), timestamp_fields=('start', 'end'))
+        record = serializer.record((datetime(2024, 7, 4), "Seoul", None))
+        self.assertEqual(list(record), ['start', 'city_name', 'end'])
+        self.assertEqual(record['start'], "2024-07-04T00:00:00")
+        self.assertIsNone(record['end'])
+        self.assertEqual(RowSerializer(('city_name',)).record(("Seoul",)), {'city_name': "Seoul"})
+
+    def test_unsupported_layout(self):
+        """Test failure for dumps: unknown layout."""
+
+        with self.assertRaises(ValueError):
+            WEATHER_ROW_SERIALIZER.dumps(self.rows, 'rows')
+
+
+
+
+if __name__ == '__main__':
+    unittest.main()
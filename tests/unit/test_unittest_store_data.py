@@ -12,8 +12,21 @@ sys.path.append('./')
 from src.weather_API_data.store_data import (
     create_weather_database,
     create_weather_table,
-    insert_data
+    insert_data,
+    build_weather_row,
+    insert_many,
+    upsert_rollups,
+    ROLLUP_TABLES,
+    latest_rows,
+    copy_many,
+    partition_start,
+    shift_partition,
+    partition_name,
+    create_partition,
+    ensure_partitions,
+    drop_expired_partitions
 )
+from src.weather_API_data.db_pool import close_all_pools
 
 
 
@@ -97,6 +110,12 @@ class TestCreateTable(unittest.TestCase):
                 date_time TIMESTAMP
             )"""
 
+    def setUp(self):
+        close_all_pools()
+
+    def tearDown(self):
+        close_all_pools()
+
     @patch('psycopg2.connect')
     def test_create_weather_table_success(self, mock_connect):
         """Test for success case of create_weather_table."""
@@ -104,6 +123,7 @@ class TestCreateTable(unittest.TestCase):
         mock_conn = MagicMock()
         mock_cur = MagicMock()
         mock_connect.return_value = mock_conn
+        mock_conn.closed = 0
         mock_conn.cursor.return_value = mock_cur
 
         result = create_weather_table(self.config, self.command)
@@ -127,6 +147,25 @@ class TestCreateTable(unittest.TestCase):
 
 
 
+class ResultCursor:
+    """Cursor that, like psycopg2, only has a result after a RETURNING statement."""
+
+    def __init__(self):
+        self.rowcount = 0
+        self.result = None
+
+    def execute(self, command, params):
+        self.rowcount = 1
+        self.result = (1,) if 'RETURNING' in command else None
+
+    def fetchone(self):
+        if self.result is None:
+            raise psycopg2.ProgrammingError("no results to fetch")
+        return self.result
+
+
+
+
 class TestStoreWeatherData(unittest.TestCase):
     """ Tests for storing weather data in the database """
 
@@ -163,6 +202,25 @@ class TestStoreWeatherData(unittest.TestCase):
         mock_cur.execute.assert_any_call(unittest.mock.ANY, self.weather_value)
         self.assertEqual(result, 1)
 
+    @patch('src.weather_API_data.store_data.upsert_rollups')
+    def test_insert_data_updates_rollups(self, mock_upsert_rollups):
+        """Test that insert_data folds the reading into the rollups in one transaction."""
+
+        cursor = ResultCursor()
+        self.mock_conn.autocommit = True
+        self.mock_conn.cursor.return_value.__enter__.return_value = cursor
+        # The rollup upsert runs statements without results on the same cursor
+        mock_upsert_rollups.side_effect = lambda cur, rows: cur.execute(
+            "INSERT INTO weather_rollup_hourly SELECT 1", None)
+
+        result = insert_data(self.mock_conn, self.city, self.weather_data, self.command,
+                             update_rollups=True)
+
+        self.assertEqual(result, 1)
+        mock_upsert_rollups.assert_called_once_with(cursor, [unittest.mock.ANY])
+        self.mock_conn.commit.assert_called_once()
+        self.mock_conn.rollback.assert_not_called()
+
     def test_insert_data_failure(self):
         """Test for failure case of insert_data."""
 
@@ -174,5 +232,217 @@ class TestStoreWeatherData(unittest.TestCase):
 
 
 
+class TestBulkStoreWeatherData(unittest.TestCase):
+    """ Tests for storing batches of weather data in the database """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.command = """INSERT INTO weather_data (
+                        city_name, temperature, pressure, humidity, date_time)
+                        VALUES %s RETURNING id"""
+        cls.date_time = datetime(2024, 7, 5, 11, 42, 38)
+        cls.rows = [
+            ("Seoul", 24, 1001, 74, cls.date_time),
+            ("Paris", 21, 1200, 70, cls.date_time),
+        ]
+
+    def setUp(self):
+        self.mock_conn = MagicMock()
+        self.mock_conn.autocommit = True
+        self.mock_cur = MagicMock()
+        self.mock_conn.cursor.return_value.__enter__.return_value = self.mock_cur
+
+    def test_build_weather_row_success(self):
+        """Test for success case of build_weather_row."""
+
+        response = {"current": {"temperature": 24, "pressure": 1001, "humidity": 74}}
+        row = build_weather_row("Seoul", response, self.date_time)
+        self.assertEqual(row, self.rows[0])
+
+    def test_build_weather_row_missing_current(self):
+        """Test for failure case of build_weather_row: missing current key."""
+
+        with self.assertRaises(ValueError):
+            build_weather_row("Seoul", {"error": {"code": 104}})
+
+    @patch('src.weather_API_data.store_data.execute_values')
+    def test_insert_many_returns_ids(self, mock_execute_values):
+        """Test that insert_many writes one batch in a transaction and returns ids."""
+
+        mock_execute_values.return_value = [(1,), (2,)]
+
+        result = insert_many(self.mock_conn, self.rows, self.command, return_ids=True)
+
+        mock_execute_values.assert_called_once_with(
+            self.mock_cur, self.command, self.rows, page_size=1000, fetch=True)
+        self.mock_conn.commit.assert_called_once()
+        self.assertTrue(self.mock_conn.autocommit)
+        self.assertEqual(result, [1, 2])
+
+    @patch('src.weather_API_data.store_data.execute_values')
+    def test_insert_many_rollback_on_error(self, mock_execute_values):
+        """Test that insert_many rolls the whole batch back on failure."""
+
+        mock_execute_values.side_effect = psycopg2.DatabaseError("Insert error")
+
+        with self.assertRaises(psycopg2.DatabaseError):
+            insert_many(self.mock_conn, self.rows, self.command)
+
+        self.mock_conn.rollback.assert_called_once()
+        self.mock_conn.commit.assert_not_called()
+        self.assertTrue(self.mock_conn.autocommit)
+
+    @patch('src.weather_API_data.store_data.execute_values')
+    def test_insert_many_upserts_latest(self, mock_execute_values):
+        """Test that insert_many upserts the newest row per city in the same transaction."""
+
+        later = datetime(2024, 7, 5, 12, 0, 0)
+        rows = self.rows + [("Seoul", 25, 1002, 70, later)]
+        latest_command = "INSERT INTO weather_latest VALUES %s ON CONFLICT DO NOTHING"
+        mock_execute_values.side_effect = [[(1,), (2,), (3,)], None]
+
+        result = insert_many(self.mock_conn, rows, self.command, latest_command=latest_command)
+
+        self.assertEqual(result, 3)
+        upsert_call = mock_execute_values.call_args_list[1]
+        self.assertEqual(upsert_call[0][1], latest_command)
+        self.assertEqual(sorted(upsert_call[0][2]), [
+            (2, "Paris", 21, 1200, 70, self.date_time),
+            (3, "Seoul", 25, 1002, 70, later),
+        ])
+        self.mock_conn.commit.assert_called_once()
+
+    @patch('src.weather_API_data.store_data.execute_values')
+    def test_insert_many_updates_rollups(self, mock_execute_values):
+        """Test that insert_many folds the batch into every rollup table."""
+
+        result = insert_many(self.mock_conn, self.rows, self.command, update_rollups=True)
+
+        self.assertEqual(result, 2)
+        self.assertEqual(mock_execute_values.call_count, 1 + len(ROLLUP_TABLES))
+        for rollup_call in mock_execute_values.call_args_list[1:]:
+            self.assertEqual(rollup_call[0][2], self.rows)
+        self.mock_conn.commit.assert_called_once()
+
+    @patch('src.weather_API_data.store_data.execute_values')
+    def test_upsert_rollups_tables(self, mock_execute_values):
+        """Test that each granularity is upserted into its own table."""
+
+        upsert_rollups(self.mock_cur, self.rows)
+
+        commands = [repr(call[0][1]) for call in mock_execute_values.call_args_list]
+        self.assertIn("weather_rollup_hourly", commands[0])
+        self.assertIn("Literal('hour')", commands[0])
+        self.assertIn("weather_rollup_daily", commands[1])
+        self.assertIn("Literal('day')", commands[1])
+        self.assertIn("COALESCE(sum(temperature::float), 0), count(temperature)", commands[0])
+        self.assertIn("humidity_count = rollup.humidity_count + EXCLUDED.humidity_count",
+                      commands[0])
+
+    def test_latest_rows_keeps_newest(self):
+        """Test that latest_rows keeps the newest reading and breaks ties by id."""
+
+        rows = [self.rows[0], self.rows[0]]
+        self.assertEqual(latest_rows(rows, [7, 8]), [(8,) + self.rows[0]])
+
+    def test_insert_many_empty_batch(self):
+        """Test that an empty batch does not touch the database."""
+
+        self.assertEqual(insert_many(self.mock_conn, [], self.command), 0)
+        self.mock_conn.cursor.assert_not_called()
+
+    def test_copy_many_success(self):
+        """Test for success case of copy_many."""
+
+        result = copy_many(self.mock_conn, self.rows)
+
+        self.mock_cur.copy_expert.assert_called_once()
+        buffer = self.mock_cur.copy_expert.call_args[0][1]
+        self.assertEqual(buffer.getvalue().splitlines()[0],
+                         "Seoul,24,1001,74,2024-07-05 11:42:38")
+        self.mock_conn.commit.assert_called_once()
+        self.assertEqual(result, 2)
+
+
+
+
+class TestWeatherPartitions(unittest.TestCase):
+    """ Tests for managing the weather_data range partitions """
+
+    def setUp(self):
+        self.mock_conn = MagicMock()
+        self.mock_conn.autocommit = True
+        self.mock_cur = MagicMock()
+        self.mock_conn.cursor.return_value.__enter__.return_value = self.mock_cur
+        self.now = datetime(2024, 7, 5, 11, 42, 38)
+
+    def test_partition_bounds(self):
+        """Test partition start, shift and naming for days and months."""
+
+        self.assertEqual(partition_start(self.now, 'day'), datetime(2024, 7, 5))
+        self.assertEqual(partition_start(self.now, 'month'), datetime(2024, 7, 1))
+        self.assertEqual(shift_partition(datetime(2024, 12, 1), 'month', 1), datetime(2025, 1, 1))
+        self.assertEqual(shift_partition(datetime(2024, 1, 1), 'month', -13), datetime(2022, 12, 1))
+        self.assertEqual(shift_partition(datetime(2024, 2, 28), 'day', 2), datetime(2024, 3, 1))
+        self.assertEqual(partition_name('weather_data', datetime(2024, 7, 1), 'month'),
+                         'weather_data_p202407')
+        self.assertEqual(partition_name('weather_data', datetime(2024, 7, 5), 'day'),
+                         'weather_data_p20240705')
+
+    def test_partition_invalid_interval(self):
+        """Test failure for partition_start: unsupported interval."""
+
+        with self.assertRaises(ValueError):
+            partition_start(self.now, 'week')
+
+    def test_create_partition_moves_default_rows(self):
+        """Test that a new partition takes over rows from the default partition."""
+
+        self.mock_cur.fetchone.return_value = (None,)
+
+        self.assertTrue(create_partition(self.mock_conn, self.now, 'month'))
+
+        self.mock_cur.execute.assert_any_call(
+            unittest.mock.ANY, (datetime(2024, 7, 1), datetime(2024, 8, 1)))
+        self.assertEqual(self.mock_cur.execute.call_count, 4)
+        self.mock_conn.commit.assert_called_once()
+
+    def test_create_partition_existing(self):
+        """Test that an existing partition is left alone."""
+
+        self.mock_cur.fetchone.return_value = ('weather_data_p202407',)
+
+        self.assertFalse(create_partition(self.mock_conn, self.now, 'month'))
+        self.mock_cur.execute.assert_called_once_with(
+            "SELECT to_regclass(%s)", ('weather_data_p202407',))
+
+    @patch('src.weather_API_data.store_data.create_partition')
+    def test_ensure_partitions(self, mock_create_partition):
+        """Test that the current and upcoming partitions are created."""
+
+        mock_create_partition.side_effect = [False, True, True]
+
+        created = ensure_partitions(self.mock_conn, 'month', ahead=2, now=self.now)
+
+        self.assertEqual(created, ['weather_data_p202408', 'weather_data_p202409'])
+
+    def test_drop_expired_partitions(self):
+        """Test that only partitions past the retention window are dropped."""
+
+        self.mock_cur.fetchall.return_value = [
+            ('weather_data_default',),
+            ('weather_data_p202405',),
+            ('weather_data_p202406',),
+            ('weather_data_p202407',),
+        ]
+
+        dropped = drop_expired_partitions(self.mock_conn, 'month', retention=1, now=self.now)
+
+        self.assertEqual(dropped, ['weather_data_p202405'])
+        self.mock_conn.commit.assert_called_once()
+
+
+
+
 if __name__ == '__main__':
     unittest.main()